@@ -0,0 +1,80 @@
+"""Compare document size and HTML parse time of the inline and classes highlight modes.
+
+The reference deck has ``--slides`` slides, each with a heading, a short list and a Python code block
+of ``--lines`` lines. Parse time is measured with ``html.parser``, which tokenizes every tag and
+attribute much like a browser's HTML parser. It does not model the extra work a browser does for
+``style`` attributes (each is parsed as its own CSS declaration block), so the number of those is
+reported separately.
+
+Run with ``python benchmarks/bench_highlight.py``.
+"""
+
+from __future__ import annotations
+
+from html.parser import HTMLParser
+from pathlib import Path
+import argparse
+import gzip
+import timeit
+
+from dazzle.compiler import BuildOptions, build_deck
+from dazzle.render_html import render_document
+
+
+_CODE_LINES = [
+    "def handle(request, *, retries=3):",
+    '    """Process one request."""',
+    "    for attempt in range(retries):",
+    "        result = backend.send(request.payload, timeout=2.5)",
+    "        if result.ok and result.status == 200:",
+    '            return {"id": request.id, "body": result.json()}',
+    "        log.warning(f'retry {attempt} for {request.id!r}')",
+    "    raise TimeoutError(request.id)",
+]
+
+
+def reference_deck(slides: int, lines: int) -> str:
+    code = "\n".join(_CODE_LINES[index % len(_CODE_LINES)] for index in range(lines))
+    return "\n\n---\n\n".join(
+        f"# Slide {index}\n\n* point one\n* point two\n\n```python\n{code}\n```" for index in range(slides)
+    )
+
+
+class _CountingParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.style_attributes = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.style_attributes += sum(1 for name, _value in attrs if name == "style")
+
+
+def _parse(document: str) -> int:
+    parser = _CountingParser()
+    parser.feed(document)
+    parser.close()
+    return parser.style_attributes
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--slides", type=int, default=100, help="Slides in the reference deck (default: 100).")
+    arg_parser.add_argument("--lines", type=int, default=24, help="Code lines per slide (default: 24).")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (default: 5).")
+    args = arg_parser.parse_args()
+
+    source = reference_deck(args.slides, args.lines)
+    print(f"reference deck: {args.slides} slides x {args.lines} code lines")
+    for mode in ("inline", "classes"):
+        deck = build_deck(source, Path("."), BuildOptions(highlight_mode=mode))
+        document = render_document(deck, "Reference")
+        seconds = min(timeit.repeat(lambda: _parse(document), number=1, repeat=args.repeat))
+        encoded = document.encode("utf-8")
+        print(
+            f"{mode:<8} {len(encoded) / 1024:7.1f} KiB  gzip {len(gzip.compress(encoded)) / 1024:5.1f} KiB"
+            f"  {_parse(document):6d} style attributes  parse {seconds * 1000:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
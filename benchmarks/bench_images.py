@@ -0,0 +1,74 @@
+"""Compare the single-pass img rewriter with a full HTMLParser round-trip on large slides.
+
+Run with ``python benchmarks/bench_images.py``.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import tempfile
+import timeit
+
+from dazzle.compiler import MARKDOWN_ENGINE, render_markdown
+from dazzle.images import ImageCache, ImageEmbeddingHTMLParser, embed_images_in_html
+
+
+PNG_1X1 = (
+    b"\x89PNG\r\n\x1a\n"
+    b"\x00\x00\x00\rIHDR"
+    b"\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00"
+    b"\x1f\x15\xc4\x89\x00\x00\x00\x0dIDATx\x9cc````\x00\x00\x00\x05\x00\x01"
+    b"\x0d\n-\xb4\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+def _large_slide_markdown(blocks: int) -> str:
+    parts: list[str] = []
+    for index in range(blocks):
+        parts.append(f"Paragraph {index} with *emphasis*, `code` and a [link](https://example.com/{index}).")
+        parts.append("| a | b | c |\n|---|---|---|\n| 1 | 2 | 3 |")
+        parts.append(f"```python\ndef f{index}(x):\n    return x * {index}\n```")
+        if index % 10 == 0:
+            parts.append(f"![figure {index}](pic.png)")
+    return "\n\n".join(parts)
+
+
+def _embed_with_full_parse(html: str, markdown_dir: Path, image_cache: ImageCache) -> str:
+    parser = ImageEmbeddingHTMLParser(markdown_dir, image_cache)
+    parser.feed(html)
+    parser.close()
+    return parser.get_html()
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--blocks", type=int, default=500, help="Markdown blocks per slide (default: 500).")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (default: 5).")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        markdown_dir = Path(tmpdir)
+        (markdown_dir / "pic.png").write_bytes(PNG_1X1)
+        html = render_markdown(MARKDOWN_ENGINE, _large_slide_markdown(args.blocks))
+        # A warm cache keeps file reads and base64 encoding out of the measurement.
+        image_cache = ImageCache()
+
+        def fast_path() -> str:
+            return embed_images_in_html(html, markdown_dir, image_cache=image_cache)
+
+        def full_path() -> str:
+            return _embed_with_full_parse(html, markdown_dir, image_cache)
+
+        fast = min(timeit.repeat(fast_path, number=1, repeat=args.repeat))
+        full = min(timeit.repeat(full_path, number=1, repeat=args.repeat))
+        same = fast_path() == full_path()
+
+    print(f"slide html: {len(html) / 1024:.0f} KiB")
+    print(f"full HTMLParser round-trip: {full * 1000:8.2f} ms")
+    print(f"single-pass img rewrite:    {fast * 1000:8.2f} ms")
+    print(f"speedup: {full / fast:.1f}x (identical output: {same})")
+
+
+if __name__ == "__main__":
+    main()
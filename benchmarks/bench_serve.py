@@ -0,0 +1,97 @@
+"""Compare preview latency of a cold ``dazzle build`` process with requests to a warm ``dazzle serve``.
+
+Each scenario from ``decks.py`` is built by a fresh CLI process, then sent to one server process over
+a kept-alive connection: unchanged, and with one slide edited before every request, as an editor
+would after a keystroke.
+
+Run with ``python benchmarks/bench_serve.py --scale small``.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+import argparse
+import http.client
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from decks import SCALES, SCENARIOS
+
+
+def _median_ms(run: Callable[[int], object], repeat: int) -> float:
+    times = []
+    for attempt in range(repeat):
+        started = time.perf_counter()
+        run(attempt)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def _start_server() -> tuple[subprocess.Popen[str], http.client.HTTPConnection]:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "dazzle.cli", "serve", "--port", "0"], stderr=subprocess.PIPE, text=True
+    )
+    assert server.stderr is not None
+    line = server.stderr.readline()
+    if "listening on http://" not in line:
+        server.kill()
+        raise RuntimeError(f"dazzle serve did not start: {line}")
+    host, port = line.rsplit("http://", 1)[1].strip().rsplit(":", 1)
+    return server, http.client.HTTPConnection(host, int(port), timeout=600)
+
+
+def _post(connection: http.client.HTTPConnection, source: str, base_dir: Path) -> bytes:
+    body = json.dumps({"markdown": source, "base_dir": str(base_dir)})
+    connection.request("POST", "/document", body, {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    document = response.read()
+    if response.status != 200:
+        raise RuntimeError(document.decode("utf-8", "replace"))
+    return document
+
+
+def _edit_one_slide(source: str, attempt: int) -> str:
+    slides = source.split("\n\n---\n\n")
+    middle = len(slides) // 2
+    slides[middle] += f"\n\nEdit {attempt}"
+    return "\n\n---\n\n".join(slides)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--scale", choices=SCALES, default="small", help="Deck size (default: small).")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timed runs per measurement (default: 5).")
+    args = arg_parser.parse_args()
+
+    server, connection = _start_server()
+    try:
+        print(f"{'scenario':<16}{'cold CLI':>12}{'warm serve':>12}{'one edit':>12}  (median ms)")
+        for scenario in SCENARIOS:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                directory = Path(tmpdir)
+                input_path = scenario.generate(directory, SCALES[args.scale])
+                source = input_path.read_text(encoding="utf-8")
+                output_path = directory / "out.html"
+                command = [sys.executable, "-m", "dazzle.cli", "build", str(input_path), "-o", str(output_path)]
+
+                cold = _median_ms(lambda attempt: subprocess.run(command, check=True), args.repeat)
+                if _post(connection, source, directory).decode("utf-8") != output_path.read_text("utf-8"):
+                    raise RuntimeError(f"{scenario.name}: the server and the CLI built different documents")
+                warm = _median_ms(lambda attempt: _post(connection, source, directory), args.repeat)
+                edit = _median_ms(
+                    lambda attempt: _post(connection, _edit_one_slide(source, attempt), directory), args.repeat
+                )
+            print(f"{scenario.name:<16}{cold:12.1f}{warm:12.1f}{edit:12.1f}")
+    finally:
+        connection.close()
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
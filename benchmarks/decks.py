@@ -0,0 +1,137 @@
+"""Deterministic synthetic decks for the benchmark suite.
+
+Every generator writes its deck (and any images) into ``directory`` and returns the markdown path.
+The same scenario and scale always produce byte-identical input, so results can be compared
+across commits.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+import random
+import struct
+import zlib
+
+
+SCALES = {"small": 1, "medium": 5, "large": 25}
+
+_LANGUAGES = {
+    "python": [
+        "def handle_{i}(request, *, retries=3):",
+        '    """Process request number {i}."""',
+        "    for attempt in range(retries):",
+        "        result = backend.send(request.payload, timeout={i}.5)",
+        "        if result.ok and result.status == 200:",
+        '            return {{"id": request.id, "body": result.json()}}',
+        "    raise TimeoutError(request.id)",
+    ],
+    "javascript": [
+        "export async function load{i}(url, options = {{}}) {{",
+        "  const response = await fetch(url, {{ ...options, cache: 'no-store' }});",
+        "  if (!response.ok) throw new Error(`HTTP ${{response.status}} on step {i}`);",
+        "  return response.json().then((data) => data.items.filter(Boolean));",
+        "}}",
+    ],
+    "rust": [
+        "fn parse_{i}(input: &str) -> Result<Vec<u32>, ParseIntError> {{",
+        "    input.split(',').map(|part| part.trim().parse::<u32>()).collect()",
+        "}}",
+    ],
+}
+
+
+def write_png(path: Path, width: int, height: int, seed: int) -> None:
+    """Writes a valid RGB PNG of noise, which compresses about as badly as a photo."""
+    rng = random.Random(seed)
+    rows = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    path.write_bytes(
+        b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows, 6)) + chunk(b"IEND", b"")
+    )
+
+
+def _code_block(index: int, lines: int) -> str:
+    language = list(_LANGUAGES)[index % len(_LANGUAGES)]
+    template = _LANGUAGES[language]
+    body = "\n".join(template[line % len(template)].format(i=index + line // len(template)) for line in range(lines))
+    return f"```{language}\n{body}\n```"
+
+
+def many_slides(directory: Path, scale: int) -> Path:
+    slides = [
+        f"# Slide {index}\n\nSome *emphasis*, `inline code` and a [link](https://example.com/{index}).\n\n"
+        f"- static point {index}\n- another point\n\n| a | b |\n|---|---|\n| {index} | {index * 2} |"
+        for index in range(400 * scale)
+    ]
+    return _write_deck(directory, slides)
+
+
+def code_heavy(directory: Path, scale: int) -> Path:
+    # Every fourth slide repeats its predecessor's block, like a build-up slide would.
+    slides = [
+        f"## Code {index}\n\n{_code_block(index - 1 if index % 4 == 3 else index, 40)}" for index in range(60 * scale)
+    ]
+    return _write_deck(directory, slides)
+
+
+def many_images(directory: Path, scale: int) -> Path:
+    shared = 8
+    for index in range(shared):
+        write_png(directory / f"shared_{index}.png", 48, 48, seed=index)
+    slides = []
+    for index in range(150 * scale):
+        unique = directory / f"unique_{index}.png"
+        write_png(unique, 32, 32, seed=1000 + index)
+        slides.append(f"# Figure {index}\n\n![logo](shared_{index % shared}.png)\n\n![plot]({unique.name})")
+    return _write_deck(directory, slides)
+
+
+def large_images(directory: Path, scale: int) -> Path:
+    slides = []
+    for index in range(4 * scale):
+        write_png(directory / f"photo_{index}.png", 640, 480, seed=index)
+        slides.append(f"# Photo {index}\n\n![photo {index}](photo_{index}.png)")
+    return _write_deck(directory, slides)
+
+
+def deep_fragments(directory: Path, scale: int) -> Path:
+    def nested(depth: int, prefix: str) -> list[str]:
+        if depth == 0:
+            return []
+        lines: list[str] = []
+        for item in range(3):
+            lines.append(f"{'    ' * (6 - depth)}* step {prefix}{item}")
+            lines.extend(nested(depth - 1, f"{prefix}{item}."))
+        return lines
+
+    list_source = "\n".join(nested(5, ""))
+    slides = [f"# Build-up {index}\n\n{list_source}" for index in range(20 * scale)]
+    return _write_deck(directory, slides)
+
+
+def _write_deck(directory: Path, slides: list[str]) -> Path:
+    path = directory / "deck.md"
+    path.write_text("\n\n---\n\n".join(slides), encoding="utf-8")
+    return path
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    generate: Callable[[Path, int], Path]
+    description: str
+
+
+SCENARIOS = [
+    Scenario("many_slides", many_slides, "400 short text/list/table slides per scale step"),
+    Scenario("code_heavy", code_heavy, "60 slides with 40-line code blocks per scale step"),
+    Scenario("many_images", many_images, "150 slides with a shared and a unique small PNG per scale step"),
+    Scenario("large_images", large_images, "4 slides with a 640x480 noise PNG per scale step"),
+    Scenario("deep_fragments", deep_fragments, "20 slides with a 5-level, 363-item * list per scale step"),
+]
@@ -0,0 +1,186 @@
+"""Time the full compile pipeline on synthetic decks and compare against a saved baseline.
+
+Each scenario from ``decks.py`` is generated at the chosen scale and compiled with
+``compile_markdown_source_to_html``. Timed runs use a fresh Markdown engine every repetition, so
+highlighting memoized by an earlier repetition never leaks into the next. Two extra runs per
+scenario record the per-stage breakdown (without allocation tracing, which would skew it) and the
+peak traced memory of the whole build.
+
+Run with ``python benchmarks/run_suite.py --scale small --output results.json`` and check a later
+commit with ``--compare results.json``; the exit status is 1 when any scenario got slower than
+``--threshold``.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import markdown
+import pygments
+
+from dazzle import __version__, compiler
+from dazzle.compiler import BuildOptions, BuildSummary, compile_markdown_source_to_html
+from dazzle.highlight import HIGHLIGHT_MODES
+from dazzle.images import IMAGE_MODES
+from dazzle.profiling import BuildProfiler
+
+from decks import SCALES, SCENARIOS
+
+
+def _fresh_engines() -> None:
+    compiler._ENGINE_POOLS.clear()
+
+
+def _compile(
+    input_path: Path, output_path: Path, options: BuildOptions, profiler: BuildProfiler | None = None
+) -> BuildSummary:
+    source = input_path.read_text(encoding="utf-8")
+    return compile_markdown_source_to_html(
+        source, input_path.name, input_path.parent, output_path, options, profiler=profiler
+    )
+
+
+def run_scenario(
+    generate: Callable[[Path, int], Path], scale: int, repeat: int, options: BuildOptions
+) -> dict[str, object]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = Path(tmpdir)
+        input_path = generate(directory, scale)
+        output_path = directory / "deck.html"
+        input_bytes = sum(path.stat().st_size for path in directory.iterdir() if path.is_file())
+
+        _fresh_engines()
+        _compile(input_path, output_path, options)  # Warm-up: imports lexers and loads theme assets.
+
+        samples = []
+        for _ in range(repeat):
+            _fresh_engines()
+            started = time.perf_counter()
+            summary = _compile(input_path, output_path, options)
+            samples.append(time.perf_counter() - started)
+        output_bytes = output_path.stat().st_size
+
+        _fresh_engines()
+        stage_profiler = BuildProfiler(trace_allocations=False)
+        _compile(input_path, output_path, options, stage_profiler)
+
+        _fresh_engines()
+        memory_profiler = BuildProfiler()
+        memory_profiler.start()
+        try:
+            with memory_profiler.stage("build"):
+                _compile(input_path, output_path, options)
+        finally:
+            memory_profiler.stop()
+
+    seconds = statistics.median(samples)
+    stages = {name: round(total, 6) for name, _calls, total, _peak in stage_profiler.stage_totals()}
+    peak_bytes = memory_profiler.records[0].peak_bytes
+    return {
+        "slides": summary.slide_count,
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "seconds_median": seconds,
+        "seconds_min": min(samples),
+        "slides_per_second": summary.slide_count / seconds,
+        "input_mb_per_second": input_bytes / seconds / 1_000_000,
+        "peak_bytes": peak_bytes,
+        "stages": stages,
+    }
+
+
+def _environment() -> dict[str, str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "dazzle": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "markdown": markdown.__version__,
+        "pygments": pygments.__version__,
+    }
+
+
+def _print_result(name: str, result: dict[str, object], baseline: dict[str, object] | None) -> None:
+    line = (
+        f"{name:<15} {result['slides']:6d} slides {result['seconds_median'] * 1000:9.1f} ms"
+        f" {result['slides_per_second']:9.0f} slides/s {result['input_mb_per_second']:7.2f} MB/s"
+        f" peak {result['peak_bytes'] / 1_000_000:7.1f} MB"
+    )
+    if baseline is not None:
+        change = result["seconds_median"] / baseline["seconds_median"] - 1
+        line += f"  {change:+.1%} vs baseline"
+    print(line)
+    slowest = sorted(result["stages"].items(), key=lambda item: item[1], reverse=True)[:4]
+    print("    " + ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in slowest))
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--scale", choices=SCALES, default="small", help="Deck size (default: small).")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per scenario (default: 5).")
+    arg_parser.add_argument(
+        "--scenario", action="append", choices=[scenario.name for scenario in SCENARIOS], help="Only run these."
+    )
+    arg_parser.add_argument("--image-mode", choices=IMAGE_MODES, default="inline", help="Default: inline.")
+    arg_parser.add_argument("--highlight-mode", choices=HIGHLIGHT_MODES, default="inline", help="Default: inline.")
+    arg_parser.add_argument("--output", help="Write the results as JSON to this file.")
+    arg_parser.add_argument("--compare", help="Baseline JSON from an earlier --output run.")
+    arg_parser.add_argument(
+        "--threshold", type=float, default=0.15, help="Allowed slowdown against the baseline (default: 0.15)."
+    )
+    args = arg_parser.parse_args()
+
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    if baseline is not None and baseline["scale"] != args.scale:
+        arg_parser.error(f"baseline was recorded at scale '{baseline['scale']}'")
+    options = BuildOptions(image_mode=args.image_mode, highlight_mode=args.highlight_mode)
+    recorded_options = {"image_mode": options.image_mode, "highlight_mode": options.highlight_mode}
+    if baseline is not None and baseline["options"] != recorded_options:
+        arg_parser.error(f"baseline was recorded with {baseline['options']}")
+
+    report: dict[str, object] = {
+        "scale": args.scale,
+        "options": recorded_options,
+        "environment": _environment(),
+        "scenarios": {},
+    }
+    regressions = []
+    for scenario in SCENARIOS:
+        if args.scenario and scenario.name not in args.scenario:
+            continue
+        result = run_scenario(scenario.generate, SCALES[args.scale], args.repeat, options)
+        report["scenarios"][scenario.name] = result
+        previous = baseline["scenarios"].get(scenario.name) if baseline is not None else None
+        _print_result(scenario.name, result, previous)
+        if previous is not None and result["seconds_median"] > previous["seconds_median"] * (1 + args.threshold):
+            regressions.append(scenario.name)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if regressions:
+        print(f"slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+"""Renders decks in memory, for programs that embed dazzle.
+
+Nothing here touches the filesystem: images come from an asset resolver (or a mapping of relative
+paths to file contents) and the document is returned as bytes or written to the caller's stream. The
+images of the shared and lazy modes wait for the asset table in memory, not in a temporary file.
+Every function may be called from many threads at once; conversions borrow Markdown engines from a
+bounded pool, one caller per engine. Passing ``options.cache_dir`` opts back into the on-disk build cache.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import BinaryIO, Mapping, TextIO
+import codecs
+import io
+
+from dazzle.compiler import BuildOptions, BuildSummary, compile_markdown_source_to_stream
+from dazzle.images import AssetResolver, MemoryAssetResolver
+
+
+def _asset_resolver(assets: AssetResolver | Mapping[str, bytes] | None, options: BuildOptions) -> AssetResolver:
+    if assets is None:
+        return MemoryAssetResolver({})
+    if isinstance(assets, Mapping):
+        return MemoryAssetResolver(assets, options.image_optimization)
+    return assets
+
+
+def write_deck(
+    source: str,
+    stream: TextIO | BinaryIO,
+    assets: AssetResolver | Mapping[str, bytes] | None = None,
+    options: BuildOptions | None = None,
+    source_name: str = "deck.md",
+) -> BuildSummary:
+    """Writes the deck to a text stream, or UTF-8 encoded to a binary one, slide by slide.
+
+    ``source_name`` only provides the title of decks without a top-level heading.
+    """
+    options = options or BuildOptions()
+    if options.image_mode == "external":
+        raise ValueError("The 'external' image mode writes asset files and is not available when rendering in memory.")
+    if options.layout == "chunked":
+        raise ValueError("The 'chunked' layout writes slide files and is not available when rendering in memory.")
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+        stream = codecs.getwriter("utf-8")(stream)
+    return compile_markdown_source_to_stream(
+        source,
+        source_name,
+        Path("."),
+        stream,
+        options,
+        resolver=_asset_resolver(assets, options),
+        asset_spool=io.BytesIO(),
+    )
+
+
+def render_deck(
+    source: str,
+    assets: AssetResolver | Mapping[str, bytes] | None = None,
+    options: BuildOptions | None = None,
+    source_name: str = "deck.md",
+) -> bytes:
+    """Returns the complete UTF-8 encoded document."""
+    stream = io.StringIO()
+    write_deck(source, stream, assets, options, source_name)
+    return stream.getvalue().encode("utf-8")
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import BinaryIO, Iterator
+import base64
+import json
+import mimetypes
+import os
+import tempfile
+import urllib.parse
+
+from dazzle.files import write_atomically
+from dazzle.images import AssetResolver, EncodedImage
+from dazzle.slides import Slide
+
+# Image data is copied from the spool into the document in pieces of this size.
+_SPOOL_CHUNK_BYTES = 1024 * 1024
+
+
+def asset_filename(image: EncodedImage) -> str:
+    extension = mimetypes.guess_extension(image.mime) or ""
+    return f"{image.asset_id}{extension}"
+
+
+def write_asset_file(directory: Path, filename: str, content: bytes) -> None:
+    """Writes a content-addressed file once; an existing file with the same name already has this content."""
+    target = directory / filename
+    if not target.exists():
+        write_atomically(target, content)
+
+
+class AssetTable:
+    """Collects the unique images a deck references and renders where the runtime finds them.
+
+    ``shared`` keeps every image in one JSON table that is attached at startup. ``lazy`` stores each
+    image in its own inert script blob, and ``external`` writes it into ``assets_dir`` next to the
+    document; in both of those the runtime only attaches images of the active slide and its neighbours.
+
+    Images are moved out of memory as they are first seen: ``external`` writes their files straight away,
+    and ``shared`` and ``lazy`` append their encoded data to ``spool``, by default an unnamed temporary file,
+    that ``iter_render`` copies into the document in chunks. Only ids and mime types stay resident, so the
+    table holds at most one image at a time whatever the size of the deck. The table can be rendered once.
+    """
+
+    def __init__(
+        self,
+        image_mode: str,
+        resolver: AssetResolver,
+        assets_dir: Path | None = None,
+        spool: BinaryIO | None = None,
+    ) -> None:
+        if image_mode == "external" and assets_dir is None:
+            raise ValueError("The 'external' image mode needs an output file to write the assets directory next to.")
+        self._image_mode = image_mode
+        self._resolver = resolver
+        self._assets_dir = assets_dir
+        # asset id -> (mime, offset, length) of the encoded data in the spool.
+        self._images: dict[str, tuple[str, int, int]] = {}
+        self._spool = spool
+        # A spool the table opened itself is closed once it has been rendered; the caller's is left open.
+        self._owns_spool = False
+        self._urls: dict[str, str] = {}
+
+    def add(self, slide: Slide) -> Slide:
+        for dependency in slide.images:
+            image = self._resolver.load(dependency.path)
+            if image.asset_id in self._images or image.asset_id in self._urls:
+                continue
+            if self._image_mode == "external":
+                assert self._assets_dir is not None
+                filename = asset_filename(image)
+                write_asset_file(self._assets_dir, filename, base64.b64decode(image.data))
+                self._urls[image.asset_id] = urllib.parse.quote(f"{self._assets_dir.name}/{filename}")
+            else:
+                if self._spool is None:
+                    self._spool = tempfile.TemporaryFile()
+                    self._owns_spool = True
+                self._spool.seek(0, os.SEEK_END)
+                offset = self._spool.tell()
+                self._spool.write(image.data.encode("ascii"))
+                self._images[image.asset_id] = (image.mime, offset, len(image.data))
+        return slide
+
+    def render(self) -> str:
+        return "".join(self.iter_render())
+
+    def iter_render(self) -> Iterator[str]:
+        """Yields the asset markup, with the image data read back from the spool in chunks."""
+        try:
+            yield from self._iter_render()
+        finally:
+            if self._owns_spool:
+                assert self._spool is not None
+                self._spool.close()
+
+    def _iter_render(self) -> Iterator[str]:
+        if not self._images and not self._urls:
+            return
+        loading = "eager" if self._image_mode == "shared" else "lazy"
+        table_open = f'  <script type="application/json" id="dazzle-assets" data-loading="{loading}">'
+        if self._image_mode == "shared":
+            # The same text json.dumps writes for {asset_id: {"mime": ..., "data": ...}}.
+            yield table_open + "{"
+            for position, (asset_id, (mime, offset, length)) in enumerate(self._images.items()):
+                separator = ", " if position else ""
+                yield f'{separator}{json.dumps(asset_id)}: {{"mime": {json.dumps(mime)}, "data": "'
+                yield from self._read_data(offset, length)
+                yield '"}'
+            yield "}</script>\n"
+            return
+        if self._image_mode == "lazy":
+            for asset_id, (_mime, offset, length) in self._images.items():
+                yield f'  <script type="application/octet-stream" id="dazzle-asset-{asset_id}">'
+                yield from self._read_data(offset, length)
+                yield "</script>\n"
+            table = {
+                asset_id: {"mime": mime, "blob": f"dazzle-asset-{asset_id}"}
+                for asset_id, (mime, _offset, _length) in self._images.items()
+            }
+        else:
+            table = {asset_id: {"url": url} for asset_id, url in self._urls.items()}
+        yield f"{table_open}{json.dumps(table)}</script>\n"
+
+    def _read_data(self, offset: int, length: int) -> Iterator[str]:
+        assert self._spool is not None
+        self._spool.seek(offset)
+        while length > 0:
+            chunk = self._spool.read(min(length, _SPOOL_CHUNK_BYTES))
+            length -= len(chunk)
+            yield chunk.decode("ascii")
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterator
+import glob
+import hashlib
+import json
+import os
+import time
+
+from dazzle.cache import ImageDependency, SlideCache, SlideStore
+from dazzle.compiler import (
+    BuildOptions,
+    BuildSummary,
+    _render_fingerprint,
+    compile_markdown_file_to_html,
+    external_assets_dir,
+    new_image_cache,
+)
+from dazzle.images import ImageCache
+
+
+@dataclass(frozen=True)
+class DeckJob:
+    input_path: Path
+    output_path: Path
+
+
+@dataclass(frozen=True)
+class DeckResult:
+    job: DeckJob
+    status: str  # "built", "skipped" or "failed"
+    seconds: float
+    summary: BuildSummary | None = None
+    error: str | None = None
+
+
+def jobs_from_patterns(patterns: list[str], output_dir: Path) -> list[DeckJob]:
+    """Expands glob patterns; outputs mirror the inputs' layout below their common parent directory."""
+    inputs = sorted({Path(match) for pattern in patterns for match in glob.glob(pattern, recursive=True)})
+    inputs = [path for path in inputs if path.is_file()]
+    if not inputs:
+        raise ValueError(f"No markdown files matched: {' '.join(patterns)}")
+
+    base = Path(os.path.commonpath([path.resolve().parent for path in inputs]))
+    return [
+        DeckJob(input_path=path, output_path=output_dir / path.resolve().relative_to(base).with_suffix(".html"))
+        for path in inputs
+    ]
+
+
+def jobs_from_manifest(manifest_path: Path) -> list[DeckJob]:
+    """Reads a JSON list of {"input": ..., "output": ...} objects, relative to the manifest's directory."""
+    entries = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if not isinstance(entries, list):
+        raise ValueError(f"Manifest {manifest_path} must contain a JSON list.")
+
+    jobs: list[DeckJob] = []
+    for position, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict) or not all(isinstance(entry.get(key), str) for key in ("input", "output")):
+            raise ValueError(f"Manifest entry {position} in {manifest_path} needs string 'input' and 'output' fields.")
+        jobs.append(
+            DeckJob(
+                input_path=manifest_path.parent / entry["input"],
+                output_path=manifest_path.parent / entry["output"],
+            )
+        )
+    return jobs
+
+
+def _deck_fingerprint(job: DeckJob, options: BuildOptions) -> str:
+    digest = hashlib.sha256()
+    digest.update(_render_fingerprint(options).encode("utf-8"))
+    # Compression and layout only change the document around the slides, so they are not part of the slide
+    # fingerprint.
+    if options.compress:
+        digest.update(b"\0compress")
+    if options.layout != "single":
+        digest.update(f"\0layout={options.layout}".encode("utf-8"))
+    digest.update(str(job.input_path.resolve()).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(job.input_path.read_bytes())
+    return digest.hexdigest()
+
+
+class DeckStateStore:
+    """Remembers what each output was built from so decks with unchanged inputs can be skipped.
+
+    With ``writes_assets`` the files in the output's assets directory, which the chunked layout and the
+    external image mode load, are recorded as well, so a deck is rebuilt when one of them is gone.
+    """
+
+    def __init__(self, cache_dir: Path, writes_assets: bool = False) -> None:
+        self._decks_dir = cache_dir / "decks"
+        self._writes_assets = writes_assets
+
+    def _state_path(self, output_path: Path) -> Path:
+        digest = hashlib.sha256(str(output_path.resolve()).encode("utf-8")).hexdigest()
+        return self._decks_dir / f"{digest}.json"
+
+    def is_current(self, job: DeckJob, fingerprint: str) -> bool:
+        try:
+            state = json.loads(self._state_path(job.output_path).read_text(encoding="utf-8"))
+            output = ImageDependency(**state["output"])
+            images = [ImageDependency(**image) for image in state["images"]]
+            assets = [ImageDependency(**asset) for asset in state["assets"]]
+            recorded_fingerprint = state["fingerprint"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if recorded_fingerprint != fingerprint or not output.is_current():
+            return False
+        return all(dependency.is_current() for dependency in (*images, *assets))
+
+    def record(self, job: DeckJob, fingerprint: str, summary: BuildSummary) -> None:
+        output = ImageDependency.from_path(job.output_path.resolve())
+        state = {
+            "fingerprint": fingerprint,
+            "output": {"path": output.path, "mtime_ns": output.mtime_ns, "size": output.size},
+            "images": [
+                {"path": image.path, "mtime_ns": image.mtime_ns, "size": image.size} for image in summary.images
+            ],
+            "assets": [
+                {"path": asset.path, "mtime_ns": asset.mtime_ns, "size": asset.size}
+                for asset in self._asset_files(job)
+            ],
+        }
+        self._decks_dir.mkdir(parents=True, exist_ok=True)
+        self._state_path(job.output_path).write_text(json.dumps(state), encoding="utf-8")
+
+    def _asset_files(self, job: DeckJob) -> list[ImageDependency]:
+        if not self._writes_assets:
+            return []
+        assets_dir = external_assets_dir(job.output_path.resolve())
+        if not assets_dir.is_dir():
+            return []
+        # Temporary files of an interrupted write start with a dot.
+        files = sorted(path for path in assets_dir.iterdir() if path.is_file() and not path.name.startswith("."))
+        return [ImageDependency.from_path(path) for path in files]
+
+
+def _build_deck_job(
+    job: DeckJob, options: BuildOptions, slide_cache: SlideStore | None, image_cache: ImageCache
+) -> DeckResult:
+    started = time.perf_counter()
+    try:
+        summary = compile_markdown_file_to_html(job.input_path, job.output_path, options, slide_cache, image_cache)
+    except (OSError, ValueError) as exc:
+        return DeckResult(job=job, status="failed", seconds=time.perf_counter() - started, error=str(exc))
+    return DeckResult(job=job, status="built", seconds=time.perf_counter() - started, summary=summary)
+
+
+# Per-process caches used by pool workers when building decks with --jobs.
+_WORKER_SLIDE_CACHE: SlideCache | None = None
+_WORKER_IMAGE_CACHE: ImageCache | None = None
+
+
+def _init_batch_worker(options: BuildOptions) -> None:
+    global _WORKER_SLIDE_CACHE, _WORKER_IMAGE_CACHE
+    _WORKER_SLIDE_CACHE = SlideCache(options.cache_dir) if options.cache_dir is not None else None
+    _WORKER_IMAGE_CACHE = new_image_cache(options)
+
+
+def _build_deck_job_in_worker(job: DeckJob, options: BuildOptions) -> DeckResult:
+    assert _WORKER_IMAGE_CACHE is not None
+    return _build_deck_job(job, options, _WORKER_SLIDE_CACHE, _WORKER_IMAGE_CACHE)
+
+
+def build_many(
+    jobs: list[DeckJob],
+    options: BuildOptions | None = None,
+    workers: int = 1,
+    force: bool = False,
+) -> Iterator[DeckResult]:
+    """Builds decks in one process (or a pool of ``workers``), sharing engines and caches between them.
+
+    With a cache dir in ``options``, decks whose source, images, renderer configuration and output are
+    unchanged since their last build are skipped. Results are yielded in job order.
+    """
+    # Decks are the unit of parallelism here, so each one renders its slides serially.
+    options = replace(options or BuildOptions(), jobs=1)
+    state_store = None
+    if options.cache_dir is not None:
+        state_store = DeckStateStore(options.cache_dir, options.layout == "chunked" or options.image_mode == "external")
+
+    fingerprints: dict[int, str] = {}
+    results: dict[int, DeckResult] = {}
+    for position, job in enumerate(jobs):
+        started = time.perf_counter()
+        try:
+            fingerprints[position] = _deck_fingerprint(job, options)
+        except OSError as exc:
+            elapsed = time.perf_counter() - started
+            results[position] = DeckResult(job=job, status="failed", seconds=elapsed, error=str(exc))
+            continue
+        if not force and state_store is not None and state_store.is_current(job, fingerprints[position]):
+            results[position] = DeckResult(job=job, status="skipped", seconds=time.perf_counter() - started)
+
+    pending = [position for position in range(len(jobs)) if position not in results]
+    built = _build_pending(jobs, pending, options, workers)
+
+    for position, job in enumerate(jobs):
+        result = results.get(position) or next(built)
+        if result.status == "built" and state_store is not None and result.summary is not None:
+            state_store.record(job, fingerprints[position], result.summary)
+        yield result
+    built.close()
+
+
+def _build_pending(
+    jobs: list[DeckJob], pending: list[int], options: BuildOptions, workers: int
+) -> Iterator[DeckResult]:
+    if workers <= 1 or len(pending) <= 1:
+        slide_cache = SlideCache(options.cache_dir) if options.cache_dir is not None else None
+        image_cache = new_image_cache(options)
+        for position in pending:
+            yield _build_deck_job(jobs[position], options, slide_cache, image_cache)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(pending)), initializer=_init_batch_worker, initargs=(options,)
+    ) as pool:
+        yield from pool.map(
+            _build_deck_job_in_worker, [jobs[position] for position in pending], [options] * len(pending)
+        )
+
+
+def format_result(result: DeckResult) -> str:
+    line = f"{result.status:<8}{result.seconds * 1000:9.1f} ms  {result.job.input_path} -> {result.job.output_path}"
+    if result.summary is not None:
+        line += f" ({result.summary.slide_count} slides)"
+    if result.error is not None:
+        line += f": {result.error}"
+    return line
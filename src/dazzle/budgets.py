@@ -0,0 +1,242 @@
+"""Limits on what a single build may consume, for services that compile decks they did not write.
+
+A build that exceeds one of its ``BuildBudget`` limits stops with a ``BudgetExceededError`` naming the
+limit and, where there is one, the slide and its line in the source. A slide's time limit is checked
+between the stages of its conversion and before each code block is highlighted, so a slow slide stops
+at the next of those points; a single stage cannot be interrupted, and the size limits on the source
+keep each one short. The deck's time limit is checked as each slide finishes.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, TextIO
+import time
+
+if TYPE_CHECKING:
+    from dazzle.cache import ImageDependency
+    from dazzle.images import AssetResolver, EncodedImage
+    from dazzle.slides import Slide, SlideSource
+
+
+# Python-Markdown converts each level of list and blockquote nesting recursively, in time that grows with the
+# square of the depth, and runs out of stack a few hundred levels down. No slide needs this many.
+DEFAULT_NESTING_DEPTH = 64
+
+
+class BudgetExceededError(ValueError):
+    """Raised when a build goes over one of its budget's limits; ``limit`` is the field's name."""
+
+    def __init__(self, limit: str, message: str) -> None:
+        super().__init__(message)
+        self.limit = limit
+
+    def __reduce__(self) -> tuple[type[BudgetExceededError], tuple[str, str]]:
+        # Errors raised in --jobs workers are pickled back to the parent process.
+        return type(self), (self.limit, str(self))
+
+
+@dataclass(frozen=True)
+class BuildBudget:
+    """Upper bounds for one build; ``None`` leaves a resource unlimited.
+
+    Source and output sizes count UTF-8 encoded bytes and image sizes count the files as stored. Slide
+    time is the Markdown conversion of one slide, up to embedding its images, and deck time the wall time of
+    the whole build. In the
+    chunked layout the output includes the slide files. Nesting depth counts the list levels and
+    blockquote markers of a line; it is enforced at its default even for builds without a budget.
+    """
+
+    max_source_bytes: int | None = None
+    max_slide_source_bytes: int | None = None
+    max_slide_seconds: float | None = None
+    max_deck_seconds: float | None = None
+    max_image_bytes: int | None = None
+    max_deck_image_bytes: int | None = None
+    max_slide_output_bytes: int | None = None
+    max_output_bytes: int | None = None
+    max_slide_fragments: int | None = None
+    max_deck_fragments: int | None = None
+    max_nesting_depth: int | None = DEFAULT_NESTING_DEPTH
+
+    def __post_init__(self) -> None:
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if value is not None and value <= 0:
+                raise ValueError(f"Budget limit '{field.name}' must be positive.")
+
+
+# The limits by the names used on the command line, without their 'max_' prefix.
+BUDGET_LIMITS = tuple(field.name.removeprefix("max_") for field in fields(BuildBudget))
+
+
+def parse_budget(limits: dict[str, str]) -> BuildBudget:
+    """Builds a budget from command-line names and values such as ``{"slide_seconds": "2.5"}``."""
+    values: dict[str, float | int] = {}
+    for name, text in limits.items():
+        if name not in BUDGET_LIMITS:
+            raise ValueError(f"Unknown budget limit '{name}'; expected one of {', '.join(BUDGET_LIMITS)}.")
+        try:
+            values[f"max_{name}"] = float(text) if name.endswith("_seconds") else int(text)
+        except ValueError:
+            raise ValueError(f"Budget limit '{name}' needs a number, not '{text}'.") from None
+    return BuildBudget(**values)
+
+
+def _slide_label(index: int, slide_source: SlideSource) -> str:
+    return f"Slide {index + 1} (line {slide_source.start_line})"
+
+
+def check_source(budget: BuildBudget, source: str, slide_sources: list[SlideSource]) -> None:
+    """Checks the size of the deck's markdown and of each slide's."""
+    if budget.max_source_bytes is not None:
+        size = len(source.encode("utf-8"))
+        if size > budget.max_source_bytes:
+            raise BudgetExceededError(
+                "max_source_bytes", f"The source is {size} bytes; the budget allows {budget.max_source_bytes}."
+            )
+    if budget.max_slide_source_bytes is not None:
+        for index, slide_source in enumerate(slide_sources):
+            size = len(slide_source.markdown.encode("utf-8"))
+            if size > budget.max_slide_source_bytes:
+                raise BudgetExceededError(
+                    "max_slide_source_bytes",
+                    f"{_slide_label(index, slide_source)} is {size} bytes of markdown; "
+                    f"the budget allows {budget.max_slide_source_bytes}.",
+                )
+
+
+def check_slide_seconds(budget: BuildBudget | None, slide_source: SlideSource, seconds: float) -> None:
+    if budget is None or budget.max_slide_seconds is None or seconds <= budget.max_slide_seconds:
+        return
+    raise BudgetExceededError(
+        "max_slide_seconds",
+        f"The slide at line {slide_source.start_line} took {seconds:.2f} s to convert; "
+        f"the budget allows {budget.max_slide_seconds:g} s.",
+    )
+
+
+class SlideBudget:
+    """Checks each rendered slide, and the running totals of the deck, as slides stream past."""
+
+    def __init__(self, budget: BuildBudget) -> None:
+        self._budget = budget
+        self._started = time.perf_counter()
+        self._fragments = 0
+        self._image_bytes = 0
+        self._images: set[str] = set()
+
+    def check(self, slide: Slide, slide_source: SlideSource) -> Slide:
+        budget = self._budget
+        label = _slide_label(slide.index, slide_source)
+        fragments = len(slide.fragments)
+        if budget.max_slide_fragments is not None and fragments > budget.max_slide_fragments:
+            raise BudgetExceededError(
+                "max_slide_fragments",
+                f"{label} has {fragments} fragments; the budget allows {budget.max_slide_fragments}.",
+            )
+        self._fragments += fragments
+        if budget.max_deck_fragments is not None and self._fragments > budget.max_deck_fragments:
+            raise BudgetExceededError(
+                "max_deck_fragments",
+                f"The deck has more than {budget.max_deck_fragments} fragments by {label.lower()}.",
+            )
+        if budget.max_slide_output_bytes is not None:
+            size = len(slide.html.encode("utf-8"))
+            if size > budget.max_slide_output_bytes:
+                raise BudgetExceededError(
+                    "max_slide_output_bytes",
+                    f"{label} renders to {size} bytes of HTML; the budget allows {budget.max_slide_output_bytes}.",
+                )
+        self._check_images(slide.images, label)
+        if budget.max_deck_seconds is not None:
+            seconds = time.perf_counter() - self._started
+            if seconds > budget.max_deck_seconds:
+                raise BudgetExceededError(
+                    "max_deck_seconds",
+                    f"The build took {seconds:.2f} s by {label.lower()}; "
+                    f"the budget allows {budget.max_deck_seconds:g} s.",
+                )
+        return slide
+
+    def _check_images(self, images: tuple[ImageDependency, ...], label: str) -> None:
+        # BudgetedAssetResolver stops oversized images before they are read; slides from the slide cache never
+        # load theirs, so their recorded sizes are checked here.
+        max_image_bytes = self._budget.max_image_bytes
+        if max_image_bytes is not None:
+            for image in images:
+                if image.size > max_image_bytes:
+                    raise BudgetExceededError(
+                        "max_image_bytes",
+                        f"Image '{image.path}' is {image.size} bytes; the budget allows {max_image_bytes}.",
+                    )
+        limit = self._budget.max_deck_image_bytes
+        if limit is None:
+            return
+        for image in images:
+            if image.path not in self._images:
+                self._images.add(image.path)
+                self._image_bytes += image.size
+        if self._image_bytes > limit:
+            raise BudgetExceededError(
+                "max_deck_image_bytes",
+                f"The deck's images add up to {self._image_bytes} bytes by {label.lower()}; the budget allows {limit}.",
+            )
+
+
+class BudgetedAssetResolver:
+    """Rejects images over ``max_image_bytes`` before reading them."""
+
+    def __init__(self, resolver: AssetResolver, max_image_bytes: int) -> None:
+        self._resolver = resolver
+        self._max_image_bytes = max_image_bytes
+
+    def resolve(self, src: str) -> str | None:
+        return self._resolver.resolve(src)
+
+    def load(self, name: str) -> EncodedImage:
+        size = self._resolver.dependency(name).size
+        if size > self._max_image_bytes:
+            raise BudgetExceededError(
+                "max_image_bytes", f"Image '{name}' is {size} bytes; the budget allows {self._max_image_bytes}."
+            )
+        return self._resolver.load(name)
+
+    def dependency(self, name: str) -> ImageDependency:
+        return self._resolver.dependency(name)
+
+
+class OutputBudget:
+    """Counts the UTF-8 bytes of a build's output against ``max_output_bytes``."""
+
+    def __init__(self, max_output_bytes: int) -> None:
+        self._max_output_bytes = max_output_bytes
+        self._size = 0
+
+    def count(self, text: str) -> None:
+        self._size += len(text.encode("utf-8"))
+        if self._size > self._max_output_bytes:
+            raise BudgetExceededError(
+                "max_output_bytes",
+                f"The output grew past {self._max_output_bytes} bytes, the budget's limit.",
+            )
+
+    def count_slide(self, slide: Slide) -> Slide:
+        self.count(slide.html)
+        return slide
+
+    def wrap_stream(self, stream: TextIO) -> TextIO:
+        return _BudgetedStream(stream, self)
+
+
+class _BudgetedStream:
+    def __init__(self, stream: TextIO, budget: OutputBudget) -> None:
+        self._stream = stream
+        self._budget = budget
+
+    def write(self, text: str) -> int:
+        self._budget.count(text)
+        return self._stream.write(text)
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self._stream, name)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+import hashlib
+import json
+import os
+import threading
+
+from dazzle.files import write_atomically
+
+_CACHE_FORMAT = "3"
+
+
+@dataclass(frozen=True)
+class ImageDependency:
+    path: str
+    mtime_ns: int
+    size: int
+
+    @classmethod
+    def from_path(cls, path: Path) -> ImageDependency:
+        stat = path.stat()
+        return cls(path=str(path), mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+    def is_current(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size
+
+
+@dataclass(frozen=True)
+class RenderedMarkdown:
+    """One conversion's HTML, before its images are embedded."""
+
+    html: str
+    # Reveal order of each fragment, in document order.
+    fragment_orders: tuple[int, ...] = ()
+
+    @property
+    def fragment_count(self) -> int:
+        return len(self.fragment_orders)
+
+
+@dataclass(frozen=True)
+class RenderedSlide(RenderedMarkdown):
+    """A converted slide with its images embedded, as the slide cache stores it."""
+
+    images: tuple[ImageDependency, ...] = ()
+
+
+def slide_cache_key(markdown: str, source_dir: Path, fingerprint: str) -> str:
+    """Hashes everything that determines a slide's HTML apart from the images it references."""
+    digest = hashlib.sha256()
+    for part in (_CACHE_FORMAT, fingerprint, str(source_dir), markdown):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SlideStore(Protocol):
+    def get(self, key: str) -> RenderedSlide | None: ...
+
+    def put(self, key: str, slide: RenderedSlide) -> None: ...
+
+
+class SlideCache:
+    """Stores rendered slides on disk; entries whose referenced images changed are treated as misses."""
+
+    def __init__(self, cache_dir: Path) -> None:
+        self._slides_dir = cache_dir / "slides"
+
+    def _entry_path(self, key: str) -> Path:
+        return self._slides_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> RenderedSlide | None:
+        try:
+            raw = self._entry_path(key).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+        try:
+            data = json.loads(raw)
+            slide = RenderedSlide(
+                html=data["html"],
+                fragment_orders=tuple(data["fragment_orders"]),
+                images=tuple(ImageDependency(**image) for image in data["images"]),
+            )
+        except (ValueError, KeyError, TypeError):
+            return None
+
+        if not all(image.is_current() for image in slide.images):
+            return None
+        return slide
+
+    def put(self, key: str, slide: RenderedSlide) -> None:
+        payload = json.dumps(
+            {
+                "html": slide.html,
+                "fragment_orders": list(slide.fragment_orders),
+                "images": [
+                    {"path": image.path, "mtime_ns": image.mtime_ns, "size": image.size} for image in slide.images
+                ],
+            }
+        )
+        write_atomically(self._entry_path(key), payload)
+
+
+class MemorySlideCache:
+    """Keeps rendered slides in memory across builds, optionally in front of an on-disk SlideCache."""
+
+    def __init__(self, backing: SlideCache | None = None) -> None:
+        self._backing = backing
+        self._entries: dict[str, RenderedSlide] = {}
+        self._used: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> RenderedSlide | None:
+        slide = self._entries.get(key)
+        if slide is not None and not all(image.is_current() for image in slide.images):
+            slide = None
+        if slide is None and self._backing is not None:
+            slide = self._backing.get(key)
+            if slide is not None:
+                self._entries[key] = slide
+
+        if slide is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used.add(key)
+        return slide
+
+    def put(self, key: str, slide: RenderedSlide) -> None:
+        self._entries[key] = slide
+        self._used.add(key)
+        if self._backing is not None:
+            self._backing.put(key, slide)
+
+    def start_build(self) -> None:
+        """Drops entries the previous build did not use and resets the hit counters."""
+        self._entries = {key: slide for key, slide in self._entries.items() if key in self._used}
+        self._used = set()
+        self.hits = 0
+        self.misses = 0
+
+
+class SharedSlideCache:
+    """Keeps the most recently used rendered slides of any number of decks, for builds in many threads.
+
+    Unlike MemorySlideCache it never assumes one deck: the least recently used slides are evicted once
+    there are more than ``max_entries``. Entries whose referenced images changed are treated as misses.
+    """
+
+    def __init__(self, max_entries: int = 4096, backing: SlideCache | None = None) -> None:
+        self._max_entries = max_entries
+        self._backing = backing
+        self._entries: OrderedDict[str, RenderedSlide] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> RenderedSlide | None:
+        with self._lock:
+            slide = self._entries.get(key)
+            if slide is not None:
+                self._entries.move_to_end(key)
+        if slide is not None and not all(image.is_current() for image in slide.images):
+            slide = None
+        if slide is None and self._backing is not None:
+            slide = self._backing.get(key)
+            if slide is not None:
+                self._remember(key, slide)
+        return slide
+
+    def put(self, key: str, slide: RenderedSlide) -> None:
+        self._remember(key, slide)
+        if self._backing is not None:
+            self._backing.put(key, slide)
+
+    def _remember(self, key: str, slide: RenderedSlide) -> None:
+        with self._lock:
+            self._entries[key] = slide
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
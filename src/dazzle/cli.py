@@ -1,10 +1,23 @@
 from __future__ import annotations
 
 import argparse
+from contextlib import nullcontext
 from pathlib import Path
+from typing import TYPE_CHECKING
+import json
 import sys
+import time
 
-from dazzle.compiler import compile_markdown_file_to_html, compile_markdown_source_to_html
+from dazzle.budgets import BUDGET_LIMITS, BuildBudget, parse_budget
+from dazzle.highlight import HIGHLIGHT_MODES
+from dazzle.images import IMAGE_FORMATS, IMAGE_MODES, ImageOptimization, image_optimization_available
+from dazzle.render_html import OUTPUT_LAYOUTS
+
+# The compiler, markdown and the process pool are imported by the command that needs them, so that
+# `dazzle --help` and argument errors return without loading them.
+if TYPE_CHECKING:
+    from dazzle.compiler import BuildOptions
+    from dazzle.profiling import BuildProfiler
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -13,29 +26,382 @@ def build_parser() -> argparse.ArgumentParser:
 
     build_parser = subparsers.add_parser("build", help="Build a slide deck from markdown.")
     build_parser.add_argument("input", help="Path to markdown input file, or '-' to read from stdin.")
-    build_parser.add_argument("-o", "--output", required=True, help="Path to generated HTML output file.")
+    build_parser.add_argument(
+        "-o", "--output", required=True, help="Path to generated HTML output file, or '-' to write to stdout."
+    )
+    build_parser.add_argument(
+        "--cache-dir",
+        help="Directory for the incremental build cache (for example .dazzle-cache); unchanged slides are reused.",
+    )
+    build_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to render slides (default: 1).",
+    )
+    build_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Record time and peak allocations per build stage and slide, then print the slowest ones to stderr. "
+            "Slides are rendered serially while profiling."
+        ),
+    )
+    build_parser.add_argument("--profile-output", help="Also write the profile to this file.")
+    build_parser.add_argument(
+        "--profile-format",
+        choices=("json", "chrome"),
+        default="json",
+        help="Format of --profile-output: a JSON report or a Chrome trace (default: json).",
+    )
+
+    watch_parser = subparsers.add_parser("watch", help="Rebuild a slide deck whenever its sources change.")
+    watch_parser.add_argument("input", help="Path to markdown input file.")
+    watch_parser.add_argument("-o", "--output", required=True, help="Path to generated HTML output file.")
+    watch_parser.add_argument("--cache-dir", help="Directory for the incremental build cache.")
+    watch_parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.2,
+        help="Seconds between checks for changed files (default: 0.2).",
+    )
+
+    many_parser = subparsers.add_parser("build-many", help="Build many slide decks in one process.")
+    many_parser.add_argument("inputs", nargs="*", help="Markdown files or glob patterns (use quotes for '**').")
+    many_parser.add_argument(
+        "--manifest", help='JSON list of {"input": ..., "output": ...} objects, relative to the manifest file.'
+    )
+    many_parser.add_argument(
+        "-o", "--output-dir", help="Directory for decks matched by INPUTS; mirrors their directory layout."
+    )
+    many_parser.add_argument(
+        "--cache-dir",
+        default=".dazzle-cache",
+        help="Build cache shared by all decks; also records what each deck was built from (default: .dazzle-cache).",
+    )
+    many_parser.add_argument("--force", action="store_true", help="Rebuild decks even if their inputs are unchanged.")
+    many_parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="Number of worker processes that build decks (default: 1)."
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Compile decks on request for editors and previews, keeping engines and caches warm."
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1).")
+    serve_parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765).")
+    serve_parser.add_argument("--socket", help="Listen on this Unix socket instead of a TCP port.")
+    serve_parser.add_argument(
+        "--cache-dir", help="Also keep rendered slides in this build cache, so they survive a restart."
+    )
+    serve_parser.add_argument(
+        "--max-slides",
+        type=int,
+        default=4096,
+        help="Number of rendered slides kept in memory across all decks (default: 4096).",
+    )
+    serve_parser.add_argument("--verbose", action="store_true", help="Log every request to stderr.")
+
+    for subparser in (build_parser, watch_parser, many_parser, serve_parser):
+        subparser.add_argument(
+            "--image-mode",
+            choices=IMAGE_MODES,
+            default="inline",
+            help=(
+                "'inline' embeds a data URI per img tag; 'shared' emits each unique image once in an asset table; "
+                "'lazy' stores images in inert script blobs and 'external' writes them to a sibling <name>_assets "
+                "directory, both attached only near the active slide."
+            ),
+        )
+        subparser.add_argument(
+            "--highlight-mode",
+            choices=HIGHLIGHT_MODES,
+            default="inline",
+            help=(
+                "'inline' puts a style attribute on every highlighted token; 'classes' emits CSS classes and one "
+                "shared stylesheet, which looks the same and keeps code-heavy decks much smaller."
+            ),
+        )
+        subparser.add_argument(
+            "--optimize-images",
+            action="store_true",
+            help="Downscale and recompress raster images and strip their metadata before embedding (needs Pillow).",
+        )
+        subparser.add_argument(
+            "--image-max-dimension",
+            type=int,
+            default=1920,
+            help="Longest side of optimized images in pixels (default: 1920).",
+        )
+        subparser.add_argument(
+            "--image-format",
+            choices=IMAGE_FORMATS,
+            default="auto",
+            help="Encoding of optimized images; 'auto' keeps JPEG and WebP and stores the rest as PNG (default: auto).",
+        )
+        subparser.add_argument(
+            "--image-quality", type=int, default=82, help="JPEG/WebP quality of optimized images (default: 82)."
+        )
+        subparser.add_argument(
+            "--layout",
+            choices=OUTPUT_LAYOUTS,
+            default="single",
+            help=(
+                "'single' writes one self-contained HTML file; 'chunked' writes a small shell plus content-hashed "
+                "slide, theme and runtime files to a sibling <name>_assets directory, fetched by the runtime over "
+                "HTTP, so a redeploy only transfers what changed."
+            ),
+        )
+        subparser.add_argument(
+            "--compress",
+            action="store_true",
+            help=(
+                "Store every slide after the first gzip-compressed inside the single file; browsers expand "
+                "them with DecompressionStream when the deck opens."
+            ),
+        )
+        subparser.add_argument(
+            "--image-concurrency",
+            type=int,
+            default=8,
+            help="Number of images read and encoded at once while slides render (default: 8).",
+        )
+        subparser.add_argument(
+            "--budget",
+            action="append",
+            default=[],
+            metavar="LIMIT=VALUE",
+            help=(
+                "Stop the build when it goes over a limit; repeat for several. Sizes are in bytes and times in "
+                f"seconds. Limits: {', '.join(BUDGET_LIMITS)}."
+            ),
+        )
     return parser
 
 
+def _image_optimization(parser: argparse.ArgumentParser, args: argparse.Namespace) -> ImageOptimization | None:
+    if not args.optimize_images:
+        return None
+    if not image_optimization_available():
+        parser.error("--optimize-images needs Pillow; install it with: pip install 'dazzle[images]'")
+    try:
+        return ImageOptimization(
+            max_dimension=args.image_max_dimension, format=args.image_format, quality=args.image_quality
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+
+
+def _layout(parser: argparse.ArgumentParser, args: argparse.Namespace) -> str:
+    if args.layout == "chunked":
+        if getattr(args, "output", None) == "-":
+            parser.error("--layout chunked writes files next to the output and cannot write to stdout")
+        if args.image_mode not in ("inline", "external"):
+            parser.error("--layout chunked needs --image-mode inline or external")
+        if args.compress:
+            parser.error("--layout chunked cannot be combined with --compress")
+    return args.layout
+
+
+def _image_concurrency(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    if args.image_concurrency < 1:
+        parser.error("--image-concurrency must be at least 1")
+    return args.image_concurrency
+
+
+def _budget(parser: argparse.ArgumentParser, args: argparse.Namespace) -> BuildBudget | None:
+    if not args.budget:
+        return None
+    limits: dict[str, str] = {}
+    for item in args.budget:
+        name, separator, value = item.partition("=")
+        if not separator:
+            parser.error(f"--budget expects LIMIT=VALUE, not '{item}'")
+        limits[name.strip().replace("-", "_")] = value.strip()
+    try:
+        return parse_budget(limits)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+
+def _error(exc: Exception) -> int:
+    # Deck mistakes and exceeded budgets are the author's to fix, so they get a message, not a traceback.
+    print(f"dazzle: error: {exc}", file=sys.stderr, flush=True)
+    return 1
+
+
+def _build_many(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    from dazzle.batch import DeckJob, build_many, format_result, jobs_from_manifest, jobs_from_patterns
+    from dazzle.compiler import BuildOptions
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if not args.inputs and not args.manifest:
+        parser.error("build-many needs INPUTS or --manifest")
+    if args.inputs and not args.output_dir:
+        parser.error("--output-dir is required when INPUTS are given")
+
+    jobs: list[DeckJob] = []
+    if args.inputs:
+        jobs.extend(jobs_from_patterns(args.inputs, Path(args.output_dir)))
+    if args.manifest:
+        jobs.extend(jobs_from_manifest(Path(args.manifest)))
+
+    options = BuildOptions(
+        cache_dir=Path(args.cache_dir),
+        image_mode=args.image_mode,
+        highlight_mode=args.highlight_mode,
+        image_optimization=_image_optimization(parser, args),
+        image_concurrency=_image_concurrency(parser, args),
+        compress=args.compress,
+        layout=_layout(parser, args),
+        budget=_budget(parser, args),
+    )
+    started = time.perf_counter()
+    counts = {"built": 0, "skipped": 0, "failed": 0}
+    for result in build_many(jobs, options, workers=args.jobs, force=args.force):
+        counts[result.status] += 1
+        print(format_result(result), flush=True)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(
+        f"{counts['built']} built, {counts['skipped']} skipped, {counts['failed']} failed in {elapsed_ms:.0f} ms",
+        flush=True,
+    )
+    return 1 if counts["failed"] else 0
+
+
+def _serve(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    from dazzle.compiler import BuildOptions
+    from dazzle.server import CompileService, create_server
+
+    if args.image_mode == "external" or args.layout == "chunked":
+        parser.error("serve returns one document per request; --image-mode external and --layout chunked write files")
+    if args.max_slides < 1:
+        parser.error("--max-slides must be at least 1")
+    options = BuildOptions(
+        cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+        image_mode=args.image_mode,
+        highlight_mode=args.highlight_mode,
+        image_optimization=_image_optimization(parser, args),
+        image_concurrency=_image_concurrency(parser, args),
+        compress=args.compress,
+        budget=_budget(parser, args),
+    )
+    service = CompileService(options, max_slides=args.max_slides)
+    service.warm_up()
+    socket_path = Path(args.socket) if args.socket else None
+    server = create_server(service, args.host, args.port, socket_path, verbose=args.verbose)
+    if socket_path is not None:
+        address = str(socket_path)
+    else:
+        host, port = server.server_address[:2]
+        address = f"http://{host}:{port}"
+    print(f"dazzle serve listening on {address}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None:
+            socket_path.unlink(missing_ok=True)
+    return 0
+
+
+def _build(args: argparse.Namespace, options: BuildOptions, profiler: BuildProfiler | None) -> None:
+    from dazzle.compiler import compile_markdown_source_to_html, compile_markdown_source_to_stream
+
+    with profiler.stage("read input") if profiler is not None else nullcontext():
+        if args.input == "-":
+            source, source_name, source_dir = sys.stdin.read(), "stdin.md", Path.cwd()
+        else:
+            input_path = Path(args.input)
+            source = input_path.read_text(encoding="utf-8")
+            source_name, source_dir = input_path.name, input_path.parent
+
+    if args.output == "-":
+        compile_markdown_source_to_stream(source, source_name, source_dir, sys.stdout, options, profiler=profiler)
+    else:
+        compile_markdown_source_to_html(
+            source=source,
+            source_name=source_name,
+            source_dir=source_dir,
+            output_path=Path(args.output),
+            options=options,
+            profiler=profiler,
+        )
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
 
     if args.command == "build":
-        output_path = Path(args.output)
-        if args.input == "-":
-            source = sys.stdin.read()
-            compile_markdown_source_to_html(
-                source=source,
-                source_name="stdin.md",
-                source_dir=Path.cwd(),
-                output_path=output_path,
-            )
-        else:
-            input_path = Path(args.input)
-            compile_markdown_file_to_html(input_path, output_path)
+        if args.jobs < 1:
+            parser.error("--jobs must be at least 1")
+        if args.profile_output and not args.profile:
+            parser.error("--profile-output requires --profile")
+        from dazzle.compiler import BuildOptions
+        from dazzle.profiling import BuildProfiler
+
+        options = BuildOptions(
+            cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+            jobs=args.jobs,
+            image_mode=args.image_mode,
+            highlight_mode=args.highlight_mode,
+            image_optimization=_image_optimization(parser, args),
+            image_concurrency=_image_concurrency(parser, args),
+            compress=args.compress,
+            layout=_layout(parser, args),
+            budget=_budget(parser, args),
+        )
+        profiler = BuildProfiler() if args.profile else None
+        if profiler is not None:
+            profiler.start()
+        try:
+            _build(args, options, profiler)
+        except (OSError, ValueError) as exc:
+            return _error(exc)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+        if profiler is not None:
+            print(profiler.format_report(), file=sys.stderr)
+            if args.profile_output:
+                report = profiler.to_chrome_trace() if args.profile_format == "chrome" else profiler.to_json()
+                Path(args.profile_output).write_text(json.dumps(report, indent=2), encoding="utf-8")
         return 0
 
+    if args.command == "watch":
+        from dazzle.compiler import BuildOptions
+        from dazzle.watch import IncrementalBuilder, watch
+
+        options = BuildOptions(
+            cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+            image_mode=args.image_mode,
+            highlight_mode=args.highlight_mode,
+            image_optimization=_image_optimization(parser, args),
+            image_concurrency=_image_concurrency(parser, args),
+            compress=args.compress,
+            layout=_layout(parser, args),
+            budget=_budget(parser, args),
+        )
+        builder = IncrementalBuilder(Path(args.input), Path(args.output), options)
+        try:
+            watch(builder, interval=args.interval)
+        except (OSError, ValueError) as exc:
+            return _error(exc)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == "build-many":
+        return _build_many(parser, args)
+
+    if args.command == "serve":
+        return _serve(parser, args)
+
     parser.print_help()
     return 1
 
@@ -1,37 +1,204 @@
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Future
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
 from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, Sequence, TextIO
+import hashlib
+import json
+import os
 import re
+import threading
+import time
 
+import markdown
 from markdown import Markdown
-from dazzle.extensions.fragment_extension import FragmentExtension
-from dazzle.images import embed_images_in_html
-from dazzle.render_html import render_document
-from dazzle.slides import Deck, FragmentRef, Slide, split_markdown_into_slides
+import pygments
+
+from dazzle import __version__
+from dazzle.assets import AssetTable
+from dazzle.budgets import (
+    DEFAULT_NESTING_DEPTH,
+    BudgetedAssetResolver,
+    BuildBudget,
+    OutputBudget,
+    SlideBudget,
+    check_slide_seconds,
+    check_source,
+)
+from dazzle.cache import ImageDependency, RenderedMarkdown, RenderedSlide, SlideCache, SlideStore, slide_cache_key
+from dazzle.engine_pool import EnginePool
+from dazzle.extensions.bracket_extension import BracketExtension
+from dazzle.extensions.checkpoint_extension import CheckpointExtension
+from dazzle.extensions.fragment_extension import FragmentExtension, fragment_id, resolve_fragment_ids
+from dazzle.extensions.highlight_cache_extension import HighlightCache, HighlightCacheExtension
+from dazzle.files import open_output_atomically
+from dazzle.highlight import HIGHLIGHT_MODES, highlight_stylesheet
+from dazzle.images import (
+    IMAGE_MODES,
+    AssetResolver,
+    FileAssetResolver,
+    ImageCache,
+    ImageOptimization,
+    ImagePrefetcher,
+    embed_images_in_html,
+    optimization_fingerprint,
+)
+from dazzle.profiling import BuildProfiler
+from dazzle.render_html import OUTPUT_LAYOUTS, _load_asset, write_chunked_document, write_document
+from dazzle.slides import Deck, FragmentRef, Slide, SlideSource, split_markdown_into_slides
 
 
 _TITLE_RE = re.compile(r"^\s*#\s+(.+?)\s*$", re.MULTILINE)
 
+_MARKDOWN_EXTENSIONS = ["fenced_code", "codehilite", "tables", "md_in_html", "attr_list"]
+# fenced_code and codehilite pull in Pygments and its lexer registry, so they are only loaded for
+# slides that might contain a code block.
+_HIGHLIGHT_EXTENSIONS = ("fenced_code", "codehilite")
+_MARKDOWN_EXTENSION_CONFIGS = {
+    "codehilite": {
+        "guess_lang": False,
+        "use_pygments": True,
+        "noclasses": True,
+        "pygments_style": "monokai",
+    }
+}
+_PYGMENTS_STYLE = _MARKDOWN_EXTENSION_CONFIGS["codehilite"]["pygments_style"]
+
+# Anything that could start a code block: a fence, indentation (indented code, also inside lists and
+# quotes) or a raw <pre> that md_in_html might hand to codehilite. Slides without any of these render
+# byte-identically without the highlighting extensions.
+_CODE_BLOCK_HINT_RE = re.compile(r"```|~~~|    |\t|<pre", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class BuildOptions:
+    cache_dir: Path | None = None
+    jobs: int = 1
+    image_mode: str = "inline"
+    highlight_mode: str = "inline"
+    # Downscale and recompress embedded images; needs Pillow.
+    image_optimization: ImageOptimization | None = None
+    # Images read and encoded at once while rendering serially; 1 loads each one when its slide is rendered.
+    image_concurrency: int = 8
+    # Store every slide after the first gzip-compressed, expanded by the runtime when the deck opens.
+    compress: bool = False
+    # 'chunked' writes a shell document plus content-addressed slide files, for HTTP caching.
+    layout: str = "single"
+    # Limits that stop the build when a deck is too big or too slow to render; see dazzle.budgets.
+    budget: BuildBudget | None = None
 
-MARKDOWN_ENGINE = Markdown(
-    extensions=[
-        "fenced_code",
-        "codehilite",
-        "tables",
-        "md_in_html",
-        "attr_list",
-        FragmentExtension(),
-    ],
-    extension_configs={
+    def __post_init__(self) -> None:
+        if self.image_concurrency < 1:
+            raise ValueError("image_concurrency must be at least 1.")
+        if self.image_mode not in IMAGE_MODES:
+            raise ValueError(f"Unsupported image mode '{self.image_mode}'.")
+        if self.highlight_mode not in HIGHLIGHT_MODES:
+            raise ValueError(f"Unsupported highlight mode '{self.highlight_mode}'.")
+        if self.layout not in OUTPUT_LAYOUTS:
+            raise ValueError(f"Unsupported output layout '{self.layout}'.")
+        if self.layout == "chunked" and self.image_mode not in ("inline", "external"):
+            raise ValueError(
+                f"The 'chunked' layout needs the 'inline' or 'external' image mode, not '{self.image_mode}'."
+            )
+        if self.layout == "chunked" and self.compress:
+            raise ValueError("The 'chunked' layout cannot be compressed; let the web server compress its files.")
+
+
+def _extension_configs(highlight_mode: str) -> dict[str, dict[str, object]]:
+    if highlight_mode == "inline":
+        return _MARKDOWN_EXTENSION_CONFIGS
+    from dazzle.highlight_formatter import SharedStyleHtmlFormatter
+
+    return {
+        **_MARKDOWN_EXTENSION_CONFIGS,
         "codehilite": {
-            "guess_lang": False,
-            "use_pygments": True,
-            "noclasses": True,
-            "pygments_style": "monokai",
-        }
-    },
-    output_format="html5",
-)
+            **_MARKDOWN_EXTENSION_CONFIGS["codehilite"],
+            "noclasses": False,
+            "pygments_formatter": SharedStyleHtmlFormatter,
+        },
+    }
+
+
+def create_markdown_engine(
+    highlight_cache: HighlightCache | None = None, highlight_mode: str = "inline", highlighting: bool = True
+) -> Markdown:
+    """Builds an engine; without ``highlighting`` it lacks code block support and never imports Pygments."""
+    if not highlighting:
+        extensions = [name for name in _MARKDOWN_EXTENSIONS if name not in _HIGHLIGHT_EXTENSIONS]
+        return Markdown(
+            extensions=[*extensions, FragmentExtension(), BracketExtension(), CheckpointExtension()],
+            output_format="html5",
+        )
+    return Markdown(
+        extensions=[
+            *_MARKDOWN_EXTENSIONS,
+            FragmentExtension(),
+            BracketExtension(),
+            CheckpointExtension(),
+            HighlightCacheExtension(highlight_cache),
+        ],
+        extension_configs=_extension_configs(highlight_mode),
+        output_format="html5",
+    )
+
+
+def _needs_highlighting(markdown_source: str) -> bool:
+    return _CODE_BLOCK_HINT_RE.search(markdown_source) is not None
+
+
+def new_image_cache(options: BuildOptions) -> ImageCache:
+    """Image cache for builds with ``options``, persisted in their cache dir and applying their optimization."""
+    return ImageCache(options.cache_dir, optimization=options.image_optimization)
+
+
+def _render_fingerprint(options: BuildOptions) -> str:
+    """Identifies everything besides slide markdown that can change rendered output."""
+    config = {
+        "dazzle": __version__,
+        "image_mode": options.image_mode,
+        "highlight_mode": options.highlight_mode,
+        "image_optimization": (
+            optimization_fingerprint(options.image_optimization) if options.image_optimization is not None else None
+        ),
+        "markdown": markdown.__version__,
+        "pygments": pygments.__version__,
+        "extensions": _MARKDOWN_EXTENSIONS,
+        "extension_configs": _MARKDOWN_EXTENSION_CONFIGS,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# Builds in any thread borrow engines from these pools, keyed by (cache dir, highlight mode); (None, None)
+# holds the engines without highlighting, which every configuration shares. Pools are created on first use.
+_ENGINE_POOLS: dict[tuple[Path | None, str | None], EnginePool] = {}
+_ENGINE_POOLS_LOCK = threading.Lock()
+# Same bound as ThreadPoolExecutor's default worker count.
+_MAX_POOLED_ENGINES = min(32, (os.cpu_count() or 1) + 4)
+# Slides converted ahead of the one being written, so their images load while earlier slides are spliced.
+_IMAGE_PREFETCH_SLIDES = 16
+
+# Engine behind the MARKDOWN_ENGINE attribute, for single-threaded callers that drive Markdown directly.
+_DEFAULT_ENGINE: Markdown | None = None
+
+# Per-process engine configuration, image cache and resolver used by pool workers when rendering with --jobs.
+_WORKER_OPTIONS: tuple[Path | None, str] | None = None
+_WORKER_ENGINES: dict[bool, Markdown] = {}
+_WORKER_IMAGE_CACHE: ImageCache | None = None
+_WORKER_RESOLVER: AssetResolver | None = None
+_WORKER_BUDGET: BuildBudget | None = None
+
+
+def __getattr__(name: str) -> object:
+    # MARKDOWN_ENGINE used to be built at import time; building it on first access keeps CLI startup cheap.
+    global _DEFAULT_ENGINE
+    if name == "MARKDOWN_ENGINE":
+        if _DEFAULT_ENGINE is None:
+            _DEFAULT_ENGINE = create_markdown_engine()
+        return _DEFAULT_ENGINE
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def _infer_title(source: str, source_name: str) -> str:
@@ -41,37 +208,486 @@ def _infer_title(source: str, source_name: str) -> str:
     return Path(source_name).stem
 
 
-def render_markdown(md: Markdown, source: str) -> str:
+def render_markdown(md: Markdown, source: str, slide_index: int = 0) -> str:
+    """Converts ``source`` as slide ``slide_index`` of a deck, with its fragment ids filled in."""
     md.reset()
-    return md.convert(source)
+    return resolve_fragment_ids(md.convert(source), slide_index)
+
+
+def convert_markdown(
+    md: Markdown,
+    source: str,
+    lexed_lines: Sequence[str] | None = None,
+    checkpoint: Callable[[], None] | None = None,
+) -> RenderedMarkdown:
+    """Converts ``source`` and returns the HTML with the fragments found in it.
+
+    ``lexed_lines`` are the ``SlideSource.lines`` of a slide whose markdown is ``source``; they spare the
+    engine from lexing its fragment syntax again. ``checkpoint`` is called between the conversion's
+    stages and before each code block is highlighted; an exception it raises stops the conversion. The
+    fragment orders are read off ``md`` before it is handed back, so the caller must have the engine to
+    itself, for example through ``EnginePool.checkout``.
+    """
+    md.reset()
+    md.dazzle_lexed_lines = lexed_lines
+    md.dazzle_checkpoint = checkpoint
+    html = md.convert(source)
+    return RenderedMarkdown(html=html, fragment_orders=tuple(getattr(md, "dazzle_fragment_orders", ())))
+
+
+def _convert_slide(md: Markdown, slide_source: SlideSource, budget: BuildBudget | None = None) -> RenderedMarkdown:
+    started = time.perf_counter()
+    checkpoint: Callable[[], None] | None = None
+    if budget is not None and budget.max_slide_seconds is not None:
+        # Checked between stages, so a slow slide stops before highlighting or parsing the rest of it.
+        def checkpoint() -> None:
+            check_slide_seconds(budget, slide_source, time.perf_counter() - started)
+
+    try:
+        converted = convert_markdown(md, slide_source.markdown, slide_source.lines, checkpoint)
+    except RecursionError:
+        raise ValueError(f"The slide at line {slide_source.start_line} nests too deeply to convert.") from None
+    # Checked once more before the slide's images are embedded.
+    check_slide_seconds(budget, slide_source, time.perf_counter() - started)
+    return converted
+
+
+def _budgeted_resolver(resolver: AssetResolver, budget: BuildBudget | None) -> AssetResolver:
+    if budget is None or budget.max_image_bytes is None:
+        return resolver
+    return BudgetedAssetResolver(resolver, budget.max_image_bytes)
+
+
+def _new_engine(
+    cache_dir: Path | None,
+    highlight_mode: str,
+    highlighting: bool = True,
+    highlight_cache: HighlightCache | None = None,
+) -> Markdown:
+    if not highlighting:
+        return create_markdown_engine(highlighting=False)
+    return create_markdown_engine(highlight_cache or HighlightCache(cache_dir), highlight_mode)
+
+
+def _engine_pool(cache_dir: Path | None, highlight_mode: str, highlighting: bool = True) -> EnginePool:
+    key = (cache_dir, highlight_mode) if highlighting else (None, None)
+    with _ENGINE_POOLS_LOCK:
+        pool = _ENGINE_POOLS.get(key)
+        if pool is None:
+            # The pool's engines share one highlight cache, so a block highlighted by one is a hit for all.
+            highlight_cache = HighlightCache(cache_dir) if highlighting else None
+            pool = _ENGINE_POOLS[key] = EnginePool(
+                lambda: _new_engine(cache_dir, highlight_mode, highlighting, highlight_cache), _MAX_POOLED_ENGINES
+            )
+    return pool
+
+
+def _stage(profiler: BuildProfiler | None, name: str, slide: int | None = None) -> AbstractContextManager[None]:
+    return profiler.stage(name, slide) if profiler is not None else nullcontext()
+
+
+def _render_slide(
+    md: Markdown,
+    slide_source: SlideSource,
+    source_dir: Path,
+    resolver: AssetResolver,
+    image_mode: str,
+    profiler: BuildProfiler | None = None,
+    budget: BuildBudget | None = None,
+) -> RenderedSlide:
+    with _stage(profiler, "markdown"):
+        converted = _convert_slide(md, slide_source, budget)
+    return _embed_slide_images(converted, source_dir, resolver, image_mode, profiler)
 
 
-def compile_markdown_source_to_html(source: str, source_name: str, source_dir: Path, output_path: Path) -> None:
-    markdown_engine = MARKDOWN_ENGINE
-    split_sources = split_markdown_into_slides(source)
-    slides: list[Slide] = []
+def _embed_slide_images(
+    converted: RenderedMarkdown,
+    source_dir: Path,
+    resolver: AssetResolver,
+    image_mode: str,
+    profiler: BuildProfiler | None = None,
+) -> RenderedSlide:
+    embedded_images: list[str] = []
+    with _stage(profiler, "images"):
+        slide_html = embed_images_in_html(
+            converted.html, source_dir, embedded_images, image_mode=image_mode, resolver=resolver
+        )
+    images = tuple(resolver.dependency(name) for name in dict.fromkeys(embedded_images))
+    return RenderedSlide(html=slide_html, fragment_orders=converted.fragment_orders, images=images)
 
-    for index, slide_source in enumerate(split_sources):
-        slide_html = render_markdown(markdown_engine, slide_source.markdown)
-        slide_html = embed_images_in_html(slide_html, source_dir.resolve())
 
-        fragment_count = getattr(markdown_engine, "dazzle_fragment_count", 0)
-        fragments = [FragmentRef(id=f"s{index}-f{order}", order=order) for order in range(1, fragment_count + 1)]
-        slides.append(Slide(index=index, html=slide_html, fragments=fragments))
+def _init_render_worker(options: BuildOptions, resolver: AssetResolver | None) -> None:
+    global _WORKER_OPTIONS, _WORKER_IMAGE_CACHE, _WORKER_RESOLVER, _WORKER_BUDGET
+    _WORKER_OPTIONS = (options.cache_dir, options.highlight_mode)
+    _WORKER_ENGINES.clear()
+    _WORKER_IMAGE_CACHE = new_image_cache(options)
+    _WORKER_RESOLVER = resolver
+    _WORKER_BUDGET = options.budget
 
-    deck = Deck(slides=slides)
+
+def _render_slide_in_worker(slide_source: SlideSource, source_dir: Path, image_mode: str) -> RenderedSlide:
+    assert _WORKER_OPTIONS is not None and _WORKER_IMAGE_CACHE is not None
+    highlighting = _needs_highlighting(slide_source.markdown)
+    engine = _WORKER_ENGINES.get(highlighting)
+    if engine is None:
+        engine = _WORKER_ENGINES[highlighting] = _new_engine(*_WORKER_OPTIONS, highlighting)
+    resolver = _WORKER_RESOLVER or FileAssetResolver(source_dir, _WORKER_IMAGE_CACHE)
+    resolver = _budgeted_resolver(resolver, _WORKER_BUDGET)
+    return _render_slide(engine, slide_source, source_dir, resolver, image_mode, budget=_WORKER_BUDGET)
+
+
+def _iter_rendered_slides(
+    split_sources: list[SlideSource],
+    source_dir: Path,
+    options: BuildOptions,
+    slide_cache: SlideStore | None,
+    image_cache: ImageCache,
+    profiler: BuildProfiler | None = None,
+    resolver: AssetResolver | None = None,
+) -> Iterator[RenderedSlide]:
+    """Yields rendered slides in order, taking hits from the slide cache and rendering misses.
+
+    Serial rendering borrows engines from the shared pools, one slide at a time, while the images of
+    the next few slides are loaded on a thread pool (see ``_iter_prefetched_slides``). With jobs > 1 misses
+    go to a process pool with one engine per worker. Only a bounded window of slides is in flight at a
+    time, so slides can be streamed out while later ones are still rendering.
+    Profiled builds always render serially, with their own instrumented engines.
+    """
+    fingerprint = _render_fingerprint(options)
+
+    def lookup(slide_source: SlideSource) -> tuple[str | None, RenderedSlide | None]:
+        if slide_cache is None:
+            return None, None
+        cache_key = slide_cache_key(slide_source.markdown, source_dir, fingerprint)
+        return cache_key, slide_cache.get(cache_key)
+
+    def store(cache_key: str | None, rendered: RenderedSlide) -> RenderedSlide:
+        if slide_cache is not None and cache_key is not None:
+            slide_cache.put(cache_key, rendered)
+        return rendered
+
+    if options.jobs <= 1 or len(split_sources) <= 1 or profiler is not None:
+        local_resolver = _budgeted_resolver(resolver or FileAssetResolver(source_dir, image_cache), options.budget)
+        if profiler is None and options.image_concurrency > 1:
+            yield from _iter_prefetched_slides(split_sources, source_dir, options, local_resolver, lookup, store)
+            return
+        profiled_engines: dict[bool, Markdown] = {}
+
+        def checkout_engine(slide_source: SlideSource) -> AbstractContextManager[Markdown]:
+            highlighting = _needs_highlighting(slide_source.markdown)
+            if profiler is None:
+                return _engine_pool(options.cache_dir, options.highlight_mode, highlighting).checkout()
+            engine = profiled_engines.get(highlighting)
+            if engine is None:
+                engine = profiled_engines[highlighting] = _new_engine(
+                    options.cache_dir, options.highlight_mode, highlighting
+                )
+                profiler.instrument_markdown(engine)
+            return nullcontext(engine)
+
+        for index, slide_source in enumerate(split_sources):
+            with _stage(profiler, "slide", index):
+                with _stage(profiler, "cache lookup"):
+                    cache_key, rendered = lookup(slide_source)
+                if rendered is None:
+                    # The engine goes back to the pool before the slide is yielded to a possibly slow consumer.
+                    with checkout_engine(slide_source) as engine:
+                        rendered = _render_slide(
+                            engine,
+                            slide_source,
+                            source_dir,
+                            local_resolver,
+                            options.image_mode,
+                            profiler,
+                            options.budget,
+                        )
+                    rendered = store(cache_key, rendered)
+            yield rendered
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    window = options.jobs * 4
+    in_flight: deque[tuple[str | None, RenderedSlide | Future[RenderedSlide]]] = deque()
+
+    def finish() -> RenderedSlide:
+        cache_key, pending = in_flight.popleft()
+        if isinstance(pending, Future):
+            return store(cache_key, pending.result())
+        return pending
+
+    with ProcessPoolExecutor(
+        max_workers=min(options.jobs, len(split_sources)),
+        initializer=_init_render_worker,
+        initargs=(options, resolver),
+    ) as pool:
+        try:
+            for slide_source in split_sources:
+                cache_key, rendered = lookup(slide_source)
+                if rendered is None:
+                    in_flight.append(
+                        (cache_key, pool.submit(_render_slide_in_worker, slide_source, source_dir, options.image_mode))
+                    )
+                else:
+                    in_flight.append((cache_key, rendered))
+                if len(in_flight) >= window:
+                    yield finish()
+            while in_flight:
+                yield finish()
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+
+def _iter_prefetched_slides(
+    split_sources: list[SlideSource],
+    source_dir: Path,
+    options: BuildOptions,
+    resolver: AssetResolver,
+    lookup: Callable[[SlideSource], tuple[str | None, RenderedSlide | None]],
+    store: Callable[[str | None, RenderedSlide], RenderedSlide],
+) -> Iterator[RenderedSlide]:
+    """Serial rendering in two phases: convert a window of slides and start loading every image they
+    reference, then splice the loaded images into each slide in order.
+
+    At most ``options.image_concurrency`` images are read and encoded at once. Errors, from Markdown
+    or from an image, are raised at the slide that caused them, as in a build without prefetching.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    in_flight: deque[tuple[str | None, RenderedSlide | RenderedMarkdown, AssetResolver]] = deque()
+
+    def finish() -> RenderedSlide:
+        cache_key, pending, slide_resolver = in_flight.popleft()
+        if isinstance(pending, RenderedSlide):
+            return pending
+        return store(cache_key, _embed_slide_images(pending, source_dir, slide_resolver, options.image_mode))
+
+    with ThreadPoolExecutor(max_workers=options.image_concurrency, thread_name_prefix="dazzle-images") as executor:
+        prefetcher = ImagePrefetcher(resolver, executor)
+        try:
+            for slide_source in split_sources:
+                cache_key, rendered = lookup(slide_source)
+                if rendered is None:
+                    highlighting = _needs_highlighting(slide_source.markdown)
+                    try:
+                        with _engine_pool(options.cache_dir, options.highlight_mode, highlighting).checkout() as engine:
+                            converted = _convert_slide(engine, slide_source, options.budget)
+                    except Exception:
+                        # Earlier slides are still written, and their image errors take precedence.
+                        while in_flight:
+                            yield finish()
+                        raise
+                    in_flight.append((cache_key, converted, prefetcher.prefetch(converted.html)))
+                else:
+                    in_flight.append((cache_key, rendered, resolver))
+                if len(in_flight) >= _IMAGE_PREFETCH_SLIDES:
+                    yield finish()
+            while in_flight:
+                yield finish()
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+
+
+def iter_slides(
+    source: str,
+    source_dir: Path,
+    options: BuildOptions | None = None,
+    slide_cache: SlideStore | None = None,
+    image_cache: ImageCache | None = None,
+    profiler: BuildProfiler | None = None,
+    resolver: AssetResolver | None = None,
+) -> Iterator[Slide]:
+    """Renders slides lazily, one at a time, in document order.
+
+    Images come from ``resolver`` when given, otherwise from files relative to ``source_dir``. Slides are
+    checked against ``options.budget`` as they are rendered.
+    """
+    options = options or BuildOptions()
+    source_dir = source_dir.resolve()
+    slide_budget = SlideBudget(options.budget) if options.budget is not None else None
+    with _stage(profiler, "split"):
+        split_sources = split_markdown_into_slides(
+            source, options.budget.max_nesting_depth if options.budget is not None else DEFAULT_NESTING_DEPTH
+        )
+    if options.budget is not None:
+        check_source(options.budget, source, split_sources)
+    if slide_cache is None and options.cache_dir is not None:
+        slide_cache = SlideCache(options.cache_dir)
+    if image_cache is None:
+        image_cache = new_image_cache(options)
+
+    rendered_slides = _iter_rendered_slides(
+        split_sources, source_dir, options, slide_cache, image_cache, profiler, resolver
+    )
+    for index, rendered in enumerate(rendered_slides):
+        fragments = [
+            FragmentRef(id=fragment_id(index, position), order=order)
+            for position, order in enumerate(rendered.fragment_orders, start=1)
+        ]
+        slide_html = resolve_fragment_ids(rendered.html, index) if fragments else rendered.html
+        slide = Slide(index=index, html=slide_html, fragments=fragments, images=rendered.images)
+        if slide_budget is not None:
+            slide_budget.check(slide, split_sources[index])
+        yield slide
+
+
+def build_deck(
+    source: str,
+    source_dir: Path,
+    options: BuildOptions | None = None,
+    slide_cache: SlideStore | None = None,
+    image_cache: ImageCache | None = None,
+    assets_dir: Path | None = None,
+    profiler: BuildProfiler | None = None,
+    resolver: AssetResolver | None = None,
+) -> Deck:
+    """Renders the whole deck in memory. ``assets_dir`` receives image files in the external image mode."""
+    options = options or BuildOptions()
+    if image_cache is None:
+        image_cache = new_image_cache(options)
+    slides = iter_slides(source, source_dir, options, slide_cache, image_cache, profiler, resolver)
+    with _stage(profiler, "highlight stylesheet"):
+        stylesheet = highlight_stylesheet(options.highlight_mode, _PYGMENTS_STYLE)
+
+    if options.image_mode == "inline":
+        return Deck(slides=list(slides), stylesheet=stylesheet)
+    asset_table = AssetTable(options.image_mode, resolver or FileAssetResolver(source_dir, image_cache), assets_dir)
+    add_asset, render_assets = asset_table.add, asset_table.render
+    if profiler is not None:
+        add_asset, render_assets = profiler.timed("assets", add_asset), profiler.timed("asset table", render_assets)
+    return Deck(slides=[add_asset(slide) for slide in slides], assets_html=render_assets(), stylesheet=stylesheet)
+
+
+@dataclass(frozen=True)
+class BuildSummary:
+    slide_count: int
+    images: tuple[ImageDependency, ...]
+
+
+class _SlideTracker:
+    """Counts slides and remembers the images they embed as they stream past."""
+
+    def __init__(self) -> None:
+        self.slide_count = 0
+        self._images: dict[str, ImageDependency] = {}
+
+    def track(self, slide: Slide) -> Slide:
+        self.slide_count += 1
+        for image in slide.images:
+            self._images.setdefault(image.path, image)
+        return slide
+
+    def summary(self) -> BuildSummary:
+        return BuildSummary(slide_count=self.slide_count, images=tuple(self._images.values()))
+
+
+def compile_markdown_source_to_stream(
+    source: str,
+    source_name: str,
+    source_dir: Path,
+    stream: TextIO,
+    options: BuildOptions | None = None,
+    slide_cache: SlideStore | None = None,
+    image_cache: ImageCache | None = None,
+    assets_dir: Path | None = None,
+    profiler: BuildProfiler | None = None,
+    resolver: AssetResolver | None = None,
+    asset_spool: BinaryIO | None = None,
+) -> BuildSummary:
+    """Writes the document to ``stream`` slide by slide instead of assembling it in memory first.
+
+    Memory stays bounded by the slides in flight (up to 16 while their images load) with the images they
+    reference, plus the encoded images ``image_cache`` keeps for reuse (64 MiB by default). Images of the
+    shared and lazy modes wait for the end of the document in ``asset_spool``, a temporary file by default,
+    rather than in memory.
+    """
+    options = options or BuildOptions()
+    if image_cache is None:
+        image_cache = new_image_cache(options)
     title = _infer_title(source, source_name)
-    document = render_document(deck, title)
+    tracker = _SlideTracker()
+    slides = map(tracker.track, iter_slides(source, source_dir, options, slide_cache, image_cache, profiler, resolver))
+    with _stage(profiler, "highlight stylesheet"):
+        stylesheet = highlight_stylesheet(options.highlight_mode, _PYGMENTS_STYLE)
+    if profiler is not None:
+        with profiler.stage("theme assets"):
+            _load_asset("theme.css")
+            _load_asset("runtime.js")
+        stream = profiler.wrap_stream(stream)
+
+    if options.layout == "chunked" and assets_dir is None:
+        raise ValueError("The 'chunked' layout needs an output file to write the slide files next to.")
+    if options.budget is not None and options.budget.max_output_bytes is not None:
+        output_budget = OutputBudget(options.budget.max_output_bytes)
+        stream = output_budget.wrap_stream(stream)
+        if options.layout == "chunked":
+            # The slide files are part of the output too.
+            slides = map(output_budget.count_slide, slides)
+
+    render_assets: Callable[[], Iterable[str]] = lambda: ()
+    if options.image_mode != "inline":
+        asset_table = AssetTable(
+            options.image_mode, resolver or FileAssetResolver(source_dir, image_cache), assets_dir, asset_spool
+        )
+        add_asset, render_assets = asset_table.add, asset_table.iter_render
+        if profiler is not None:
+            add_asset = profiler.timed("assets", add_asset)
+            render_assets = profiler.timed_chunks("asset table", render_assets)
+        slides = map(add_asset, slides)
+    if options.layout == "chunked":
+        assert assets_dir is not None
+        write_chunked_document(stream, slides, title, assets_dir, render_assets, stylesheet)
+    else:
+        write_document(stream, slides, title, render_assets, stylesheet, options.compress)
+    return tracker.summary()
+
+
+def external_assets_dir(output_path: Path) -> Path:
+    """Directory next to the document that receives image files in the external image mode, and the slide,
+    theme and runtime files of the chunked layout."""
+    return output_path.with_name(f"{output_path.stem}_assets")
+
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(document, encoding="utf-8")
+def compile_markdown_source_to_html(
+    source: str,
+    source_name: str,
+    source_dir: Path,
+    output_path: Path,
+    options: BuildOptions | None = None,
+    slide_cache: SlideStore | None = None,
+    image_cache: ImageCache | None = None,
+    profiler: BuildProfiler | None = None,
+) -> BuildSummary:
+    with open_output_atomically(output_path) as stream:
+        return compile_markdown_source_to_stream(
+            source,
+            source_name,
+            source_dir,
+            stream,
+            options,
+            slide_cache,
+            image_cache,
+            assets_dir=external_assets_dir(output_path),
+            profiler=profiler,
+        )
 
 
-def compile_markdown_file_to_html(input_path: Path, output_path: Path) -> None:
+def compile_markdown_file_to_html(
+    input_path: Path,
+    output_path: Path,
+    options: BuildOptions | None = None,
+    slide_cache: SlideStore | None = None,
+    image_cache: ImageCache | None = None,
+) -> BuildSummary:
     source = input_path.read_text(encoding="utf-8")
-    compile_markdown_source_to_html(
+    return compile_markdown_source_to_html(
         source=source,
         source_name=input_path.name,
         source_dir=input_path.parent,
         output_path=output_path,
+        options=options,
+        slide_cache=slide_cache,
+        image_cache=image_cache,
     )
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Callable, Iterator
+import threading
+
+from markdown import Markdown
+
+
+class EnginePool:
+    """Lends Markdown engines to one caller at a time, building at most ``max_engines`` of them.
+
+    An engine holds per-conversion state from ``reset()`` until its output has been read, so two
+    threads must never share one. Callers beyond ``max_engines`` wait for an engine to be returned
+    rather than building more; conversion holds the GIL, so extra engines would only cost memory.
+    """
+
+    def __init__(self, factory: Callable[[], Markdown], max_engines: int) -> None:
+        if max_engines < 1:
+            raise ValueError("An engine pool needs room for at least one engine.")
+        self._factory = factory
+        self._max_engines = max_engines
+        self._idle: list[Markdown] = []
+        self._created = 0
+        self._returned = threading.Condition()
+
+    @property
+    def created(self) -> int:
+        return self._created
+
+    @contextmanager
+    def checkout(self) -> Iterator[Markdown]:
+        engine = self._acquire()
+        try:
+            yield engine
+        finally:
+            with self._returned:
+                self._idle.append(engine)
+                self._returned.notify()
+
+    def _acquire(self) -> Markdown:
+        with self._returned:
+            while not self._idle and self._created >= self._max_engines:
+                self._returned.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        # Engines are built outside the lock so other callers can return theirs meanwhile.
+        try:
+            return self._factory()
+        except BaseException:
+            with self._returned:
+                self._created -= 1
+                self._returned.notify()
+            raise
@@ -0,0 +1,162 @@
+"""Finds the text and target of links and images in linear time."""
+
+from __future__ import annotations
+
+import re
+
+from markdown.extensions import Extension
+from markdown.inlinepatterns import (
+    IMAGE_LINK_RE,
+    IMAGE_REFERENCE_RE,
+    LINK_RE,
+    REFERENCE_RE,
+    ImageInlineProcessor,
+    ImageReferenceInlineProcessor,
+    LinkInlineProcessor,
+    ReferenceInlineProcessor,
+    ShortImageReferenceInlineProcessor,
+    ShortReferenceInlineProcessor,
+)
+
+
+class _PairedText:
+    def __init__(self, text: str, valid_tail: int, closing: dict[int, int]) -> None:
+        self.text = text
+        # Length of the tail of ``text`` that ``closing`` describes.
+        self.valid_tail = valid_tail
+        # Distance from the end of the text of each opening bracket to the distance of its closing one.
+        self.closing = closing
+
+
+class BracketMatcher:
+    """Pairs every opening bracket of a text with the one that closes it, counting nested brackets.
+
+    Python-Markdown scans from each ``[`` (and each ``(`` after it) to the closing bracket, or to the end
+    of the text when there is none, so a paragraph of unclosed brackets took quadratic time. Here one pass
+    over the brackets serves every lookup. Positions are stored as distances from the end of the text: a
+    successful match only replaces text before the next lookup, so the pairs after it stay valid for the
+    rewritten text. The texts of a few enclosing conversions are kept, since a link's own text is
+    processed before the rest of its paragraph.
+    """
+
+    _MAX_TEXTS = 8
+
+    def __init__(self, opening: str, closing: str) -> None:
+        self._opening = opening
+        self._bracket_re = re.compile(f"[{re.escape(opening)}{re.escape(closing)}]")
+        self._texts: list[_PairedText] = []
+
+    def closing(self, data: str, index: int) -> int | None:
+        """Returns the position in ``data`` of the bracket closing the one just before ``index``."""
+        tail = len(data) - index + 1
+        paired = self._find(data, index, tail)
+        if paired is None:
+            paired = self._pair(data)
+        self._texts.insert(0, paired)
+        del self._texts[self._MAX_TEXTS :]
+        closing = paired.closing.get(tail)
+        return None if closing is None else len(data) - closing
+
+    def _find(self, data: str, index: int, tail: int) -> _PairedText | None:
+        for position, paired in enumerate(self._texts):
+            if tail > paired.valid_tail:
+                continue
+            if paired.text is data:
+                return self._texts.pop(position)
+            if data[index - 1 :] == paired.text[len(paired.text) - tail :]:
+                del self._texts[position]
+                return _PairedText(data, tail, paired.closing)
+        return None
+
+    def _pair(self, data: str) -> _PairedText:
+        size = len(data)
+        opened: list[int] = []
+        closing: dict[int, int] = {}
+        for match in self._bracket_re.finditer(data):
+            position = match.start()
+            if data[position] == self._opening:
+                opened.append(size - position)
+            elif opened:
+                closing[opened.pop()] = size - position
+        return _PairedText(data, size + 1, closing)
+
+
+class _LinkProcessor(LinkInlineProcessor):
+    """Replaces ``getText``, and ``getLink`` for targets without a title, with bracket lookups."""
+
+    def __init__(self, pattern: str, md=None) -> None:
+        super().__init__(pattern, md)
+        self.brackets = BracketMatcher("[", "]")
+        self.parens = BracketMatcher("(", ")")
+        # Last position of each character looked up in the most recent text.
+        self._last_text = ""
+        self._last_positions: dict[str, int] = {}
+
+    def getText(self, data: str, index: int) -> tuple[str, int, bool]:  # noqa: N802 (library API)
+        closing = self.brackets.closing(data, index)
+        if closing is None:
+            # Callers discard the text of an unclosed bracket.
+            return "", len(data), False
+        return data[index:closing], closing + 1, True
+
+    def getLink(self, data: str, index: int) -> tuple[str, str | None, int, bool]:  # noqa: N802 (library API)
+        match = self.RE_LINK.match(data, pos=index)
+        if match is None or match.group(1):
+            return super().getLink(data, index)
+        start = match.end()
+        closing = self.parens.closing(data, index + 1)
+        if closing is None:
+            # Only a quote switches Python-Markdown into title parsing, which can end a link whose
+            # parentheses do not balance.
+            if max(self._last(data, "'"), self._last(data, '"')) < start:
+                return "", None, index, False
+            return super().getLink(data, index)
+        if "'" in data[start:closing] or '"' in data[start:closing]:
+            return super().getLink(data, index)
+        return self.unescape(data[start:closing]).strip(), None, closing + 1, True
+
+    def _last(self, data: str, char: str) -> int:
+        if data is not self._last_text:
+            self._last_text, self._last_positions = data, {}
+        position = self._last_positions.get(char)
+        if position is None:
+            position = self._last_positions[char] = data.rfind(char)
+        return position
+
+
+class _ImageProcessor(_LinkProcessor, ImageInlineProcessor):
+    pass
+
+
+class _ReferenceProcessor(_LinkProcessor, ReferenceInlineProcessor):
+    pass
+
+
+class _ImageReferenceProcessor(_LinkProcessor, ImageReferenceInlineProcessor):
+    pass
+
+
+class _ShortReferenceProcessor(_LinkProcessor, ShortReferenceInlineProcessor):
+    pass
+
+
+class _ShortImageReferenceProcessor(_LinkProcessor, ShortImageReferenceInlineProcessor):
+    pass
+
+
+# Name, pattern and priority of each processor in markdown.inlinepatterns.build_inlinepatterns.
+_PROCESSORS = (
+    ("reference", _ReferenceProcessor, REFERENCE_RE, 170),
+    ("link", _LinkProcessor, LINK_RE, 160),
+    ("image_link", _ImageProcessor, IMAGE_LINK_RE, 150),
+    ("image_reference", _ImageReferenceProcessor, IMAGE_REFERENCE_RE, 140),
+    ("short_reference", _ShortReferenceProcessor, REFERENCE_RE, 130),
+    ("short_image_ref", _ShortImageReferenceProcessor, IMAGE_REFERENCE_RE, 125),
+)
+
+
+class BracketExtension(Extension):
+    def extendMarkdown(self, md) -> None:  # noqa: N802 (library API)
+        for name, processor_class, pattern, priority in _PROCESSORS:
+            if name in md.inlinePatterns:
+                md.inlinePatterns.register(processor_class(pattern, md), name, priority)
@@ -0,0 +1,53 @@
+"""Lets a conversion stop between its stages, for example once it runs over its time budget."""
+
+from __future__ import annotations
+
+from markdown.extensions import Extension
+from markdown.postprocessors import Postprocessor
+from markdown.preprocessors import Preprocessor
+from markdown.treeprocessors import Treeprocessor
+
+
+def run_checkpoint(md) -> None:
+    """Calls the checkpoint ``convert_markdown`` installed on ``md``, which raises to stop the conversion."""
+    checkpoint = getattr(md, "dazzle_checkpoint", None)
+    if checkpoint is not None:
+        checkpoint()
+
+
+class _CheckpointPreprocessor(Preprocessor):
+    def run(self, lines: list[str]) -> list[str]:
+        run_checkpoint(self.md)
+        return lines
+
+
+class _CheckpointTreeprocessor(Treeprocessor):
+    def run(self, root) -> None:
+        run_checkpoint(self.md)
+
+
+class _CheckpointPostprocessor(Postprocessor):
+    def run(self, text: str) -> str:
+        run_checkpoint(self.md)
+        return text
+
+
+class CheckpointExtension(Extension):
+    """Checks in after code blocks are highlighted, after the block parse and after serialization.
+
+    HighlightCachePreprocessor also checks in before highlighting each block that is not cached.
+    """
+
+    def extendMarkdown(self, md) -> None:  # noqa: N802 (library API)
+        self.md = md
+        md.registerExtension(self)
+        md.dazzle_checkpoint = None
+        # Between fenced_code (25) and html_block (20).
+        md.preprocessors.register(_CheckpointPreprocessor(md), "dazzle_checkpoint", 24)
+        # Just before inline (20).
+        md.treeprocessors.register(_CheckpointTreeprocessor(md), "dazzle_checkpoint", 21)
+        # Just before raw_html (30).
+        md.postprocessors.register(_CheckpointPostprocessor(md), "dazzle_checkpoint", 31)
+
+    def reset(self) -> None:
+        self.md.dazzle_checkpoint = None
@@ -1,92 +1,66 @@
 from __future__ import annotations
 
 import re
-from typing import Iterable
 from xml.etree.ElementTree import Element
 
 from markdown.extensions import Extension
 from markdown.preprocessors import Preprocessor
 from markdown.treeprocessors import Treeprocessor
+from markdown.util import ETX, STX
 
-_DIRECTIVE_RE = re.compile(r"^\s*:::\s*([A-Za-z0-9_-]+)\s*$")
-_DIRECTIVE_CLOSE_RE = re.compile(r"^\s*:::\s*$")
-_STAR_BULLET_RE = re.compile(r"^(\s*)\*\s+(.+)$")
-_FENCE_RE = re.compile(r"^\s*([`~]{3,})")
+from dazzle.slides import lex_fragment_lines
 
+# Stands in for the deck-wide fragment id until the slide's position is known, so rendered (and cached)
+# slide HTML does not depend on where the slide sits. Markdown strips STX/ETX from its input, so slide
+# content can never produce the placeholder itself.
+_FRAGMENT_ID_PLACEHOLDER = STX + "dazzle-fragment:{}" + ETX
+_FRAGMENT_ID_PLACEHOLDER_RE = re.compile(STX + r"dazzle-fragment:(\d+)" + ETX)
 
-class FragmentPreprocessor(Preprocessor):
-    def run(self, lines: Iterable[str]) -> list[str]:
-        output: list[str] = []
-        in_fragment = False
-        fragment_start_line = 0
-        fence_char: str | None = None
-        fence_len = 0
-
-        for idx, line in enumerate(lines, start=1):
-            fence_match = _FENCE_RE.match(line)
-            if fence_match:
-                marker = fence_match.group(1)
-                marker_char = marker[0]
-                marker_len = len(marker)
-                if fence_char is None:
-                    fence_char = marker_char
-                    fence_len = marker_len
-                    output.append(line)
-                    continue
-                if marker_char == fence_char and marker_len >= fence_len:
-                    fence_char = None
-                    fence_len = 0
-                    output.append(line)
-                    continue
-
-            if fence_char is not None:
-                output.append(line)
-                continue
 
-            if _DIRECTIVE_CLOSE_RE.match(line):
-                if in_fragment:
-                    in_fragment = False
-                    output.append("</div>")
-                    continue
-                raise ValueError(f"Unexpected directive close at line {idx}.")
-
-            match = _DIRECTIVE_RE.match(line)
-            if match:
-                directive = match.group(1)
-                if directive != "fragment":
-                    raise ValueError(f"Unsupported directive ':::{directive}' at line {idx}.")
-                if in_fragment:
-                    raise ValueError(f"Nested fragment directives are not supported (line {idx}).")
-                in_fragment = True
-                fragment_start_line = idx
-                output.append('<div class="fragment" markdown="block">')
-                continue
+def fragment_id(slide_index: int, position: int) -> str:
+    return f"s{slide_index}-f{position}"
+
 
-            if not in_fragment:
-                star_match = _STAR_BULLET_RE.match(line)
-                if star_match:
-                    indent, content = star_match.groups()
-                    output.append(f"{indent}- {content}")
-                    output.append(f"{indent}    {{: .fragment}}")
-                    continue
+def resolve_fragment_ids(html: str, slide_index: int) -> str:
+    """Replaces the placeholders stamped by FragmentTreeprocessor with the slide's fragment ids."""
+    return _FRAGMENT_ID_PLACEHOLDER_RE.sub(lambda match: fragment_id(slide_index, int(match.group(1))), html)
 
-            output.append(line)
 
-        if in_fragment:
-            raise ValueError(f"Unclosed fragment directive starting at line {fragment_start_line}.")
+class FragmentPreprocessor(Preprocessor):
+    """Rewrites fragment syntax for Markdown, or hands over the lines ``split_markdown_into_slides``
+    already rewrote when ``convert_markdown`` passed them in."""
 
-        return output
+    def run(self, lines: list[str]) -> list[str]:
+        lexed_lines = getattr(self.md, "dazzle_lexed_lines", None)
+        if lexed_lines is not None:
+            self.md.dazzle_lexed_lines = None
+            return list(lexed_lines)
+        return lex_fragment_lines(lines)
 
 
 class FragmentExtension(Extension):
     def extendMarkdown(self, md) -> None:  # noqa: N802 (library API)
+        self.md = md
+        md.registerExtension(self)
+        md.dazzle_fragment_count = 0
+        md.dazzle_fragment_orders = []
+        md.dazzle_lexed_lines = None
         md.preprocessors.register(FragmentPreprocessor(md), "dazzle_fragment_preprocessor", 35)
         md.treeprocessors.register(FragmentTreeprocessor(md), "dazzle_fragment_treeprocessor", 7)
 
+    def reset(self) -> None:
+        # Markdown skips the treeprocessors for blank input, so clear the previous conversion's count here.
+        self.md.dazzle_fragment_count = 0
+        self.md.dazzle_fragment_orders = []
+        self.md.dazzle_lexed_lines = None
+
 
 class FragmentTreeprocessor(Treeprocessor):
+    """Marks fragments hidden, numbers them in document order and records each one's reveal order."""
+
     def run(self, root: Element) -> Element:
         order = 0
+        reveal_orders: list[int] = []
 
         for element in root.iter():
             classes = element.get("class", "").split()
@@ -100,6 +74,13 @@ class FragmentTreeprocessor(Treeprocessor):
 
             if "data-fragment-order" not in element.attrib:
                 element.set("data-fragment-order", str(order))
+            element.set("data-fragment-id", _FRAGMENT_ID_PLACEHOLDER.format(order))
+
+            try:
+                reveal_orders.append(int(element.get("data-fragment-order", "")))
+            except ValueError:
+                reveal_orders.append(order)
 
         self.md.dazzle_fragment_count = order
+        self.md.dazzle_fragment_orders = reveal_orders
         return root
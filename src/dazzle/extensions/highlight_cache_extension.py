@@ -0,0 +1,141 @@
+"""Memoizes highlighted fenced code blocks across conversions."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import threading
+
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+
+from dazzle.extensions.checkpoint_extension import run_checkpoint
+from dazzle.files import write_atomically
+
+
+class HighlightCache:
+    """LRU cache of highlighted block HTML, optionally persisted under ``cache_dir/highlight``.
+
+    Safe to share between engines in different threads, as the engines of one pool do.
+    """
+
+    def __init__(self, cache_dir: Path | None = None, max_entries: int = 2048) -> None:
+        self._highlight_dir = cache_dir / "highlight" if cache_dir is not None else None
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _persisted_path(self, key: str) -> Path | None:
+        if self._highlight_dir is None:
+            return None
+        return self._highlight_dir / key[:2] / f"{key}.html"
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+
+        persisted_path = self._persisted_path(key)
+        if persisted_path is not None:
+            try:
+                html = persisted_path.read_text(encoding="utf-8")
+            except OSError:
+                html = None
+        if html is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        self._remember(key, html)
+        return html
+
+    def put(self, key: str, html: str) -> None:
+        self._remember(key, html)
+        persisted_path = self._persisted_path(key)
+        if persisted_path is None:
+            return
+        write_atomically(persisted_path, html)
+
+    def _remember(self, key: str, html: str) -> None:
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+class HighlightCachePreprocessor(Preprocessor):
+    """Serves fenced blocks from the cache before ``fenced_code`` sees them.
+
+    Misses are handed to the registered fenced_code preprocessor one block at a time, so cached HTML
+    is exactly what fenced_code and codehilite would have produced for that block.
+    """
+
+    def __init__(self, md, cache: HighlightCache) -> None:
+        super().__init__(md)
+        self._cache = cache
+        self._config_key: str | None = None
+
+    def _get_config_key(self) -> str:
+        if self._config_key is None:
+            from markdown.extensions.codehilite import CodeHiliteExtension
+            import pygments
+
+            codehilite_configs = [
+                ext.getConfigs() for ext in self.md.registeredExtensions if isinstance(ext, CodeHiliteExtension)
+            ]
+            fenced_config = getattr(self.md.preprocessors["fenced_code_block"], "config", {})
+            self._config_key = json.dumps(
+                [pygments.__version__, codehilite_configs, fenced_config], sort_keys=True, default=repr
+            )
+        return self._config_key
+
+    def run(self, lines: list[str]) -> list[str]:
+        if "fenced_code_block" not in self.md.preprocessors:
+            return lines
+        fenced = self.md.preprocessors["fenced_code_block"]
+        text = "\n".join(lines)
+        index = 0
+
+        while True:
+            match = fenced.FENCED_BLOCK_RE.search(text, index)
+            if match is None:
+                break
+
+            block = match.group(0)
+            key = hashlib.sha256(f"{self._get_config_key()}\0{block}".encode("utf-8")).hexdigest()
+            html = self._cache.get(key)
+            if html is not None:
+                replacement = f"\n{self.md.htmlStash.store(html)}\n"
+            else:
+                run_checkpoint(self.md)
+                stashed_before = self.md.htmlStash.html_counter
+                replacement = "\n".join(fenced.run(block.split("\n")))
+                if self.md.htmlStash.html_counter != stashed_before + 1:
+                    # fenced_code declined the block (e.g. malformed attributes); leave it untouched.
+                    index = match.end()
+                    continue
+                self._cache.put(key, self.md.htmlStash.rawHtmlBlocks[-1])
+
+            text = f"{text[:match.start()]}{replacement}{text[match.end():]}"
+            index = match.start() + len(replacement)
+
+        return text.split("\n")
+
+
+class HighlightCacheExtension(Extension):
+    def __init__(self, cache: HighlightCache | None = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.cache = cache if cache is not None else HighlightCache()
+
+    def extendMarkdown(self, md) -> None:  # noqa: N802 (library API)
+        # Runs just before fenced_code (priority 25).
+        md.preprocessors.register(HighlightCachePreprocessor(md, self.cache), "dazzle_highlight_cache", 26)
@@ -0,0 +1,35 @@
+"""Writes files in one step, so readers only ever see the previous content or the complete new one."""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, TextIO
+import os
+import tempfile
+
+
+@contextmanager
+def _open_atomically(path: Path, mode: str) -> Iterator[IO]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8") as handle:
+            yield handle
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def open_output_atomically(output_path: Path) -> Iterator[TextIO]:
+    """Opens a temporary file next to ``output_path`` that replaces it only once writing succeeded."""
+    with _open_atomically(output_path, "w") as handle:
+        yield handle
+
+
+def write_atomically(path: Path, data: str | bytes) -> None:
+    """Replaces ``path`` with ``data``, text as UTF-8, creating its directory when needed."""
+    with _open_atomically(path, "wb" if isinstance(data, bytes) else "w") as handle:
+        handle.write(data)
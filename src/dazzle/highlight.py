@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+
+HIGHLIGHT_MODES = ("inline", "classes")
+
+
+def highlight_stylesheet(highlight_mode: str, pygments_style: str) -> str:
+    """CSS for the ``classes`` highlight mode, holding exactly the styles ``inline`` puts on each element.
+
+    Pygments' own ``get_style_defs`` also sets an unscoped ``pre`` line height and a base text colour,
+    which inline output never does, so the rules are assembled here instead.
+    """
+    if highlight_mode == "inline":
+        return ""
+    from dazzle.highlight_formatter import SharedStyleHtmlFormatter
+
+    formatter = SharedStyleHtmlFormatter(style=pygments_style)
+    style = formatter.style
+    rules = [".codehilite pre { line-height: 125%; }"]
+    if style.background_color is not None:
+        rules.append(f".codehilite {{ background: {style.background_color} }}")
+    if style.highlight_color is not None:
+        rules.append(f".codehilite .hll {{ background-color: {style.highlight_color} }}")
+    rules.extend(formatter.get_shared_style_defs(".codehilite"))
+    return "\n".join(rules) + "\n"
@@ -0,0 +1,31 @@
+"""Pygments formatter for the ``classes`` highlight mode; imported only when code is highlighted."""
+
+from __future__ import annotations
+
+from pygments.formatters import HtmlFormatter
+
+
+class SharedStyleHtmlFormatter(HtmlFormatter):
+    """Emits one class per distinct token style rather than one per token type.
+
+    With ``noclasses`` Pygments merges neighbouring tokens that share a style into a single span; plain
+    class output cannot, because e.g. names and punctuation have different classes even when they look
+    the same. Naming each span after its style keeps the span structure of inline output, and tokens
+    without any style get no span at all.
+    """
+
+    def __init__(self, **options) -> None:
+        super().__init__(**options)
+        self._style_classes: dict[str, str] = {}
+        for name, (style, _ttype, _level) in sorted(self.class2style.items(), key=lambda item: (item[1][2], item[0])):
+            if name and style:
+                self._style_classes.setdefault(style, name)
+
+    def _get_css_classes(self, ttype) -> str:
+        styled_class = self._get_css_inline_styles(ttype)
+        if not styled_class:
+            return ""
+        return self._style_classes[self.class2style[styled_class][0]]
+
+    def get_shared_style_defs(self, prefix: str) -> list[str]:
+        return [f"{prefix} .{name} {{ {style} }}" for style, name in self._style_classes.items()]
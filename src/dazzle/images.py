@@ -1,33 +1,304 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from dataclasses import dataclass
+from html.parser import HTMLParser
 from pathlib import Path
+from typing import TYPE_CHECKING, Mapping, Protocol
 import base64
+import hashlib
+import importlib.util
+import io
+import json
 import mimetypes
+import posixpath
+import re
+import threading
 import urllib.parse
 
+from dazzle.cache import ImageDependency
+from dazzle.files import write_atomically
 from dazzle.html_parser import PassthroughHTMLParser
 
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
 
-def _to_data_uri(asset_path: Path) -> str:
+
+IMAGE_MODES = ("inline", "shared", "lazy", "external")
+IMAGE_FORMATS = ("auto", "webp", "jpeg", "png")
+ASSET_ATTRIBUTE = "data-dazzle-asset"
+
+# Raster formats the optimizer re-encodes. GIFs (which may be animated), SVGs and icons pass through.
+_OPTIMIZABLE_MIMES = frozenset({"image/png", "image/jpeg", "image/webp", "image/bmp", "image/tiff"})
+
+# Finds img tags in one pass. Comments, script/style bodies and every other start tag with its quoted
+# attributes are matched too, so img-like text inside them is skipped, exactly as a full HTML parse would.
+_IMG_SCAN_RE = re.compile(
+    r"<!--.*?-->"
+    r"|<(?P<raw>script|style)\b.*?</(?P=raw)\s*>"
+    r"""|(?P<img><img(?=[\s/>])(?:[^>"']|"[^"]*"|'[^']*')*>)"""
+    r"""|<[A-Za-z][^\s/>]*(?:[^>"']|"[^"]*"|'[^']*')*>""",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    asset_id: str
+    mime: str
+    data: str
+
+    @property
+    def data_uri(self) -> str:
+        return f"data:{self.mime};base64,{self.data}"
+
+
+@dataclass(frozen=True)
+class ImageOptimization:
+    """Settings for shrinking raster images before they are embedded. Needs the optional Pillow dependency."""
+
+    # Longest side in pixels; larger images are scaled down to fit.
+    max_dimension: int = 1920
+    # Target encoding; "auto" keeps JPEG and WebP as they are and stores everything else as PNG.
+    format: str = "auto"
+    # Lossy quality for JPEG and WebP, 1-100.
+    quality: int = 82
+
+    def __post_init__(self) -> None:
+        if self.max_dimension < 1:
+            raise ValueError("The maximum image dimension must be at least 1 pixel.")
+        if self.format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format '{self.format}'.")
+        if not 1 <= self.quality <= 100:
+            raise ValueError("Image quality must be between 1 and 100.")
+
+
+def image_optimization_available() -> bool:
+    return importlib.util.find_spec("PIL") is not None
+
+
+def optimization_fingerprint(settings: ImageOptimization) -> str:
+    """Identifies everything besides the input bytes that determines optimized output."""
+    import PIL
+
+    return json.dumps([PIL.__version__, settings.max_dimension, settings.format, settings.quality])
+
+
+class ImageOptimizer:
+    """Downscales, recompresses and strips metadata from images, memoized by content hash.
+
+    Results are kept in memory up to ``max_bytes`` and, with a ``cache_dir``, under ``cache_dir/optimized``.
+    """
+
+    def __init__(
+        self, settings: ImageOptimization, cache_dir: Path | None = None, max_bytes: int = 32 * 1024 * 1024
+    ) -> None:
+        if not image_optimization_available():
+            raise ImportError("Image optimization needs Pillow; install it with: pip install 'dazzle[images]'")
+        self.settings = settings
+        self.fingerprint = optimization_fingerprint(settings)
+        self._optimized_dir = cache_dir / "optimized" if cache_dir is not None else None
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[str, bytes]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def optimize(self, mime: str, raw: bytes) -> tuple[str, bytes]:
+        """Returns the (mime, bytes) to embed instead of ``raw``, which may be ``raw`` itself."""
+        if mime not in _OPTIMIZABLE_MIMES:
+            return mime, raw
+        key = hashlib.sha256(f"{self.fingerprint}\0{mime}\0".encode("utf-8") + raw).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._read_persisted(key)
+        if entry is None:
+            entry = _optimize_image_bytes(mime, raw, self.settings)
+            self._persist(key, entry)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self._size += len(entry[1])
+            while self._size > self._max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return entry
+
+    def _persisted_path(self, key: str) -> Path | None:
+        if self._optimized_dir is None:
+            return None
+        return self._optimized_dir / key[:2] / key
+
+    def _read_persisted(self, key: str) -> tuple[str, bytes] | None:
+        persisted_path = self._persisted_path(key)
+        if persisted_path is None:
+            return None
+        try:
+            mime, _, data = persisted_path.read_bytes().partition(b"\n")
+        except OSError:
+            return None
+        return mime.decode("ascii"), data
+
+    def _persist(self, key: str, entry: tuple[str, bytes]) -> None:
+        persisted_path = self._persisted_path(key)
+        if persisted_path is None:
+            return
+        write_atomically(persisted_path, entry[0].encode("ascii") + b"\n" + entry[1])
+
+
+def _optimize_image_bytes(mime: str, raw: bytes, settings: ImageOptimization) -> tuple[str, bytes]:
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(raw)) as opened:
+        if getattr(opened, "is_animated", False):
+            return mime, raw
+        icc_profile = opened.info.get("icc_profile")
+        # Lets the JPEG decoder scale down by a power of two while decoding instead of after.
+        opened.draft(None, (settings.max_dimension, settings.max_dimension))
+        # EXIF is dropped below, so its orientation has to be applied to the pixels first.
+        image = ImageOps.exif_transpose(opened)
+        resized = max(image.size) > settings.max_dimension
+        if resized:
+            image.thumbnail((settings.max_dimension, settings.max_dimension), Image.Resampling.LANCZOS)
+
+        target = settings.format
+        if target == "auto":
+            target = {"image/jpeg": "jpeg", "image/webp": "webp"}.get(mime, "png")
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+        if target == "jpeg" and has_alpha:
+            flattened = Image.new("RGB", image.size, "white")
+            flattened.paste(image.convert("RGBA"), mask=image.convert("RGBA").getchannel("A"))
+            image = flattened
+        elif target == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif target == "webp" and image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        # Only the colour profile is carried over; EXIF, XMP and comments are left behind.
+        save_options: dict[str, object] = {"icc_profile": icc_profile} if icc_profile else {}
+        if target == "jpeg":
+            save_options.update(quality=settings.quality, optimize=True, progressive=True)
+        elif target == "webp":
+            save_options.update(quality=settings.quality, method=6)
+        else:
+            save_options.update(optimize=True)
+        output = io.BytesIO()
+        image.save(output, format=target.upper(), **save_options)
+
+    optimized = output.getvalue()
+    if not resized and target == mime.removeprefix("image/") and len(optimized) >= len(raw):
+        # Re-encoding at the same size and format did not pay off.
+        return mime, raw
+    return f"image/{target}", optimized
+
+
+def _encode_image(asset_path: Path, optimizer: ImageOptimizer | None = None) -> EncodedImage:
     if not asset_path.exists():
         raise FileNotFoundError(f"Image file not found: {asset_path}")
     if not asset_path.is_file():
         raise IsADirectoryError(f"Image path is not a file: {asset_path}")
+    return _encode_image_bytes(asset_path.name, asset_path.read_bytes(), optimizer)
+
 
-    mime, _ = mimetypes.guess_type(asset_path.name)
+def _encode_image_bytes(name: str, raw: bytes, optimizer: ImageOptimizer | None = None) -> EncodedImage:
+    mime, _ = mimetypes.guess_type(name)
     if not mime or not mime.startswith("image/"):
-        raise ValueError(f"Unsupported image type for '{asset_path}'.")
+        raise ValueError(f"Unsupported image type for '{name}'.")
+    if optimizer is not None:
+        mime, raw = optimizer.optimize(mime, raw)
+    asset_id = hashlib.sha256(raw).hexdigest()[:16]
+    return EncodedImage(asset_id=asset_id, mime=mime, data=base64.b64encode(raw).decode("ascii"))
+
+
+class ImageCache:
+    """Encodes each image once per resolved path, mtime and size, optionally persisting results in a cache dir.
+
+    The in-memory part keeps at most ``max_bytes`` of encoded data, evicting the least recently used images;
+    beyond the slides in flight it is most of what a build holds in memory.
+    With ``optimization`` images are shrunk before they are encoded.
+    """
 
-    encoded = base64.b64encode(asset_path.read_bytes()).decode("ascii")
-    return f"data:{mime};base64,{encoded}"
+    def __init__(
+        self,
+        cache_dir: Path | None = None,
+        max_bytes: int = 64 * 1024 * 1024,
+        optimization: ImageOptimization | None = None,
+    ) -> None:
+        self._optimizer = ImageOptimizer(optimization, cache_dir) if optimization is not None else None
+        self._images_dir = cache_dir / "images" if cache_dir is not None else None
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, int, int], EncodedImage] = OrderedDict()
+        self._size = 0
+        # Guards the LRU bookkeeping so one cache can serve builds running in several threads.
+        self._lock = threading.Lock()
 
+    def load(self, asset_path: Path) -> EncodedImage:
+        try:
+            stat = asset_path.stat()
+        except OSError:
+            # Let the encoder raise the same errors as an uncached lookup.
+            return _encode_image(asset_path, self._optimizer)
 
-def _rewrite_img_src(src: str, markdown_dir: Path) -> str:
+        key = (str(asset_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                return image
+
+        image = self._read_persisted(key)
+        if image is None:
+            image = _encode_image(asset_path, self._optimizer)
+            self._persist(key, image)
+        self._remember(key, image)
+        return image
+
+    def _remember(self, key: tuple[str, int, int], image: EncodedImage) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.data)
+            self._entries[key] = image
+            self._size += len(image.data)
+            while self._size > self._max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.data)
+
+    def _persisted_path(self, key: tuple[str, int, int]) -> Path | None:
+        if self._images_dir is None:
+            return None
+        persisted_key = key if self._optimizer is None else [*key, self._optimizer.fingerprint]
+        digest = hashlib.sha256(json.dumps(persisted_key).encode("utf-8")).hexdigest()
+        return self._images_dir / digest[:2] / f"{digest}.json"
+
+    def _read_persisted(self, key: tuple[str, int, int]) -> EncodedImage | None:
+        persisted_path = self._persisted_path(key)
+        if persisted_path is None:
+            return None
+        try:
+            data = json.loads(persisted_path.read_text(encoding="utf-8"))
+            return EncodedImage(asset_id=data["asset_id"], mime=data["mime"], data=data["data"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _persist(self, key: tuple[str, int, int], image: EncodedImage) -> None:
+        persisted_path = self._persisted_path(key)
+        if persisted_path is None:
+            return
+        payload = {"asset_id": image.asset_id, "mime": image.mime, "data": image.data}
+        write_atomically(persisted_path, json.dumps(payload))
+
+
+def _resolve_img_path(src: str, markdown_dir: Path) -> Path | None:
+    """Returns the local file an img src points at, or None for inline data URIs."""
     parsed = urllib.parse.urlparse(src)
     if parsed.scheme in ("http", "https"):
         raise ValueError(f"Remote images are not allowed in v1: {src}")
     if parsed.scheme == "data":
-        return src
+        return None
     if parsed.scheme and parsed.scheme != "file":
         raise ValueError(f"Unsupported image URL scheme '{parsed.scheme}' for '{src}'.")
 
@@ -35,15 +306,181 @@ def _rewrite_img_src(src: str, markdown_dir: Path) -> str:
     img_path = Path(decoded_src)
     if not img_path.is_absolute():
         img_path = (markdown_dir / img_path).resolve()
-    return _to_data_uri(img_path)
+    return img_path
+
+
+class AssetResolver(Protocol):
+    """Finds the images that img srcs refer to.
+
+    ``resolve`` maps a src to a name that ``load`` and ``dependency`` accept, or to None for srcs that
+    stay as they are. Resolvers passed to builds with ``--jobs`` must be picklable.
+    """
+
+    def resolve(self, src: str) -> str | None: ...
+
+    def load(self, name: str) -> EncodedImage: ...
+
+    def dependency(self, name: str) -> ImageDependency: ...
+
+
+class FileAssetResolver:
+    """Reads images from files relative to the markdown directory; names are absolute paths."""
+
+    def __init__(self, markdown_dir: Path, image_cache: ImageCache | None = None) -> None:
+        self._markdown_dir = markdown_dir
+        self._image_cache = image_cache
+
+    def resolve(self, src: str) -> str | None:
+        img_path = _resolve_img_path(src, self._markdown_dir)
+        return str(img_path) if img_path is not None else None
+
+    def load(self, name: str) -> EncodedImage:
+        return self._image_cache.load(Path(name)) if self._image_cache else _encode_image(Path(name))
+
+    def dependency(self, name: str) -> ImageDependency:
+        return ImageDependency.from_path(Path(name))
+
+
+class MemoryAssetResolver:
+    """Serves images from a mapping of relative paths to file contents, without touching the filesystem.
+
+    Encoded images are memoized, so one resolver can be shared by many builds and threads.
+    """
+
+    def __init__(self, assets: Mapping[str, bytes], optimization: ImageOptimization | None = None) -> None:
+        self._assets = {_normalize_asset_name(name): bytes(content) for name, content in assets.items()}
+        self._encoded: dict[str, EncodedImage] = {}
+        self._optimizer = ImageOptimizer(optimization) if optimization is not None else None
+
+    def resolve(self, src: str) -> str | None:
+        parsed = urllib.parse.urlparse(src)
+        if parsed.scheme in ("http", "https"):
+            raise ValueError(f"Remote images are not allowed in v1: {src}")
+        if parsed.scheme == "data":
+            return None
+        if parsed.scheme:
+            raise ValueError(f"Unsupported image URL scheme '{parsed.scheme}' for '{src}'.")
+        name = _normalize_asset_name(urllib.parse.unquote(parsed.path))
+        if name not in self._assets:
+            raise FileNotFoundError(f"Image not found in assets: {src}")
+        return name
+
+    def load(self, name: str) -> EncodedImage:
+        image = self._encoded.get(name)
+        if image is None:
+            image = self._encoded[name] = _encode_image_bytes(name, self._assets[name], self._optimizer)
+        return image
+
+    def dependency(self, name: str) -> ImageDependency:
+        # No file backs the image, so a slide cache never treats it as current.
+        return ImageDependency(path=name, mtime_ns=-1, size=len(self._assets[name]))
+
+
+@dataclass(frozen=True)
+class _LoadedImage:
+    name: str
+    image: EncodedImage
+    dependency: ImageDependency
+
+
+class ImagePrefetcher:
+    """Resolves, reads and encodes images on an executor ahead of the slides that embed them.
+
+    ``prefetch`` starts loading every image a slide's HTML references and returns a resolver that
+    splices the results in. A failed load is re-raised by that resolver when the img is reached, so
+    errors keep the order, types and messages of loading each image in turn.
+    """
+
+    def __init__(self, resolver: AssetResolver, executor: Executor) -> None:
+        self._resolver = resolver
+        self._executor = executor
+        # Loads that have not finished yet, so a src shared by nearby slides is only read once.
+        self._in_flight: dict[str, Future[_LoadedImage | None]] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, html: str) -> AssetResolver:
+        loads = {src: self._submit(src) for src in dict.fromkeys(collect_image_sources(html))}
+        return _PrefetchedImages(self._resolver, loads)
+
+    def _submit(self, src: str) -> Future[_LoadedImage | None]:
+        with self._lock:
+            future = self._in_flight.get(src)
+            if future is None:
+                future = self._in_flight[src] = self._executor.submit(self._load, src)
+            else:
+                return future
+        future.add_done_callback(lambda done: self._forget(src, done))
+        return future
+
+    def _forget(self, src: str, done: Future[_LoadedImage | None]) -> None:
+        with self._lock:
+            if self._in_flight.get(src) is done:
+                del self._in_flight[src]
+
+    def _load(self, src: str) -> _LoadedImage | None:
+        name = self._resolver.resolve(src)
+        if name is None:
+            return None
+        return _LoadedImage(name, self._resolver.load(name), self._resolver.dependency(name))
+
+
+class _PrefetchedImages:
+    """Resolver for one slide that answers from its prefetched loads."""
+
+    def __init__(self, resolver: AssetResolver, loads: dict[str, Future[_LoadedImage | None]]) -> None:
+        self._resolver = resolver
+        self._loads = loads
+        self._loaded: dict[str, _LoadedImage] = {}
+
+    def resolve(self, src: str) -> str | None:
+        load = self._loads.get(src)
+        if load is None:
+            return self._resolver.resolve(src)
+        loaded = load.result()
+        if loaded is None:
+            return None
+        self._loaded[loaded.name] = loaded
+        return loaded.name
+
+    def load(self, name: str) -> EncodedImage:
+        loaded = self._loaded.get(name)
+        return loaded.image if loaded is not None else self._resolver.load(name)
+
+    def dependency(self, name: str) -> ImageDependency:
+        loaded = self._loaded.get(name)
+        return loaded.dependency if loaded is not None else self._resolver.dependency(name)
+
+
+def _normalize_asset_name(name: str) -> str:
+    return posixpath.normpath(name.replace("\\", "/")).lstrip("/")
 
 
 class ImageEmbeddingHTMLParser(PassthroughHTMLParser):
-    """Rewrites only img src attributes to embedded data URIs while passing through all other HTML."""
+    """Rewrites only img src attributes to embedded data URIs while passing through all other HTML.
+
+    In every other image mode the src attribute is replaced by a reference into the deck's asset table.
+    Images come from ``resolver`` when given, otherwise from files relative to ``markdown_dir``.
+    """
 
-    def __init__(self, markdown_dir: Path) -> None:
+    def __init__(
+        self,
+        markdown_dir: Path,
+        image_cache: ImageCache | None = None,
+        image_mode: str = "inline",
+        resolver: AssetResolver | None = None,
+    ) -> None:
         super().__init__()
-        self._markdown_dir = markdown_dir
+        self._resolver = resolver if resolver is not None else FileAssetResolver(markdown_dir, image_cache)
+        self._image_mode = image_mode
+        self.embedded_images: list[str] = []
+
+    def rewrite_tag(self, tag_html: str) -> str:
+        """Parses a single img tag and returns it re-emitted with its src rewritten."""
+        self.reset()
+        self._out = []
+        self.feed(tag_html)
+        self.close()
+        return self.get_html()
 
     def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
         if tag != "img":
@@ -61,14 +498,67 @@ class ImageEmbeddingHTMLParser(PassthroughHTMLParser):
         rewritten: list[tuple[str, str | None]] = []
         for name, value in attrs:
             if name == "src" and value is not None:
-                rewritten.append((name, _rewrite_img_src(value, self._markdown_dir)))
+                image_name = self._resolver.resolve(value)
+                if image_name is None:
+                    rewritten.append((name, value))
+                    continue
+                self.embedded_images.append(image_name)
+                image = self._resolver.load(image_name)
+                if self._image_mode != "inline":
+                    rewritten.append((ASSET_ATTRIBUTE, image.asset_id))
+                else:
+                    rewritten.append((name, image.data_uri))
             else:
                 rewritten.append((name, value))
         return rewritten
 
 
-def embed_images_in_html(html: str, markdown_dir: Path) -> str:
-    parser = ImageEmbeddingHTMLParser(markdown_dir)
-    parser.feed(html)
-    parser.close()
-    return parser.get_html()
+class _ImageSourceCollector(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.sources: list[str] = []
+
+    def collect(self, tag_html: str) -> None:
+        self.reset()
+        self.feed(tag_html)
+        self.close()
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "img":
+            self.sources.extend(value for name, value in attrs if name == "src" and value is not None)
+
+
+def collect_image_sources(html: str) -> list[str]:
+    """Every img src in ``html`` in document order, found exactly where ``embed_images_in_html`` looks."""
+    collector = _ImageSourceCollector()
+    for match in _IMG_SCAN_RE.finditer(html):
+        tag_html = match.group("img")
+        if tag_html is not None:
+            collector.collect(tag_html)
+    return collector.sources
+
+
+def embed_images_in_html(
+    html: str,
+    markdown_dir: Path,
+    embedded_images: list[str] | None = None,
+    image_cache: ImageCache | None = None,
+    image_mode: str = "inline",
+    resolver: AssetResolver | None = None,
+) -> str:
+    """Inlines local images; resolved image names are appended to ``embedded_images`` when given.
+
+    Only img tags are parsed and re-emitted; all other markup is copied through byte for byte.
+    """
+    parser = ImageEmbeddingHTMLParser(markdown_dir, image_cache, image_mode, resolver)
+
+    def rewrite(match: re.Match[str]) -> str:
+        tag_html = match.group("img")
+        if tag_html is None:
+            return match.group(0)
+        return parser.rewrite_tag(tag_html)
+
+    rewritten = _IMG_SCAN_RE.sub(rewrite, html)
+    if embedded_images is not None:
+        embedded_images.extend(parser.embedded_images)
+    return rewritten
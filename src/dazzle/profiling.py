@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, TextIO, TypeVar
+import functools
+import time
+import tracemalloc
+
+from markdown import Markdown
+
+
+_T = TypeVar("_T")
+
+
+@dataclass(frozen=True)
+class StageRecord:
+    name: str
+    slide: int | None
+    depth: int
+    start: float
+    seconds: float
+    # Highest traced memory during the stage, above what was allocated when it started.
+    peak_bytes: int
+
+
+class _OpenStage:
+    def __init__(self, baseline: int) -> None:
+        self.baseline = baseline
+        self.peak = baseline
+
+
+class BuildProfiler:
+    """Records wall time and peak allocations of nested build stages, optionally per slide.
+
+    Allocations come from tracemalloc, which slows Python code down noticeably; compare timings
+    between profiled runs rather than against unprofiled builds.
+    """
+
+    def __init__(self, trace_allocations: bool = True) -> None:
+        self.records: list[StageRecord] = []
+        self._trace_allocations = trace_allocations
+        self._open: list[_OpenStage] = []
+        self._origin = time.perf_counter()
+        self._started_tracing = False
+
+    def start(self) -> None:
+        if self._trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._origin = time.perf_counter()
+
+    def stop(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _fold_peak(self) -> int:
+        """Credits the peak since the last reset to every open stage; returns the current traced size."""
+        if not tracemalloc.is_tracing():
+            return 0
+        current, peak = tracemalloc.get_traced_memory()
+        for open_stage in self._open:
+            open_stage.peak = max(open_stage.peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    @contextmanager
+    def stage(self, name: str, slide: int | None = None) -> Iterator[None]:
+        open_stage = _OpenStage(self._fold_peak())
+        depth = len(self._open)
+        self._open.append(open_stage)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self._fold_peak()
+            self._open.pop()
+            self.records.append(
+                StageRecord(
+                    name=name,
+                    slide=slide,
+                    depth=depth,
+                    start=started - self._origin,
+                    seconds=seconds,
+                    peak_bytes=open_stage.peak - open_stage.baseline,
+                )
+            )
+
+    def timed(self, name: str, func: Callable[..., _T]) -> Callable[..., _T]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> _T:
+            with self.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def timed_chunks(self, name: str, func: Callable[..., Iterable[_T]]) -> Callable[..., Iterator[_T]]:
+        """Like ``timed`` for a function returning chunks; the stage lasts until the last chunk is consumed."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Iterator[_T]:
+            with self.stage(name):
+                yield from func(*args, **kwargs)
+
+        return wrapper
+
+    def instrument_markdown(self, md: Markdown) -> None:
+        """Times every processor of ``md`` separately. Meant for an engine created just for this build."""
+        for kind, registry in (
+            ("preprocessor", md.preprocessors),
+            ("treeprocessor", md.treeprocessors),
+            ("postprocessor", md.postprocessors),
+        ):
+            for processor in registry:
+                processor.run = self.timed(f"markdown {kind} {type(processor).__name__}", processor.run)
+        md.parser.parseDocument = self.timed("markdown block parser", md.parser.parseDocument)
+        md.serializer = self.timed("markdown serializer", md.serializer)
+
+    def wrap_stream(self, stream: TextIO) -> TextIO:
+        return _TimedStream(stream, self)
+
+    def slowest_slides(self, count: int) -> list[StageRecord]:
+        slides = [record for record in self.records if record.name == "slide"]
+        return sorted(slides, key=lambda record: record.seconds, reverse=True)[:count]
+
+    def stage_totals(self) -> list[tuple[str, int, float, int]]:
+        """(name, calls, total seconds, largest peak) per stage name, slowest first."""
+        totals: dict[str, tuple[int, float, int]] = {}
+        for record in self.records:
+            calls, seconds, peak = totals.get(record.name, (0, 0.0, 0))
+            totals[record.name] = (calls + 1, seconds + record.seconds, max(peak, record.peak_bytes))
+        rows = [(name, calls, seconds, peak) for name, (calls, seconds, peak) in totals.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def format_report(self, top: int = 10) -> str:
+        lines = ["stages (total time, calls, largest peak allocation):"]
+        for name, calls, seconds, peak in self.stage_totals()[:top]:
+            lines.append(f"  {seconds * 1000:9.1f} ms  {calls:6d}x  {_format_bytes(peak):>9}  {name}")
+        lines.append("slowest slides:")
+        for record in self.slowest_slides(top):
+            lines.append(
+                f"  {record.seconds * 1000:9.1f} ms  {_format_bytes(record.peak_bytes):>9}  slide {record.slide}"
+            )
+        return "\n".join(lines)
+
+    def to_json(self) -> dict[str, object]:
+        return {
+            "stages": [
+                {"name": name, "calls": calls, "seconds": seconds, "peak_bytes": peak}
+                for name, calls, seconds, peak in self.stage_totals()
+            ],
+            "records": [
+                {
+                    "name": record.name,
+                    "slide": record.slide,
+                    "depth": record.depth,
+                    "start": record.start,
+                    "seconds": record.seconds,
+                    "peak_bytes": record.peak_bytes,
+                }
+                for record in self.records
+            ],
+        }
+
+    def to_chrome_trace(self) -> dict[str, object]:
+        """Complete ("X") events in the Trace Event Format, loadable in chrome://tracing or Perfetto."""
+        events = []
+        for record in sorted(self.records, key=lambda record: (record.start, record.depth)):
+            args: dict[str, object] = {"peak_bytes": record.peak_bytes}
+            if record.slide is not None:
+                args["slide"] = record.slide
+            events.append(
+                {
+                    "name": record.name,
+                    "ph": "X",
+                    "ts": record.start * 1_000_000,
+                    "dur": record.seconds * 1_000_000,
+                    "pid": 1,
+                    "tid": 1,
+                    "args": args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class _TimedStream:
+    def __init__(self, stream: TextIO, profiler: BuildProfiler) -> None:
+        self._stream = stream
+        self._profiler = profiler
+
+    def write(self, text: str) -> int:
+        with self._profiler.stage("write"):
+            return self._stream.write(text)
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self._stream, name)
+
+
+def _format_bytes(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MiB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size} B"
@@ -1,31 +1,31 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from importlib import resources
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TextIO
+import base64
+import hashlib
 import html
+import json
+import urllib.parse
+import zlib
 
-from dazzle.slides import Deck
+from dazzle.assets import write_asset_file
+from dazzle.slides import Deck, FragmentRef, Slide
 
+
+# 'single' inlines everything into one document; 'chunked' writes a shell document plus one content-addressed
+# file per slide, theme and runtime, so a redeploy only changes the files whose content changed.
+OUTPUT_LAYOUTS = ("single", "chunked")
+
+
+@lru_cache(maxsize=None)
 def _load_asset(name: str) -> str:
     return resources.files("dazzle").joinpath(name).read_text(encoding="utf-8")
 
 
-def render_document(deck: Deck, title: str) -> str:
-    css = _load_asset("theme.css")
-    js = _load_asset("runtime.js")
-    slides_markup: list[str] = []
-
-    for slide in deck.slides:
-        slide_html = slide.html if slide.html.strip() else "<p></p>"
-        slides_markup.append(
-            (
-                f'<section class="slide" data-slide-index="{slide.index}"'
-                f' data-fragment-count="{len(slide.fragments)}">'
-                f"{slide_html}"
-                "</section>"
-            )
-        )
-
-    joined_slides = "\n".join(slides_markup)
+def _document_head(title: str, styles: str) -> str:
     safe_title = html.escape(title)
     return f"""<!doctype html>
 <html lang="en">
@@ -33,17 +33,193 @@ def render_document(deck: Deck, title: str) -> str:
   <meta charset="utf-8" />
   <meta name="viewport" content="width=device-width, initial-scale=1" />
   <title>{safe_title}</title>
-  <style>
-{css}
-  </style>
-</head>
+{styles}</head>
 <body>
   <main id="deck" tabindex="0" aria-label="Slide deck">
-{joined_slides}
-  </main>
-  <script>
-{js}
-  </script>
-</body>
-</html>
 """
+
+
+def render_document_head(title: str, stylesheet: str = "") -> str:
+    """``stylesheet`` is extra CSS (such as class-based highlighting rules) placed right after the theme."""
+    css = _load_asset("theme.css")
+    return _document_head(title, f"  <style>\n{css}\n{stylesheet}  </style>\n")
+
+
+def _slide_content(slide: Slide) -> str:
+    return slide.html if slide.html.strip() else "<p></p>"
+
+
+def render_slide_section(slide: Slide, active: bool = False, src: str | None = None) -> str:
+    """``active`` shows the slide before the runtime has started. With ``src`` the section is left empty
+    and the runtime fetches its content from that URL."""
+    slide_class = "slide is-active" if active else "slide"
+    src_attr = f' data-src="{html.escape(src)}"' if src is not None else ""
+    return (
+        f'<section class="{slide_class}" data-slide-index="{slide.index}"'
+        f' data-fragment-count="{len(slide.fragments)}"{src_attr}>'
+        f"{_slide_content(slide) if src is None else ''}"
+        "</section>"
+    )
+
+
+def render_fragment_manifest(slide_fragments: Iterable[list[FragmentRef]]) -> str:
+    """Lists each slide's fragment ids as [id, order] pairs in reveal order, so the runtime needs no DOM scans."""
+    manifest = {
+        "slides": [
+            [[fragment.id, fragment.order] for fragment in sorted(fragments, key=lambda fragment: fragment.order)]
+            for fragments in slide_fragments
+        ]
+    }
+    return (
+        '  <script type="application/json" id="dazzle-manifest">'
+        f'{json.dumps(manifest, separators=(",", ":"))}</script>\n'
+    )
+
+
+def _iter_document_tail(assets_html: str | Iterable[str], manifest_html: str, script: str) -> Iterator[str]:
+    yield "\n  </main>\n"
+    if isinstance(assets_html, str):
+        yield assets_html
+    else:
+        yield from assets_html
+    yield f"{manifest_html}{script}</body>\n</html>\n"
+
+
+def _runtime_script() -> str:
+    return f"  <script>\n{_load_asset('runtime.js')}\n  </script>\n"
+
+
+def render_document_tail(assets_html: str = "", manifest_html: str = "") -> str:
+    return "".join(_iter_document_tail(assets_html, manifest_html, _runtime_script()))
+
+
+def _no_assets() -> str:
+    return ""
+
+
+class _CompressedSlides:
+    """Gzips slide sections into the base64 text of one inert script blob, handed out as it fills up.
+
+    The runtime expands the blob with ``DecompressionStream`` before it starts. The blob is only opened
+    once a section arrives, so a deck of one slide has none.
+    """
+
+    def __init__(self) -> None:
+        # wbits 31 writes a gzip header with a zero timestamp, so the same deck always compresses the same.
+        self._compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+        self._pending = b""
+        self._opened = False
+
+    def add(self, section: str) -> str:
+        text = self._encode(self._compressor.compress(section.encode("utf-8")))
+        if not self._opened:
+            self._opened = True
+            return '\n<script type="application/octet-stream" id="dazzle-slides">' + text
+        return text
+
+    def close(self) -> str:
+        if not self._opened:
+            return ""
+        return self._encode(self._compressor.flush(), final=True) + "</script>"
+
+    def _encode(self, data: bytes, final: bool = False) -> str:
+        # base64 works on 3-byte groups, so a partial group waits for the next chunk.
+        data = self._pending + data
+        usable = len(data) if final else len(data) - len(data) % 3
+        self._pending = data[usable:]
+        return base64.b64encode(data[:usable]).decode("ascii")
+
+
+def iter_document(
+    slides: Iterable[Slide],
+    title: str,
+    assets_html: Callable[[], str | Iterable[str]] = _no_assets,
+    stylesheet: str = "",
+    compress: bool = False,
+) -> Iterator[str]:
+    """Yields the document piece by piece; ``assets_html`` is only called once every slide has been consumed.
+
+    ``assets_html`` may return the asset markup as one string or as chunks, which are yielded as they come.
+
+    With ``compress`` the first slide is written as is and shown straight away, while every later slide
+    goes into one gzip stream that the runtime expands on load.
+    """
+    yield render_document_head(title, stylesheet)
+    slide_fragments: list[list[FragmentRef]] = []
+    compressed = _CompressedSlides() if compress else None
+    for position, slide in enumerate(slides):
+        slide_fragments.append(slide.fragments)
+        if compressed is not None and position:
+            chunk = compressed.add("\n" + render_slide_section(slide))
+            if chunk:
+                yield chunk
+            continue
+        if position:
+            yield "\n"
+        yield render_slide_section(slide, active=compressed is not None)
+    if compressed is not None:
+        yield compressed.close()
+    yield from _iter_document_tail(assets_html(), render_fragment_manifest(slide_fragments), _runtime_script())
+
+
+def write_document(
+    stream: TextIO,
+    slides: Iterable[Slide],
+    title: str,
+    assets_html: Callable[[], str | Iterable[str]] = _no_assets,
+    stylesheet: str = "",
+    compress: bool = False,
+) -> None:
+    for chunk in iter_document(slides, title, assets_html, stylesheet, compress):
+        stream.write(chunk)
+
+
+def render_document(deck: Deck, title: str, compress: bool = False) -> str:
+    return "".join(iter_document(deck.slides, title, lambda: deck.assets_html, deck.stylesheet, compress))
+
+
+def _write_chunk(chunks_dir: Path, stem: str, suffix: str, content: str) -> str:
+    """Writes ``content`` to a file named after its hash and returns its URL relative to the shell document."""
+    data = content.encode("utf-8")
+    filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:16]}{suffix}"
+    write_asset_file(chunks_dir, filename, data)
+    return urllib.parse.quote(f"{chunks_dir.name}/{filename}")
+
+
+def iter_chunked_document(
+    slides: Iterable[Slide],
+    title: str,
+    chunks_dir: Path,
+    assets_html: Callable[[], str | Iterable[str]] = _no_assets,
+    stylesheet: str = "",
+) -> Iterator[str]:
+    """Yields a shell document and writes everything it loads into ``chunks_dir``, a sibling of the document.
+
+    Each slide, the theme (with ``stylesheet``) and the runtime go into a file named after its content
+    hash, so they can be cached forever and an edit only changes the files it touches. The shell keeps an
+    empty section per slide and the fragment manifest; the runtime fetches slides as they come near.
+    """
+    theme_url = _write_chunk(chunks_dir, "theme", ".css", f"{_load_asset('theme.css')}\n{stylesheet}")
+    yield _document_head(title, f'  <link rel="stylesheet" href="{theme_url}" />\n')
+    slide_fragments: list[list[FragmentRef]] = []
+    for position, slide in enumerate(slides):
+        if position:
+            yield "\n"
+        slide_fragments.append(slide.fragments)
+        yield render_slide_section(slide, src=_write_chunk(chunks_dir, "slide", ".html", _slide_content(slide)))
+    runtime_url = _write_chunk(chunks_dir, "runtime", ".js", _load_asset("runtime.js"))
+    yield from _iter_document_tail(
+        assets_html(), render_fragment_manifest(slide_fragments), f'  <script src="{runtime_url}"></script>\n'
+    )
+
+
+def write_chunked_document(
+    stream: TextIO,
+    slides: Iterable[Slide],
+    title: str,
+    chunks_dir: Path,
+    assets_html: Callable[[], str | Iterable[str]] = _no_assets,
+    stylesheet: str = "",
+) -> None:
+    for chunk in iter_chunked_document(slides, title, chunks_dir, assets_html, stylesheet):
+        stream.write(chunk)
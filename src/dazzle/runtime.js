@@ -1,34 +1,218 @@
-(function () {
+(async function () {
   const deck = document.getElementById("deck");
   if (!deck) {
     return;
   }
 
+  function decodeBase64(data) {
+    const binary = atob(data.trim());
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i += 1) {
+      bytes[i] = binary.charCodeAt(i);
+    }
+    return bytes;
+  }
+
+  // Compressed decks carry every slide after the first as one gzip stream, expanded in place before startup.
+  async function expandSlides(payload) {
+    if (typeof DecompressionStream === "undefined") {
+      payload.insertAdjacentHTML(
+        "afterend",
+        '<section class="slide"><p>The rest of this deck is compressed and needs a newer browser.</p></section>'
+      );
+    } else {
+      const stream = new Blob([decodeBase64(payload.textContent)]).stream();
+      const html = await new Response(stream.pipeThrough(new DecompressionStream("gzip"))).text();
+      payload.insertAdjacentHTML("afterend", html);
+    }
+    payload.remove();
+  }
+
+  const payload = document.getElementById("dazzle-slides");
+  if (payload) {
+    await expandSlides(payload);
+  }
+
   const slides = Array.from(deck.querySelectorAll(".slide"));
   let slideIndex = 0;
   let fragmentIndex = -1;
+  let shownSlideIndex = 0;
+
+  // Only the active slide and its neighbours keep their content in the live DOM; the others are
+  // parked in an inert <template>, which also lets the browser drop their decoded images.
+  const MOUNT_RADIUS = 1;
+  // Chunked decks ship empty sections whose content is fetched from data-src; slides this close are
+  // fetched ahead of time.
+  const FETCH_RADIUS = 2;
+  const mounted = new Set(Array.from(slides.keys()).filter((idx) => !slides[idx].dataset.src));
+  const templates = new Array(slides.length).fill(null);
+  const chunkRequests = new Map();
+  const fragmentTables = new Array(slides.length).fill(null);
+  let printing = false;
+
+  // Fragment ids per slide in reveal order, written by the compiler.
+  const manifestElement = document.getElementById("dazzle-manifest");
+  const manifest = manifestElement ? JSON.parse(manifestElement.textContent).slides : [];
+
+  const assetTable = document.getElementById("dazzle-assets");
+  const assets = assetTable ? JSON.parse(assetTable.textContent) : {};
+  const assetUrls = new Map();
+
+  function assetUrl(id) {
+    if (assetUrls.has(id)) {
+      return assetUrls.get(id);
+    }
+    const asset = assets[id];
+    if (!asset) {
+      return null;
+    }
+
+    let url = asset.url;
+    if (!url) {
+      const data = asset.data !== undefined ? asset.data : document.getElementById(asset.blob).textContent;
+      url = URL.createObjectURL(new Blob([decodeBase64(data)], { type: asset.mime }));
+    }
+    assetUrls.set(id, url);
+    return url;
+  }
+
+  function attachImages(root) {
+    root.querySelectorAll("img[data-dazzle-asset]:not([src])").forEach((img) => {
+      const url = assetUrl(img.dataset.dazzleAsset);
+      if (url) {
+        img.src = url;
+      }
+    });
+  }
+
+  function fetchSlide(idx) {
+    const slide = slides[idx];
+    if (!slide.dataset.src || chunkRequests.has(idx)) {
+      return;
+    }
+    const request = fetch(slide.dataset.src)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`${response.status} ${response.statusText}`);
+        }
+        return response.text();
+      })
+      .then((html) => {
+        const template = document.createElement("template");
+        template.innerHTML = html;
+        templates[idx] = template;
+        slide.prepend(template);
+        delete slide.dataset.src;
+        if (printing) {
+          mount(idx);
+          attachImages(slide);
+        } else if (Math.abs(idx - slideIndex) <= MOUNT_RADIUS) {
+          showState();
+        }
+      })
+      .catch((error) => {
+        // Forget the request so the slide is fetched again when navigation comes back to it.
+        chunkRequests.delete(idx);
+        console.error(`Could not load slide ${idx}:`, error);
+      });
+    chunkRequests.set(idx, request);
+  }
+
+  function mount(idx) {
+    if (mounted.has(idx)) {
+      return;
+    }
+    const template = templates[idx];
+    if (!template) {
+      fetchSlide(idx);
+      return;
+    }
+    slides[idx].appendChild(template.content);
+    mounted.add(idx);
+  }
+
+  function park(idx) {
+    if (!mounted.has(idx)) {
+      return;
+    }
+    const slide = slides[idx];
+    let template = templates[idx];
+    if (!template) {
+      template = document.createElement("template");
+      templates[idx] = template;
+    }
+    template.content.append(...Array.from(slide.childNodes).filter((node) => node !== template));
+    if (template.parentNode !== slide) {
+      slide.prepend(template);
+    }
+    mounted.delete(idx);
+  }
+
+  function syncMounted() {
+    if (printing) {
+      return;
+    }
+    mounted.forEach((idx) => {
+      if (Math.abs(idx - slideIndex) > MOUNT_RADIUS) {
+        park(idx);
+      }
+    });
+    const last = Math.min(slideIndex + MOUNT_RADIUS, slides.length - 1);
+    for (let idx = Math.max(slideIndex - MOUNT_RADIUS, 0); idx <= last; idx += 1) {
+      mount(idx);
+      attachImages(slides[idx]);
+    }
+    const lastFetched = Math.min(slideIndex + FETCH_RADIUS, slides.length - 1);
+    for (let idx = Math.max(slideIndex - FETCH_RADIUS, 0); idx <= lastFetched; idx += 1) {
+      fetchSlide(idx);
+    }
+  }
 
   function clamp(value, min, max) {
     return Math.min(Math.max(value, min), max);
   }
 
+  function fragmentCount(index) {
+    return (manifest[index] || []).length;
+  }
+
   function getFragmentsForSlide(index) {
-    return Array.from(slides[index].querySelectorAll("[data-fragment-order]")).sort((a, b) => {
-      return Number(a.dataset.fragmentOrder) - Number(b.dataset.fragmentOrder);
-    });
+    // Fragment nodes keep their identity while parked, so each slide is looked up once.
+    if (fragmentTables[index] === null) {
+      if (!mounted.has(index) && !templates[index]) {
+        return [];
+      }
+      const root = mounted.has(index) ? slides[index] : templates[index].content;
+      const byId = new Map();
+      root.querySelectorAll("[data-fragment-id]").forEach((fragment) => {
+        byId.set(fragment.dataset.fragmentId, fragment);
+      });
+      fragmentTables[index] = (manifest[index] || []).map(([id]) => byId.get(id)).filter(Boolean);
+    }
+    return fragmentTables[index];
   }
 
   function syncHash() {
     window.location.hash = `#/${slideIndex}/${Math.max(fragmentIndex, -1)}`;
   }
 
+  function setSlideClasses(idx) {
+    const slide = slides[idx];
+    slide.classList.toggle("is-active", idx === slideIndex);
+    slide.classList.toggle("is-before", idx < slideIndex);
+    slide.classList.toggle("is-after", idx > slideIndex);
+  }
+
   function showState() {
-    slides.forEach((slide, idx) => {
-      slide.classList.toggle("is-active", idx === slideIndex);
-      slide.classList.toggle("is-before", idx < slideIndex);
-      slide.classList.toggle("is-after", idx > slideIndex);
-    });
+    // Only slides between the previous and the new position change state.
+    const first = Math.min(shownSlideIndex, slideIndex);
+    const last = Math.max(shownSlideIndex, slideIndex);
+    for (let idx = first; idx <= last; idx += 1) {
+      setSlideClasses(idx);
+    }
+    shownSlideIndex = slideIndex;
 
+    syncMounted();
     const fragments = getFragmentsForSlide(slideIndex);
     fragments.forEach((fragment, idx) => {
       fragment.classList.toggle("is-hidden", idx > fragmentIndex);
@@ -44,9 +228,8 @@
     }
 
     const nextSlide = clamp(Number(match[1]), 0, slides.length - 1);
-    const fragments = getFragmentsForSlide(nextSlide);
     const requestedFragment = match[2] === undefined ? -1 : Number(match[2]);
-    const nextFragment = clamp(requestedFragment, -1, fragments.length - 1);
+    const nextFragment = clamp(requestedFragment, -1, fragmentCount(nextSlide) - 1);
 
     slideIndex = nextSlide;
     fragmentIndex = nextFragment;
@@ -54,8 +237,7 @@
   }
 
   function next() {
-    const fragments = getFragmentsForSlide(slideIndex);
-    if (fragmentIndex < fragments.length - 1) {
+    if (fragmentIndex < fragmentCount(slideIndex) - 1) {
       fragmentIndex += 1;
       showState();
       syncHash();
@@ -71,8 +253,7 @@
   }
 
   function prev() {
-    const fragments = getFragmentsForSlide(slideIndex);
-    if (fragmentIndex >= 0 && fragments.length > 0) {
+    if (fragmentIndex >= 0 && fragmentCount(slideIndex) > 0) {
       fragmentIndex -= 1;
       showState();
       syncHash();
@@ -81,8 +262,7 @@
 
     if (slideIndex > 0) {
       slideIndex -= 1;
-      const previousFragments = getFragmentsForSlide(slideIndex);
-      fragmentIndex = previousFragments.length - 1;
+      fragmentIndex = fragmentCount(slideIndex) - 1;
       showState();
       syncHash();
     }
@@ -100,9 +280,19 @@
 
   document.addEventListener("click", () => next());
   window.addEventListener("hashchange", applyHash);
+  window.addEventListener("beforeprint", () => {
+    printing = true;
+    // Slides of a chunked deck that have not been fetched yet are added to the printout as they arrive.
+    slides.forEach((_, idx) => mount(idx));
+    attachImages(deck);
+  });
+  window.addEventListener("afterprint", () => {
+    printing = false;
+    syncMounted();
+  });
 
+  slides.forEach((_, idx) => setSlideClasses(idx));
   applyHash();
   syncHash();
   deck.focus();
 })();
-
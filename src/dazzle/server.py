@@ -0,0 +1,244 @@
+"""A long-running compile server for editor and preview integrations.
+
+Spawning ``dazzle build`` for every preview pays for importing Markdown and Pygments, building engines
+and rendering every slide again. ``dazzle serve`` pays for that once: engines stay in the shared pools,
+images in one image cache and rendered slides in a slide cache shared by all decks, so a request after
+an edit only renders the slides that changed. Requests are served concurrently, one thread each.
+
+The protocol is JSON over HTTP, on localhost or a Unix socket:
+
+- ``POST /document`` with ``{"markdown": ..., "base_dir": ..., "source_name": ...}`` returns the
+  HTML document.
+- ``POST /slides`` with the same fields, plus an optional ``"slides"`` list of indices, returns the
+  slides as JSON.
+- ``GET /health`` reports that the server is up.
+
+``base_dir`` is the directory images are resolved against (default: the server's working directory)
+and ``source_name`` only provides the title of decks without a top-level heading.
+"""
+
+from __future__ import annotations
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+import io
+import json
+import socketserver
+import sys
+import traceback
+
+from dazzle import __version__
+from dazzle.budgets import BudgetExceededError
+from dazzle.cache import SharedSlideCache, SlideCache
+from dazzle.compiler import (
+    BuildOptions,
+    BuildSummary,
+    _infer_title,
+    build_deck,
+    compile_markdown_source_to_stream,
+    new_image_cache,
+)
+
+# Larger bodies are refused before they are read; budgets in the build options apply on top.
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+# Host headers accepted over TCP, so a web page cannot reach the server through DNS rebinding.
+_LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+_WARM_UP_SOURCE = "# Warm up\n\n* step\n\n---\n\n```python\nprint(1)\n```"
+
+
+class CompileService:
+    """Compiles decks for a long-running process, keeping engines, images and rendered slides warm.
+
+    Safe to call from many threads at once. Image modes and layouts that write files are refused,
+    since a preview has nowhere to put them.
+    """
+
+    def __init__(self, options: BuildOptions | None = None, max_slides: int = 4096) -> None:
+        options = options or BuildOptions()
+        if options.image_mode == "external":
+            raise ValueError("The 'external' image mode writes asset files and is not available when serving.")
+        if options.layout == "chunked":
+            raise ValueError("The 'chunked' layout writes slide files and is not available when serving.")
+        self.options = options
+        backing = SlideCache(options.cache_dir) if options.cache_dir is not None else None
+        self._slide_cache = SharedSlideCache(max_slides, backing)
+        self._image_cache = new_image_cache(options)
+
+    def warm_up(self) -> None:
+        """Imports Markdown and Pygments and builds both kinds of engine before the first request."""
+        self.document(_WARM_UP_SOURCE, Path.cwd())
+
+    def document(self, source: str, base_dir: Path, source_name: str = "deck.md") -> tuple[str, BuildSummary]:
+        stream = io.StringIO()
+        summary = compile_markdown_source_to_stream(
+            source, source_name, base_dir, stream, self.options, self._slide_cache, self._image_cache
+        )
+        return stream.getvalue(), summary
+
+    def slides(
+        self, source: str, base_dir: Path, source_name: str = "deck.md", indices: list[int] | None = None
+    ) -> dict[str, Any]:
+        deck = build_deck(source, base_dir, self.options, self._slide_cache, self._image_cache)
+        if indices is None:
+            indices = list(range(len(deck.slides)))
+        for index in indices:
+            if index >= len(deck.slides):
+                raise ValueError(f"Slide index {index} is out of range; the deck has {len(deck.slides)} slides.")
+        return {
+            "title": _infer_title(source, source_name),
+            "slide_count": len(deck.slides),
+            "stylesheet": deck.stylesheet,
+            "assets_html": deck.assets_html,
+            "slides": [
+                {
+                    "index": slide.index,
+                    "html": slide.html,
+                    "fragments": [{"id": fragment.id, "order": fragment.order} for fragment in slide.fragments],
+                }
+                for slide in (deck.slides[index] for index in indices)
+            ],
+        }
+
+
+class _BadRequest(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class CompileRequestHandler(BaseHTTPRequestHandler):
+    server_version = f"dazzle/{__version__}"
+    # Keep-alive spares editors a new connection per keystroke.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802 (library API)
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "version": __version__})
+        elif self.path in ("/document", "/slides"):
+            self._send_json(405, {"error": f"{self.path} expects POST."}, {"Allow": "POST"})
+        else:
+            self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+
+    def do_POST(self) -> None:  # noqa: N802 (library API)
+        if self.path not in ("/document", "/slides"):
+            self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+            return
+        try:
+            request = self._read_request()
+            source, base_dir, source_name = _deck_fields(request)
+            service: CompileService = self.server.service  # type: ignore[attr-defined]
+            if self.path == "/document":
+                document, summary = service.document(source, base_dir, source_name)
+                headers = {"X-Dazzle-Slide-Count": str(summary.slide_count)}
+                self._send(200, document.encode("utf-8"), "text/html; charset=utf-8", headers)
+            else:
+                self._send_json(200, service.slides(source, base_dir, source_name, _slide_indices(request)))
+        except _BadRequest as exc:
+            self._send_json(exc.status, {"error": str(exc)})
+        except BudgetExceededError as exc:
+            self._send_json(422, {"error": str(exc), "limit": exc.limit})
+        except (ValueError, OSError) as exc:
+            # Deck mistakes, such as an unclosed fragment or a missing image.
+            self._send_json(422, {"error": str(exc)})
+        except Exception as exc:
+            traceback.print_exc(file=sys.stderr)
+            self._send_json(500, {"error": f"Internal error: {exc}"})
+
+    def _read_request(self) -> dict[str, Any]:
+        if not self._host_allowed():
+            raise _BadRequest(403, "Only requests addressed to localhost are served.")
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        if content_type != "application/json":
+            # Browsers cannot send JSON to another origin without a preflight this server never approves.
+            raise _BadRequest(415, "Requests must be sent as application/json.")
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise _BadRequest(411, "Requests need a Content-Length.") from None
+        if length > MAX_REQUEST_BYTES:
+            self.close_connection = True
+            raise _BadRequest(413, f"Requests are limited to {MAX_REQUEST_BYTES} bytes.")
+        try:
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise _BadRequest(400, "The request body is not valid JSON.") from None
+        if not isinstance(request, dict):
+            raise _BadRequest(400, "The request body must be a JSON object.")
+        return request
+
+    def _host_allowed(self) -> bool:
+        if not isinstance(self.client_address, tuple):
+            # Unix sockets are guarded by their file permissions.
+            return True
+        host = self.headers.get("Host")
+        if host is None:
+            return True
+        name = host.rsplit(":", 1)[0] if not host.endswith("]") else host
+        return name in _LOCAL_HOSTS
+
+    def _send_json(self, status: int, payload: dict[str, Any], headers: dict[str, str] | None = None) -> None:
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 (library API)
+        # Editors send a request per keystroke; logging every one would flood the terminal.
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+
+def _deck_fields(request: dict[str, Any]) -> tuple[str, Path, str]:
+    source = request.get("markdown")
+    if not isinstance(source, str):
+        raise _BadRequest(400, "'markdown' must be a string.")
+    base_dir = request.get("base_dir", ".")
+    source_name = request.get("source_name", "deck.md")
+    if not isinstance(base_dir, str) or not isinstance(source_name, str):
+        raise _BadRequest(400, "'base_dir' and 'source_name' must be strings.")
+    if not Path(base_dir).is_dir():
+        raise _BadRequest(422, f"Base directory not found: {base_dir}")
+    return source, Path(base_dir), source_name
+
+
+def _slide_indices(request: dict[str, Any]) -> list[int] | None:
+    indices = request.get("slides")
+    if indices is None:
+        return None
+    if not isinstance(indices, list) or not all(isinstance(index, int) and index >= 0 for index in indices):
+        raise _BadRequest(400, "'slides' must be a list of slide indices.")
+    return indices
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(
+    service: CompileService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Path | None = None,
+    verbose: bool = False,
+) -> socketserver.BaseServer:
+    """Binds a threaded server to ``socket_path`` if given, otherwise to ``host`` and ``port``."""
+    server: socketserver.BaseServer
+    if socket_path is not None:
+        socket_path.unlink(missing_ok=True)
+        server = _ThreadingUnixServer(str(socket_path), CompileRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), CompileRequestHandler)
+    server.service = service  # type: ignore[attr-defined]
+    server.verbose = verbose  # type: ignore[attr-defined]
+    return server
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Iterable, Iterator
 import re
 
+from dazzle.budgets import DEFAULT_NESTING_DEPTH, BudgetExceededError
+from dazzle.cache import ImageDependency
+
 
 @dataclass(frozen=True)
 class SlideSource:
     markdown: str
     start_line: int
+    # The slide's lines with fragment syntax already rewritten for Markdown, as FragmentPreprocessor
+    # would produce them; None for a slide that did not come from ``split_markdown_into_slides``.
+    lines: tuple[str, ...] | None = None
 
 
 @dataclass(frozen=True)
@@ -21,25 +28,82 @@ class Slide:
     index: int
     html: str
     fragments: list[FragmentRef]
+    images: tuple[ImageDependency, ...] = ()
 
 
 @dataclass(frozen=True)
 class Deck:
     slides: list[Slide]
+    # Markup for the image asset table, emitted after the slides.
+    assets_html: str = ""
+    # Extra CSS emitted once after the theme, such as class-based highlighting rules.
+    stylesheet: str = ""
 
 
 _SLIDE_DELIMITER_RE = re.compile(r"^\s*---\s*$")
 _FENCE_RE = re.compile(r"^\s*([`~]{3,})")
-
-
-def split_markdown_into_slides(source: str) -> list[SlideSource]:
-    lines = source.splitlines()
-    slide_lines: list[str] = []
+_DIRECTIVE_RE = re.compile(r"^\s*:::\s*([A-Za-z0-9_-]+)\s*$")
+_DIRECTIVE_CLOSE_RE = re.compile(r"^\s*:::\s*$")
+_STAR_BULLET_RE = re.compile(r"^(\s*)\*\s+(.+)$")
+_NESTING_RE = re.compile(r"[ \t>]*")
+_LIST_MARKER_RE = re.compile(r"(?:[*+-]|\d+[.)])(?:[ \t]|$)")
+# A raw HTML block: a block-level tag at the start of a line, without md_in_html's markdown attribute. The
+# tags are markdown.util.BLOCK_LEVEL_ELEMENTS without the void <hr>, copied so lexing does not import Markdown.
+_HTML_BLOCK_RE = re.compile(r" {0,3}<([A-Za-z][A-Za-z0-9]*)(?=[\s/>]|$)")
+_HTML_BLOCK_TAGS = frozenset(
+    "address article aside blockquote body canvas center colgroup dd details div dl dt fieldset figcaption "
+    "figure footer form h1 h2 h3 h4 h5 h6 header hgroup html iframe legend li main map math menu nav "
+    "noscript object ol option output p pre progress script section style summary table tbody td textarea "
+    "tfoot th thead tr ul video".split()
+)
+
+
+def _nesting_depth(line: str) -> int:
+    """Blockquote markers plus, for a list item, four-space indentation levels at the start of ``line``.
+
+    Python-Markdown only recurses into nested lists and blockquotes; deeper indentation elsewhere is
+    a code block or a continuation line.
+    """
+    prefix = _NESTING_RE.match(line).group()
+    quotes = prefix.count(">")
+    if not _LIST_MARKER_RE.match(line, len(prefix)):
+        return quotes
+    indent = prefix.rpartition(">")[2].expandtabs(4) if quotes else prefix.expandtabs(4)
+    return quotes + len(indent) // 4
+
+
+def _html_block_tag(line: str) -> str | None:
+    match = _HTML_BLOCK_RE.match(line)
+    if match is None or match.group(1).lower() not in _HTML_BLOCK_TAGS or "markdown=" in line:
+        return None
+    return match.group(1).lower()
+
+
+def _html_depth_change(line: str, tag: str) -> int:
+    lowered = line.lower()
+    return len(re.findall(f"<{tag}(?=[\\s/>]|$)", lowered)) - len(re.findall(f"</{tag}\\s*>", lowered))
+
+
+def _lex(
+    lines: Iterable[str], split_slides: bool, max_nesting_depth: int | None
+) -> Iterator[tuple[int, list[str], list[str]]]:
+    """The single pass over a document's lines, tracking fences, slide delimiters and fragment syntax at once.
+
+    Yields each slide's first line number, its lines and its lines rewritten for Markdown: a
+    ``::: fragment`` block becomes a fragment div and a ``*`` bullet outside one becomes a ``-`` bullet
+    with a fragment class. Fenced code is left alone. Lists and blockquotes nested more than
+    ``max_nesting_depth`` levels deep are rejected, outside fenced code and raw HTML blocks. Errors report
+    line numbers in ``lines``.
+    """
+    raw: list[str] = []
+    lexed: list[str] = []
     slide_start = 1
-    slides: list[SlideSource] = []
-
+    in_fragment = False
+    fragment_start_line = 0
     fence_char: str | None = None
     fence_len = 0
+    html_tag: str | None = None
+    html_depth = 0
 
     for idx, line in enumerate(lines, start=1):
         fence_match = _FENCE_RE.match(line)
@@ -53,15 +117,87 @@ def split_markdown_into_slides(source: str) -> list[SlideSource]:
             elif marker_char == fence_char and marker_len >= fence_len:
                 fence_char = None
                 fence_len = 0
+            raw.append(line)
+            lexed.append(line)
+            continue
+
+        if fence_char is not None:
+            raw.append(line)
+            lexed.append(line)
+            continue
 
-        if fence_char is None and _SLIDE_DELIMITER_RE.match(line):
-            slides.append(SlideSource(markdown="\n".join(slide_lines), start_line=slide_start))
-            slide_lines = []
+        if split_slides and _SLIDE_DELIMITER_RE.match(line):
+            if in_fragment:
+                raise ValueError(f"Unclosed fragment directive starting at line {fragment_start_line}.")
+            yield slide_start, raw, lexed
+            raw = []
+            lexed = []
             slide_start = idx + 1
+            html_tag = None
+            continue
+
+        raw.append(line)
+        if html_tag is None:
+            html_tag, html_depth = _html_block_tag(line), 0
+        if html_tag is not None:
+            html_depth += _html_depth_change(line, html_tag)
+            if html_depth <= 0:
+                html_tag = None
+        elif max_nesting_depth is not None and line[:1] in (" ", "\t", ">"):
+            depth = _nesting_depth(line)
+            if depth > max_nesting_depth:
+                raise BudgetExceededError(
+                    "max_nesting_depth",
+                    f"Line {idx} is nested {depth} levels deep; the budget allows {max_nesting_depth}.",
+                )
+        if _DIRECTIVE_CLOSE_RE.match(line):
+            if not in_fragment:
+                raise ValueError(f"Unexpected directive close at line {idx}.")
+            in_fragment = False
+            lexed.append("</div>")
+            continue
+
+        match = _DIRECTIVE_RE.match(line)
+        if match:
+            directive = match.group(1)
+            if directive != "fragment":
+                raise ValueError(f"Unsupported directive ':::{directive}' at line {idx}.")
+            if in_fragment:
+                raise ValueError(f"Nested fragment directives are not supported (line {idx}).")
+            in_fragment = True
+            fragment_start_line = idx
+            lexed.append('<div class="fragment" markdown="block">')
             continue
 
-        slide_lines.append(line)
+        if not in_fragment:
+            star_match = _STAR_BULLET_RE.match(line)
+            if star_match:
+                indent, content = star_match.groups()
+                lexed.append(f"{indent}- {content}")
+                lexed.append(f"{indent}    {{: .fragment}}")
+                continue
+
+        lexed.append(line)
+
+    if in_fragment:
+        raise ValueError(f"Unclosed fragment directive starting at line {fragment_start_line}.")
+    yield slide_start, raw, lexed
+
+
+def split_markdown_into_slides(
+    source: str, max_nesting_depth: int | None = DEFAULT_NESTING_DEPTH
+) -> list[SlideSource]:
+    """Splits ``source`` at ``---`` lines outside fenced code and lexes each slide's fragment syntax.
+
+    Errors in the fragment syntax report line numbers in ``source``.
+    """
+    return [
+        SlideSource(markdown="\n".join(raw), start_line=start_line, lines=tuple(lexed))
+        for start_line, raw, lexed in _lex(source.splitlines(), True, max_nesting_depth)
+    ]
 
-    slides.append(SlideSource(markdown="\n".join(slide_lines), start_line=slide_start))
-    return slides
 
+def lex_fragment_lines(lines: Iterable[str], max_nesting_depth: int | None = DEFAULT_NESTING_DEPTH) -> list[str]:
+    """Rewrites the fragment syntax of a single slide's lines for Markdown."""
+    _, _, lexed = next(_lex(lines, False, max_nesting_depth))
+    return lexed
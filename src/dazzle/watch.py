@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, TextIO
+import sys
+import time
+
+from dazzle.cache import MemorySlideCache, SlideCache
+from dazzle.compiler import (
+    BuildOptions,
+    _infer_title,
+    build_deck,
+    external_assets_dir,
+    new_image_cache,
+    open_output_atomically,
+)
+from dazzle.render_html import iter_document, write_chunked_document
+
+
+@dataclass(frozen=True)
+class BuildReport:
+    slide_count: int
+    rendered_count: int
+    seconds: float
+    # Bytes written to the output document; the per-slide files of the chunked layout are not counted.
+    written_bytes: int = 0
+
+
+@dataclass(frozen=True)
+class _WrittenDocument:
+    pieces: tuple[str, ...]
+    # Byte offset of each piece in the file, followed by the file size.
+    offsets: tuple[int, ...]
+    signature: tuple[int, int, int] | None
+
+
+def _file_signature(path: Path) -> tuple[int, int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _common_prefix(old: tuple[str, ...], new: tuple[str, ...]) -> int:
+    for index, (old_piece, new_piece) in enumerate(zip(old, new)):
+        if old_piece != new_piece:
+            return index
+    return min(len(old), len(new))
+
+
+class IncrementalBuilder:
+    """Rebuilds one deck repeatedly, keeping rendered slides in memory so only edited slides are re-rendered.
+
+    The single-file document is patched rather than replaced: the file is rewritten from the section of the
+    first edited slide on, and left alone when nothing changed. If the file was touched by anything else
+    since, it is replaced as a whole. The chunked layout only writes the files of edited slides and the
+    shell document.
+    """
+
+    def __init__(self, input_path: Path, output_path: Path, options: BuildOptions | None = None) -> None:
+        self.input_path = input_path
+        self.output_path = output_path
+        self._options = options or BuildOptions()
+        backing = SlideCache(self._options.cache_dir) if self._options.cache_dir is not None else None
+        self._slide_cache = MemorySlideCache(backing)
+        self._image_cache = new_image_cache(self._options)
+        self._watched_paths: set[Path] = {input_path}
+        self._written: _WrittenDocument | None = None
+
+    def watched_paths(self) -> set[Path]:
+        return set(self._watched_paths)
+
+    def build(self) -> BuildReport:
+        started = time.perf_counter()
+        self._slide_cache.start_build()
+        source = self.input_path.read_text(encoding="utf-8")
+        deck = build_deck(
+            source,
+            self.input_path.parent,
+            self._options,
+            self._slide_cache,
+            self._image_cache,
+            external_assets_dir(self.output_path),
+        )
+        title = _infer_title(source, self.input_path.name)
+        if self._options.layout == "chunked":
+            with open_output_atomically(self.output_path) as stream:
+                write_chunked_document(
+                    stream,
+                    deck.slides,
+                    title,
+                    external_assets_dir(self.output_path),
+                    lambda: deck.assets_html,
+                    deck.stylesheet,
+                )
+            written_bytes = self.output_path.stat().st_size
+        else:
+            pieces = iter_document(
+                deck.slides, title, lambda: deck.assets_html, deck.stylesheet, self._options.compress
+            )
+            written_bytes = self._write_document(tuple(pieces))
+
+        self._watched_paths = {self.input_path}
+        self._watched_paths.update(Path(image.path) for slide in deck.slides for image in slide.images)
+        return BuildReport(
+            slide_count=len(deck.slides),
+            rendered_count=self._slide_cache.misses,
+            seconds=time.perf_counter() - started,
+            written_bytes=written_bytes,
+        )
+
+    def _write_document(self, pieces: tuple[str, ...]) -> int:
+        """Writes the pieces that differ from the last build and returns the number of bytes written."""
+        previous, self._written = self._written, None
+        start = 0
+        if previous is not None and previous.signature == _file_signature(self.output_path):
+            start = _common_prefix(previous.pieces, pieces)
+            if start == len(pieces) == len(previous.pieces):
+                self._written = previous
+                return 0
+        offsets = list(previous.offsets[: start + 1]) if start else [0]
+        if start:
+            with self.output_path.open("r+b") as handle:
+                handle.seek(offsets[-1])
+                self._write_pieces(handle, pieces[start:], offsets)
+                handle.truncate()
+        else:
+            with open_output_atomically(self.output_path) as stream:
+                # Bytes, so the offsets recorded for patching match the file on every platform.
+                self._write_pieces(stream.buffer, pieces, offsets)
+        self._written = _WrittenDocument(pieces, tuple(offsets), _file_signature(self.output_path))
+        return offsets[-1] - offsets[start]
+
+    @staticmethod
+    def _write_pieces(handle: BinaryIO, pieces: tuple[str, ...], offsets: list[int]) -> None:
+        for piece in pieces:
+            data = piece.encode("utf-8")
+            handle.write(data)
+            offsets.append(offsets[-1] + len(data))
+
+
+def _snapshot(paths: set[Path]) -> dict[Path, tuple[int, int] | None]:
+    snapshot: dict[Path, tuple[int, int] | None] = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            snapshot[path] = None
+        else:
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def _build_and_report(builder: IncrementalBuilder, log: TextIO, raise_errors: bool = False) -> None:
+    try:
+        report = builder.build()
+    except (OSError, ValueError) as exc:
+        if raise_errors:
+            raise
+        print(f"error: {exc}", file=log, flush=True)
+        return
+    print(
+        f"Built {builder.output_path} ({report.rendered_count}/{report.slide_count} slides rendered,"
+        f" {report.written_bytes} bytes written in {report.seconds * 1000:.0f} ms)",
+        file=log,
+        flush=True,
+    )
+
+
+def watch(builder: IncrementalBuilder, interval: float = 0.2, log: TextIO = sys.stderr) -> None:
+    """Polls the source and its images and rebuilds whenever one of them changes. Runs until interrupted.
+
+    Errors of the first build are raised, so a deck that does not build at all stops the command; later
+    ones are printed to ``log`` and watching goes on.
+    """
+    # Snapshots are taken before each build so edits made while it runs trigger another one.
+    snapshot = _snapshot(builder.watched_paths())
+    first = True
+    while True:
+        _build_and_report(builder, log, raise_errors=first)
+        first = False
+        paths = builder.watched_paths()
+        known = {path: snapshot[path] for path in paths if path in snapshot}
+        snapshot = {**_snapshot(paths - known.keys()), **known}
+
+        while True:
+            time.sleep(interval)
+            current = _snapshot(paths)
+            if current != snapshot:
+                snapshot = current
+                break
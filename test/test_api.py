@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dazzle.api import render_deck, write_deck
+from dazzle.compiler import BuildOptions, compile_markdown_source_to_html
+from dazzle.images import MemoryAssetResolver
+
+from fixtures import PNG_1X1
+
+
+SOURCE = "# Deck\n\n![logo](img/logo.png)\n\n---\n\n* one\n* two\n\n---\n\n```python\nprint(1)\n```"
+
+
+class RenderDeckTests(unittest.TestCase):
+    def test_matches_a_file_build(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "img").mkdir()
+            (root / "img" / "logo.png").write_bytes(PNG_1X1)
+            for image_mode in ("inline", "shared", "lazy"):
+                with self.subTest(image_mode=image_mode):
+                    options = BuildOptions(image_mode=image_mode)
+                    output_path = root / "deck.html"
+                    compile_markdown_source_to_html(SOURCE, "deck.md", root, output_path, options)
+                    html = render_deck(SOURCE, {"img/logo.png": PNG_1X1}, options)
+                    self.assertEqual(output_path.read_bytes(), html)
+
+    def test_writes_nothing_to_the_filesystem(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            previous = os.getcwd()
+            os.chdir(tmpdir)
+            try:
+                # Not even a temporary file, which sandboxes without a writable temp dir could not create.
+                with mock.patch.object(tempfile, "TemporaryFile", side_effect=OSError("read-only")):
+                    for image_mode in ("shared", "lazy"):
+                        render_deck(SOURCE, {"./img/../img/logo.png": PNG_1X1}, BuildOptions(image_mode=image_mode))
+            finally:
+                os.chdir(previous)
+            self.assertEqual([], os.listdir(tmpdir))
+
+    def test_text_and_binary_streams_get_the_same_document(self) -> None:
+        assets = MemoryAssetResolver({"img/logo.png": PNG_1X1})
+        text, binary = io.StringIO(), io.BytesIO()
+        summary = write_deck(SOURCE, text, assets)
+        write_deck(SOURCE, binary, assets)
+        self.assertEqual(text.getvalue().encode("utf-8"), binary.getvalue())
+        self.assertEqual(3, summary.slide_count)
+        self.assertEqual(("img/logo.png",), tuple(image.path for image in summary.images))
+
+    def test_missing_and_remote_images_are_rejected(self) -> None:
+        with self.assertRaisesRegex(FileNotFoundError, "Image not found in assets"):
+            render_deck("![a](missing.png)")
+        with self.assertRaisesRegex(ValueError, "Remote images"):
+            render_deck("![a](https://example.com/a.png)", {"a.png": PNG_1X1})
+        with self.assertRaisesRegex(ValueError, "external"):
+            render_deck("# Deck", options=BuildOptions(image_mode="external"))
+        with self.assertRaisesRegex(ValueError, "chunked"):
+            render_deck("# Deck", options=BuildOptions(layout="chunked"))
+
+    def test_concurrent_renders_match_serial_ones(self) -> None:
+        assets = MemoryAssetResolver({"img/logo.png": PNG_1X1})
+        sources = [f"# Deck {index}\n\n![logo](img/logo.png)\n\n" + "* step\n" * index for index in range(1, 13)]
+        expected = [render_deck(source, assets) for source in sources]
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            for _ in range(3):
+                self.assertEqual(expected, list(pool.map(lambda source: render_deck(source, assets), sources)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from pathlib import Path
+import json
+import shutil
+import tempfile
+import unittest
+
+from dazzle.batch import DeckJob, build_many, jobs_from_manifest, jobs_from_patterns
+from dazzle.compiler import BuildOptions
+
+
+class BuildManyTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmpdir.name)
+        (self.root / "decks" / "sub").mkdir(parents=True)
+        for name in ("a.md", "b.md", "sub/c.md"):
+            (self.root / "decks" / name).write_text(f"# {name}\n\n* point", encoding="utf-8")
+        self.options = BuildOptions(cache_dir=self.root / ".dazzle-cache")
+
+    def tearDown(self) -> None:
+        self._tmpdir.cleanup()
+
+    def _statuses(self, jobs: list[DeckJob], **kwargs: object) -> list[str]:
+        return [result.status for result in build_many(jobs, self.options, **kwargs)]
+
+    def test_patterns_mirror_input_layout(self) -> None:
+        jobs = jobs_from_patterns([str(self.root / "decks" / "**" / "*.md")], self.root / "out")
+        outputs = sorted(job.output_path.relative_to(self.root / "out").as_posix() for job in jobs)
+        self.assertEqual(["a.html", "b.html", "sub/c.html"], outputs)
+
+    def test_unchanged_decks_are_skipped(self) -> None:
+        jobs = jobs_from_patterns([str(self.root / "decks" / "**" / "*.md")], self.root / "out")
+        self.assertEqual(["built"] * 3, self._statuses(jobs))
+        self.assertEqual(["skipped"] * 3, self._statuses(jobs))
+
+        (self.root / "decks" / "b.md").write_text("# changed", encoding="utf-8")
+        (self.root / "out" / "sub" / "c.html").unlink()
+        self.assertEqual(["skipped", "built", "built"], self._statuses(jobs))
+        self.assertEqual(["built"] * 3, self._statuses(jobs, force=True))
+
+    def test_decks_missing_their_assets_are_rebuilt(self) -> None:
+        jobs = jobs_from_patterns([str(self.root / "decks" / "*.md")], self.root / "out")
+        self.options = BuildOptions(cache_dir=self.root / ".dazzle-cache", layout="chunked")
+        self.assertEqual(["built"] * 2, self._statuses(jobs))
+        self.assertEqual(["skipped"] * 2, self._statuses(jobs))
+
+        shutil.rmtree(self.root / "out" / "a_assets")
+        next((self.root / "out" / "b_assets").glob("slide.*.html")).unlink()
+        self.assertEqual(["built"] * 2, self._statuses(jobs))
+        self.assertTrue((self.root / "out" / "a_assets").is_dir())
+        self.assertEqual(["skipped"] * 2, self._statuses(jobs))
+
+    def test_changing_compression_rebuilds_decks(self) -> None:
+        jobs = jobs_from_patterns([str(self.root / "decks" / "*.md")], self.root / "out")
+        self.assertEqual(["built"] * 2, self._statuses(jobs))
+        self.options = BuildOptions(cache_dir=self.root / ".dazzle-cache", compress=True)
+        self.assertEqual(["built"] * 2, self._statuses(jobs))
+        self.assertEqual(["skipped"] * 2, self._statuses(jobs))
+
+    def test_failures_do_not_stop_other_decks(self) -> None:
+        (self.root / "decks" / "a.md").write_text("::: bogus", encoding="utf-8")
+        jobs = jobs_from_patterns([str(self.root / "decks" / "*.md")], self.root / "out")
+        results = list(build_many(jobs, self.options, workers=2))
+        self.assertEqual(["failed", "built"], [result.status for result in results])
+        self.assertIn("Unsupported directive", results[0].error or "")
+        self.assertTrue((self.root / "out" / "b.html").exists())
+
+    def test_manifest_paths_are_relative_to_the_manifest(self) -> None:
+        manifest_path = self.root / "decks.json"
+        manifest_path.write_text(json.dumps([{"input": "decks/a.md", "output": "site/a.html"}]), encoding="utf-8")
+        jobs = jobs_from_manifest(manifest_path)
+        self.assertEqual([DeckJob(self.root / "decks/a.md", self.root / "site/a.html")], jobs)
+
+        manifest_path.write_text(json.dumps([{"input": "decks/a.md"}]), encoding="utf-8")
+        with self.assertRaisesRegex(ValueError, "needs string 'input' and 'output' fields"):
+            jobs_from_manifest(manifest_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
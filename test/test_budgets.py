@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from pathlib import Path
+import contextlib
+import io
+import pickle
+import tempfile
+import unittest
+
+from dazzle import cli
+from dazzle.api import render_deck
+from dazzle.budgets import BudgetExceededError, BuildBudget, parse_budget
+from dazzle.compiler import (
+    BuildOptions,
+    compile_markdown_source_to_html,
+    compile_markdown_source_to_stream,
+    convert_markdown,
+    create_markdown_engine,
+)
+from dazzle.images import MemoryAssetResolver
+
+from fixtures import PNG_1X1
+
+
+SOURCE = "# Deck\n\n![logo](logo.png)\n\n---\n\n* one\n* two\n* three\n\n---\n\n![other](other.png)\n\n* four"
+ASSETS = {"logo.png": PNG_1X1, "other.png": PNG_1X1 + b"\0" * 100}
+
+
+class _LoadCountingResolver(MemoryAssetResolver):
+    def __init__(self, assets: dict[str, bytes]) -> None:
+        super().__init__(assets)
+        self.loaded: list[str] = []
+
+    def load(self, name: str):
+        self.loaded.append(name)
+        return super().load(name)
+
+
+class BuildBudgetTests(unittest.TestCase):
+    def _render(self, budget: BuildBudget, source: str = SOURCE, **options: object) -> bytes:
+        return render_deck(source, ASSETS, BuildOptions(budget=budget, **options))
+
+    def test_generous_budget_leaves_output_unchanged(self) -> None:
+        budget = BuildBudget(
+            max_source_bytes=10_000,
+            max_slide_source_bytes=1_000,
+            max_slide_seconds=60,
+            max_deck_seconds=60,
+            max_image_bytes=1_000,
+            max_deck_image_bytes=1_000,
+            max_slide_output_bytes=10_000,
+            max_output_bytes=10_000_000,
+            max_slide_fragments=3,
+            max_deck_fragments=4,
+        )
+        for image_mode in ("inline", "shared"):
+            with self.subTest(image_mode=image_mode):
+                expected = render_deck(SOURCE, ASSETS, BuildOptions(image_mode=image_mode))
+                self.assertEqual(expected, self._render(budget, image_mode=image_mode))
+
+    def test_each_limit_stops_the_build(self) -> None:
+        cases = {
+            "max_source_bytes": (BuildBudget(max_source_bytes=50), "The source is 85 bytes"),
+            "max_slide_source_bytes": (
+                BuildBudget(max_slide_source_bytes=20),
+                r"Slide 1 \(line 1\) is 26 bytes of markdown",
+            ),
+            "max_slide_seconds": (BuildBudget(max_slide_seconds=1e-9), "The slide at line 1 took"),
+            "max_deck_seconds": (BuildBudget(max_deck_seconds=1e-9), r"The build took .* by slide 1 \(line 1\)"),
+            "max_image_bytes": (BuildBudget(max_image_bytes=100), "Image 'other.png' is 170 bytes"),
+            "max_deck_image_bytes": (
+                BuildBudget(max_deck_image_bytes=200),
+                r"add up to 240 bytes by slide 3 \(line 12\)",
+            ),
+            "max_slide_output_bytes": (BuildBudget(max_slide_output_bytes=100), r"Slide 1 \(line 1\) renders to"),
+            "max_output_bytes": (BuildBudget(max_output_bytes=5_000), "The output grew past 5000 bytes"),
+            "max_slide_fragments": (BuildBudget(max_slide_fragments=2), r"Slide 2 \(line 6\) has 3 fragments"),
+            "max_deck_fragments": (BuildBudget(max_deck_fragments=3), r"more than 3 fragments by slide 3 \(line 12\)"),
+        }
+        for limit, (budget, message) in cases.items():
+            with self.subTest(limit=limit):
+                with self.assertRaisesRegex(BudgetExceededError, message) as raised:
+                    self._render(budget)
+                self.assertEqual(limit, raised.exception.limit)
+                self.assertIsInstance(raised.exception, ValueError)
+
+    def test_slow_slides_stop_before_highlighting_the_rest(self) -> None:
+        source = "\n\n".join(f"```python\nvalue = {index}\n```" for index in range(20))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_dir = Path(tmpdir)
+            options = BuildOptions(cache_dir=cache_dir, budget=BuildBudget(max_slide_seconds=1e-9))
+            with self.assertRaisesRegex(BudgetExceededError, "The slide at line 1 took"):
+                compile_markdown_source_to_stream(source, "deck.md", cache_dir, io.StringIO(), options)
+            self.assertEqual([], list(cache_dir.glob("highlight/*/*.html")))
+
+    def test_conversions_call_the_checkpoint_between_stages(self) -> None:
+        calls: list[str] = []
+        md = create_markdown_engine()
+        source = "```python\nx = 1\n```\n\n```python\nx = 2\n```"
+        html = convert_markdown(md, source, checkpoint=lambda: calls.append("check")).html
+        # Once before each of the two blocks is highlighted, then after highlighting, parsing and serializing.
+        self.assertEqual(5, len(calls))
+        self.assertEqual(convert_markdown(md, source).html, html)
+        self.assertEqual(5, len(calls))
+
+    def test_oversized_images_are_never_read(self) -> None:
+        resolver = _LoadCountingResolver(ASSETS)
+        with self.assertRaises(BudgetExceededError):
+            render_deck(SOURCE, resolver, BuildOptions(budget=BuildBudget(max_image_bytes=100)))
+        self.assertNotIn("other.png", resolver.loaded)
+
+    def test_image_limit_applies_to_cached_slides(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            for name, content in ASSETS.items():
+                (root / name).write_bytes(content)
+            output_path = root / "deck.html"
+            cache_dir = root / "cache"
+            compile_markdown_source_to_html(SOURCE, "deck.md", root, output_path, BuildOptions(cache_dir=cache_dir))
+            options = BuildOptions(cache_dir=cache_dir, budget=BuildBudget(max_image_bytes=100))
+            with self.assertRaisesRegex(BudgetExceededError, "other.png' is 170 bytes"):
+                compile_markdown_source_to_html(SOURCE, "deck.md", root, output_path, options)
+
+    def test_chunked_layout_counts_slide_files(self) -> None:
+        source = "\n\n---\n\n".join(f"# Slide {index}\n\n" + "text " * 200 for index in range(10))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            stream = io.StringIO()
+            options = BuildOptions(layout="chunked", budget=BuildBudget(max_output_bytes=9_000))
+            with self.assertRaisesRegex(BudgetExceededError, "output grew past"):
+                compile_markdown_source_to_stream(source, "deck.md", root, stream, options, assets_dir=root / "assets")
+            self.assertLess(len(stream.getvalue()), 9_000)
+
+    def test_worker_processes_enforce_the_budget(self) -> None:
+        source = "\n\n---\n\n".join(f"# Slide {index}\n\n![logo](logo.png)" for index in range(4))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "logo.png").write_bytes(PNG_1X1)
+            options = BuildOptions(jobs=2, budget=BuildBudget(max_image_bytes=10))
+            with self.assertRaisesRegex(BudgetExceededError, "logo.png' is 70 bytes"):
+                compile_markdown_source_to_html(source, "deck.md", root, root / "deck.html", options)
+            self.assertFalse((root / "deck.html").exists())
+
+    def test_errors_survive_pickling(self) -> None:
+        error = pickle.loads(pickle.dumps(BudgetExceededError("max_image_bytes", "too big")))
+        self.assertEqual(("max_image_bytes", "too big"), (error.limit, str(error)))
+
+    def test_deep_nesting_is_a_clear_error(self) -> None:
+        source = '<div markdown="1">\n' * 1500 + "x\n" + "</div>\n" * 1500
+        with self.assertRaisesRegex(ValueError, "The slide at line 4 nests too deeply to convert"):
+            render_deck("# Deck\n\n---\n\n" + source)
+
+    def test_cli_reports_an_exceeded_budget_without_a_traceback(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = Path(tmpdir) / "deck.md"
+            source = SOURCE.replace("![logo](logo.png)", "").replace("![other](other.png)", "")
+            input_path.write_text(source, encoding="utf-8")
+            output_path = Path(tmpdir) / "deck.html"
+            expected = r"^dazzle: error: The source is \d+ bytes; the budget allows 10\.\n$"
+            for command in ("build", "watch"):
+                with self.subTest(command=command):
+                    stderr = io.StringIO()
+                    with contextlib.redirect_stderr(stderr):
+                        exit_code = cli.main(
+                            [command, str(input_path), "-o", str(output_path), "--budget", "source_bytes=10"]
+                        )
+                    self.assertEqual(1, exit_code)
+                    self.assertRegex(stderr.getvalue(), expected)
+                    self.assertFalse(output_path.exists())
+
+    def test_nesting_depth_is_a_budget_limit(self) -> None:
+        source = "# Deck\n\n---\n\n- a\n    - b\n        - c"
+        with self.assertRaisesRegex(BudgetExceededError, "Line 7 is nested 2 levels deep") as raised:
+            self._render(BuildBudget(max_nesting_depth=1), source)
+        self.assertEqual("max_nesting_depth", raised.exception.limit)
+        deep = "".join("    " * depth + "- item\n" for depth in range(80))
+        with self.assertRaisesRegex(BudgetExceededError, "the budget allows 64"):
+            render_deck(deep)
+        self.assertIn(b"<li>item", render_deck(deep, options=BuildOptions(budget=BuildBudget(max_nesting_depth=100))))
+
+    def test_parses_command_line_limits(self) -> None:
+        budget = parse_budget({"slide_seconds": "2.5", "output_bytes": "1000", "nesting_depth": "100"})
+        self.assertEqual(BuildBudget(max_slide_seconds=2.5, max_output_bytes=1000, max_nesting_depth=100), budget)
+        with self.assertRaisesRegex(ValueError, "Unknown budget limit 'pages'"):
+            parse_budget({"pages": "3"})
+        with self.assertRaisesRegex(ValueError, "needs a number"):
+            parse_budget({"output_bytes": "1.5"})
+        with self.assertRaisesRegex(ValueError, "must be positive"):
+            BuildBudget(max_deck_fragments=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
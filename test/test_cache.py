@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from pathlib import Path
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dazzle import compiler
+from dazzle.compiler import BuildOptions, compile_markdown_source_to_html
+
+from fixtures import PNG_1X1
+
+
+class SlideCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmpdir.name)
+        self.options = BuildOptions(cache_dir=self.root / ".dazzle-cache")
+        (self.root / "pic.png").write_bytes(PNG_1X1)
+
+    def tearDown(self) -> None:
+        self._tmpdir.cleanup()
+
+    def _build(self, source: str, options: BuildOptions | None = None) -> str:
+        output_path = self.root / "deck.html"
+        compile_markdown_source_to_html(source, "deck.md", self.root, output_path, options or self.options)
+        return output_path.read_text(encoding="utf-8")
+
+    def test_cached_build_matches_uncached_build(self) -> None:
+        source = "# Title\n\n* one\n\n---\n\n![pic](pic.png)"
+        uncached = self._build(source, BuildOptions())
+        self.assertEqual(uncached, self._build(source))
+        self.assertEqual(uncached, self._build(source))
+
+    def test_only_changed_slides_are_rendered(self) -> None:
+        self._build("one\n\n---\n\ntwo\n\n---\n\nthree")
+        with mock.patch.object(compiler, "convert_markdown", wraps=compiler.convert_markdown) as convert:
+            html = self._build("one\n\n---\n\nTWO\n\n---\n\nthree")
+        self.assertEqual(1, convert.call_count)
+        self.assertIn("<p>TWO</p>", html)
+
+    def test_changed_image_invalidates_slide(self) -> None:
+        source = "![pic](pic.png)"
+        self._build(source)
+        image_path = self.root / "pic.png"
+        image_path.write_bytes(PNG_1X1 + b"\x00")
+        stat = image_path.stat()
+        os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        with mock.patch.object(compiler, "convert_markdown", wraps=compiler.convert_markdown) as convert:
+            self._build(source)
+        self.assertEqual(1, convert.call_count)
+
+    def test_fragment_count_is_restored_from_cache(self) -> None:
+        source = "* one\n* two"
+        self._build(source)
+        with mock.patch.object(compiler, "convert_markdown", wraps=compiler.convert_markdown) as convert:
+            html = self._build(source)
+        self.assertEqual(0, convert.call_count)
+        self.assertIn('data-fragment-count="2"', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+from pathlib import Path
+import base64
+import gzip
+import hashlib
+import io
+import json
+import random
+import re
+import tempfile
+import tracemalloc
+import unittest
+
+from dazzle.compiler import (
+    BuildOptions,
+    build_deck,
+    compile_markdown_source_to_html,
+    compile_markdown_source_to_stream,
+)
+from dazzle.images import IMAGE_MODES, ImageCache
+from dazzle.render_html import render_document
+
+from fixtures import PNG_1X1
+
+
+DECK_SOURCE = "\n\n---\n\n".join(
+    f"# Slide {index}\n\n* point {index}\n\n```python\nprint({index})\n```" for index in range(12)
+)
+
+
+class ParallelRenderingTests(unittest.TestCase):
+    def _build(self, source: str, options: BuildOptions) -> str:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = Path(tmpdir) / "deck.html"
+            compile_markdown_source_to_html(source, "deck.md", Path(tmpdir), output_path, options)
+            return output_path.read_text(encoding="utf-8")
+
+    def test_parallel_output_matches_serial_output(self) -> None:
+        serial = self._build(DECK_SOURCE, BuildOptions())
+        parallel = self._build(DECK_SOURCE, BuildOptions(jobs=3))
+        self.assertEqual(serial, parallel)
+
+    def test_parallel_errors_propagate(self) -> None:
+        with self.assertRaisesRegex(ValueError, "Unclosed fragment directive"):
+            self._build("ok\n\n---\n\n::: fragment\nnever closed", BuildOptions(jobs=2))
+
+
+class SharedImageModeTests(unittest.TestCase):
+    def test_repeated_image_is_emitted_once(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "logo.png").write_bytes(PNG_1X1)
+            output_path = root / "deck.html"
+            source = "\n\n---\n\n".join("![logo](logo.png)" for _ in range(5))
+            compile_markdown_source_to_html(source, "deck.md", root, output_path, BuildOptions(image_mode="shared"))
+            html = output_path.read_text(encoding="utf-8")
+
+        self.assertEqual(1, html.count(base64.b64encode(PNG_1X1).decode("ascii")))
+        self.assertEqual(5, html.count("data-dazzle-asset="))
+        self.assertIn('<script type="application/json" id="dazzle-assets" data-loading="eager">', html)
+
+    def test_unknown_image_mode_is_rejected(self) -> None:
+        with self.assertRaisesRegex(ValueError, "Unsupported image mode"):
+            BuildOptions(image_mode="bogus")
+
+
+class DeferredImageModeTests(unittest.TestCase):
+    def _build(self, root: Path, image_mode: str) -> str:
+        (root / "logo.png").write_bytes(PNG_1X1)
+        output_path = root / "deck.html"
+        source = "![logo](logo.png)\n\n---\n\n![again](logo.png)"
+        compile_markdown_source_to_html(source, "deck.md", root, output_path, BuildOptions(image_mode=image_mode))
+        return output_path.read_text(encoding="utf-8")
+
+    def test_lazy_mode_stores_each_image_once_in_a_script_blob(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            html = self._build(Path(tmpdir), "lazy")
+        encoded = base64.b64encode(PNG_1X1).decode("ascii")
+        self.assertEqual(1, html.count(encoded))
+        self.assertIn('<script type="application/octet-stream" id="dazzle-asset-', html)
+        self.assertIn('data-loading="lazy"', html)
+        self.assertNotIn("src=", html.split("<main", 1)[1].split("</main>", 1)[0])
+
+    def test_external_mode_writes_content_addressed_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            html = self._build(root, "external")
+            files = list((root / "deck_assets").iterdir())
+            self.assertEqual(1, len(files))
+            self.assertEqual(PNG_1X1, files[0].read_bytes())
+            self.assertIn(f'"url": "deck_assets/{files[0].name}"', html)
+            self.assertNotIn(base64.b64encode(PNG_1X1).decode("ascii"), html)
+
+    def test_external_mode_needs_an_output_file(self) -> None:
+        with self.assertRaisesRegex(ValueError, "needs an output file"):
+            options = BuildOptions(image_mode="external")
+            compile_markdown_source_to_stream("x", "deck.md", Path.cwd(), io.StringIO(), options)
+
+
+class StreamingOutputTests(unittest.TestCase):
+    def test_streamed_document_matches_in_memory_render(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "logo.png").write_bytes(PNG_1X1)
+            source = DECK_SOURCE + "\n\n---\n\n![logo](logo.png)"
+            assets_dir = root / "deck_assets"
+            for image_mode in IMAGE_MODES:
+                options = BuildOptions(image_mode=image_mode)
+                stream = io.StringIO()
+                compile_markdown_source_to_stream(source, "deck.md", root, stream, options, assets_dir=assets_dir)
+                expected = render_document(build_deck(source, root, options, assets_dir=assets_dir), "Slide 0")
+                self.assertEqual(expected, stream.getvalue())
+
+    def test_slides_are_written_as_they_are_rendered(self) -> None:
+        writes: list[str] = []
+
+        class RecordingStream(io.StringIO):
+            def write(self, text: str) -> int:
+                writes.append(text)
+                return super().write(text)
+
+        compile_markdown_source_to_stream(DECK_SOURCE, "deck.md", Path.cwd(), RecordingStream())
+        sections = [chunk for chunk in writes if chunk.startswith("<section")]
+        self.assertEqual(12, len(sections))
+        self.assertTrue(writes[0].startswith("<!doctype html>"))
+
+    def test_memory_stays_bounded_on_a_deck_of_large_images(self) -> None:
+        rng = random.Random(5)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            photos = [rng.randbytes(512 * 1024) for _ in range(40)]
+            for index, photo in enumerate(photos):
+                (root / f"photo{index}.png").write_bytes(photo)
+            source = "\n\n---\n\n".join(f"![photo](photo{index}.png)" for index in range(len(photos)))
+            output_path = root / "deck.html"
+            for image_mode in ("shared", "lazy", "external"):
+                with self.subTest(image_mode=image_mode):
+                    options = BuildOptions(image_mode=image_mode)
+                    tracemalloc.start()
+                    try:
+                        compile_markdown_source_to_html(
+                            source, "deck.md", root, output_path, options, image_cache=ImageCache(max_bytes=1 << 20)
+                        )
+                        peak = tracemalloc.get_traced_memory()[1]
+                    finally:
+                        tracemalloc.stop()
+                    # The images come to 27 MiB once encoded; keeping them until the asset table took 80 MiB.
+                    self.assertLess(peak, 20 * 1024 * 1024)
+            html = output_path.read_text(encoding="utf-8")
+        self.assertEqual(len(photos), len(json.loads(re.search(r'id="dazzle-assets"[^>]*>(.*?)</script>', html)[1])))
+
+    def test_shared_table_holds_every_image(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            photos = [bytes([index]) * 3000 for index in range(3)]
+            for index, photo in enumerate(photos):
+                (root / f"photo{index}.png").write_bytes(photo)
+            source = "\n\n---\n\n".join(f"![photo](photo{index}.png)" for index in (0, 1, 0, 2))
+            stream = io.StringIO()
+            compile_markdown_source_to_stream(source, "deck.md", root, stream, BuildOptions(image_mode="shared"))
+        expected = {
+            hashlib.sha256(photo).hexdigest()[:16]: {
+                "mime": "image/png",
+                "data": base64.b64encode(photo).decode("ascii"),
+            }
+            for photo in photos
+        }
+        self.assertIn(f'data-loading="eager">{json.dumps(expected)}</script>', stream.getvalue())
+
+    def test_failed_build_keeps_previous_output(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = Path(tmpdir) / "deck.html"
+            output_path.write_text("previous", encoding="utf-8")
+            with self.assertRaises(ValueError):
+                compile_markdown_source_to_html("ok\n\n---\n\n::: bogus", "deck.md", Path(tmpdir), output_path)
+            self.assertEqual("previous", output_path.read_text(encoding="utf-8"))
+            self.assertEqual(["deck.html"], [path.name for path in Path(tmpdir).iterdir()])
+
+
+class ImagePrefetchTests(unittest.TestCase):
+    def _render(self, source: str, root: Path, options: BuildOptions) -> str:
+        stream = io.StringIO()
+        compile_markdown_source_to_stream(source, "deck.md", root, stream, options, assets_dir=root / "deck_assets")
+        return stream.getvalue()
+
+    def test_output_matches_loading_one_image_at_a_time(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            for index in range(5):
+                (root / f"pic{index}.png").write_bytes(PNG_1X1 + bytes(index))
+            source = "\n\n---\n\n".join(
+                f"# Slide {index}\n\n![a](pic{index % 5}.png) ![b](pic{(index * 3) % 5}.png)" for index in range(40)
+            )
+            for image_mode in IMAGE_MODES:
+                with self.subTest(image_mode=image_mode):
+                    serial = self._render(source, root, BuildOptions(image_mode=image_mode, image_concurrency=1))
+                    prefetched = self._render(source, root, BuildOptions(image_mode=image_mode, image_concurrency=4))
+                    self.assertEqual(serial, prefetched)
+
+    def test_first_error_in_document_order_is_raised(self) -> None:
+        decks = [
+            "ok\n\n---\n\n![a](first.png)\n\n---\n\n![b](second.png)",
+            "![a](https://example.com/a.png)\n\n---\n\n![b](missing.png)",
+            "![a](missing.png)\n\n---\n\n::: bogus",
+            "::: bogus\n\n---\n\n![a](missing.png)",
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            for source in decks:
+                errors = []
+                for image_concurrency in (1, 8):
+                    try:
+                        self._render(source, root, BuildOptions(image_concurrency=image_concurrency))
+                    except (FileNotFoundError, ValueError) as exc:
+                        errors.append((type(exc), str(exc)))
+                self.assertEqual(2, len(errors))
+                self.assertEqual(errors[0], errors[1])
+
+    def test_rejects_zero_concurrency(self) -> None:
+        with self.assertRaises(ValueError):
+            BuildOptions(image_concurrency=0)
+
+
+class CompressedOutputTests(unittest.TestCase):
+    PAYLOAD_RE = re.compile(r'\n<script type="application/octet-stream" id="dazzle-slides">([A-Za-z0-9+/=]*)</script>')
+
+    def _render(self, source: str, root: Path, options: BuildOptions) -> str:
+        stream = io.StringIO()
+        compile_markdown_source_to_stream(source, "deck.md", root, stream, options)
+        return stream.getvalue()
+
+    def test_payload_expands_to_the_plain_document(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "logo.png").write_bytes(PNG_1X1)
+            source = DECK_SOURCE + "\n\n---\n\n![logo](logo.png) ünïcode"
+            for image_mode in ("inline", "shared", "lazy"):
+                with self.subTest(image_mode=image_mode):
+                    plain = self._render(source, root, BuildOptions(image_mode=image_mode))
+                    compressed = self._render(source, root, BuildOptions(image_mode=image_mode, compress=True))
+                    self.assertEqual(1, compressed.count('<section class="slide is-active"'))
+                    payload = self.PAYLOAD_RE.search(compressed)
+                    assert payload is not None
+                    slides = gzip.decompress(base64.b64decode(payload.group(1))).decode("utf-8")
+                    expanded = compressed[: payload.start()] + slides + compressed[payload.end() :]
+                    self.assertEqual(plain, expanded.replace('class="slide is-active"', 'class="slide"', 1))
+
+    def test_is_smaller_and_stable(self) -> None:
+        source = "\n\n---\n\n".join([DECK_SOURCE] * 10)
+        first = self._render(source, Path("."), BuildOptions(compress=True))
+        self.assertEqual(first, self._render(source, Path("."), BuildOptions(compress=True)))
+        self.assertEqual(first, render_document(build_deck(source, Path(".")), "Slide 0", compress=True))
+        self.assertLess(len(first), len(self._render(source, Path("."), BuildOptions())) / 2)
+
+    def test_single_slide_deck_has_no_payload(self) -> None:
+        html = self._render("# Only", Path("."), BuildOptions(compress=True))
+        self.assertNotIn('id="dazzle-slides"', html)
+        self.assertIn('<section class="slide is-active"', html)
+
+
+class ChunkedLayoutTests(unittest.TestCase):
+    def _build(self, root: Path, source: str, options: BuildOptions) -> str:
+        output_path = root / "deck.html"
+        compile_markdown_source_to_html(source, "deck.md", root, output_path, options)
+        return output_path.read_text(encoding="utf-8")
+
+    def _chunk_urls(self, shell: str) -> list[str]:
+        return re.findall(r'data-src="([^"]+)"', shell)
+
+    def test_slides_theme_and_runtime_are_content_addressed_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "logo.png").write_bytes(PNG_1X1)
+            source = DECK_SOURCE + "\n\n---\n\n![logo](logo.png)"
+            single = self._build(root, source, BuildOptions(image_mode="external"))
+            shell = self._build(root, source, BuildOptions(image_mode="external", layout="chunked"))
+
+            urls = self._chunk_urls(shell)
+            self.assertEqual(13, len(urls))
+            main = single.split("</main>")[0]
+            expected = re.findall(r'<section class="slide"[^>]*>(.*?)</section>', main, re.DOTALL)
+            self.assertEqual(expected, [(root / url).read_text(encoding="utf-8") for url in urls])
+            self.assertTrue(all(url.startswith("deck_assets/slide.") for url in urls))
+
+            theme = re.search(r'<link rel="stylesheet" href="(deck_assets/theme\.[0-9a-f]{16}\.css)" />', shell)
+            runtime = re.search(r'<script src="(deck_assets/runtime\.[0-9a-f]{16}\.js)"></script>', shell)
+            assert theme is not None and runtime is not None
+            self.assertTrue((root / theme.group(1)).exists())
+            self.assertTrue((root / runtime.group(1)).exists())
+            self.assertNotIn("<style>", shell)
+            self.assertIn('id="dazzle-manifest"', shell)
+            self.assertIn("deck_assets/", re.search(r'id="dazzle-assets"[^>]*>(.*?)</script>', shell).group(1))
+
+    def test_editing_one_slide_changes_one_chunk(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            before = self._chunk_urls(self._build(root, DECK_SOURCE, BuildOptions(layout="chunked")))
+            edited = DECK_SOURCE.replace("* point 5", "* changed point 5")
+            after = self._chunk_urls(self._build(root, edited, BuildOptions(layout="chunked")))
+            self.assertEqual([index != 5 for index in range(12)], [a == b for a, b in zip(before, after)])
+            self.assertEqual(12 + 1 + 2, len(list((root / "deck_assets").iterdir())))
+
+    def test_rejects_unsupported_combinations(self) -> None:
+        for options in ({"image_mode": "shared"}, {"image_mode": "lazy"}, {"compress": True}):
+            with self.subTest(**options):
+                with self.assertRaises(ValueError):
+                    BuildOptions(layout="chunked", **options)
+        with self.assertRaisesRegex(ValueError, "output file"):
+            compile_markdown_source_to_stream("x", "deck.md", Path("."), io.StringIO(), BuildOptions(layout="chunked"))
+
+
+class FragmentManifestTests(unittest.TestCase):
+    SOURCE = (
+        "# Intro\n\n---\n\n* first\n* second\n\n---\n\n"
+        'late\n{: .fragment data-fragment-order="5"}\n\nearly\n{: .fragment data-fragment-order="2"}'
+    )
+
+    def _manifest(self, document: str) -> list[list[list[object]]]:
+        match = re.search(r'<script type="application/json" id="dazzle-manifest">(.*?)</script>', document)
+        self.assertIsNotNone(match)
+        return json.loads(match.group(1))["slides"]
+
+    def test_manifest_lists_fragment_ids_in_reveal_order(self) -> None:
+        deck = build_deck(self.SOURCE, Path("."))
+        manifest = self._manifest(render_document(deck, "Deck"))
+        self.assertEqual([[], [["s1-f1", 1], ["s1-f2", 2]], [["s2-f2", 2], ["s2-f1", 5]]], manifest)
+        self.assertEqual([5, 2], [fragment.order for fragment in deck.slides[2].fragments])
+
+    def test_fragment_ids_are_stamped_on_elements(self) -> None:
+        document = render_document(build_deck(self.SOURCE, Path(".")), "Deck")
+        for slide in self._manifest(document):
+            for fragment_id, _order in slide:
+                self.assertEqual(1, document.count(f'data-fragment-id="{fragment_id}"'))
+        self.assertNotIn("\x02", document)
+
+    def test_cached_slides_get_ids_for_their_new_position(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            options = BuildOptions(cache_dir=Path(tmpdir))
+            build_deck(self.SOURCE, Path("."), options)
+            moved = build_deck("# New first slide\n\n---\n\n" + self.SOURCE, Path("."), options)
+        self.assertIn('data-fragment-id="s2-f1"', moved.slides[2].html)
+        self.assertEqual(["s3-f1", "s3-f2"], [fragment.id for fragment in moved.slides[3].fragments])
+        self.assertEqual([5, 2], [fragment.order for fragment in moved.slides[3].fragments])
+
+    def test_streamed_manifest_matches_in_memory_manifest(self) -> None:
+        stream = io.StringIO()
+        compile_markdown_source_to_stream(self.SOURCE, "deck.md", Path("."), stream)
+        expected = self._manifest(render_document(build_deck(self.SOURCE, Path(".")), "Intro"))
+        self.assertEqual(expected, self._manifest(stream.getvalue()))
+
+
+if __name__ == "__main__":
+    unittest.main()
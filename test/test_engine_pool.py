@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import io
+import threading
+import unittest
+
+from dazzle import compiler
+from dazzle.compiler import (
+    RenderedMarkdown,
+    compile_markdown_source_to_stream,
+    convert_markdown,
+    create_markdown_engine,
+)
+from dazzle.engine_pool import EnginePool
+
+
+class EnginePoolTests(unittest.TestCase):
+    def test_never_builds_more_than_max_engines(self) -> None:
+        pool = EnginePool(create_markdown_engine, max_engines=2)
+        in_use: set[int] = set()
+        peak = 0
+        lock = threading.Lock()
+
+        def convert(index: int) -> RenderedMarkdown:
+            nonlocal peak
+            with pool.checkout() as engine:
+                with lock:
+                    self.assertNotIn(id(engine), in_use)
+                    in_use.add(id(engine))
+                    peak = max(peak, len(in_use))
+                try:
+                    return convert_markdown(engine, "* step\n" * index)
+                finally:
+                    with lock:
+                        in_use.discard(id(engine))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(convert, range(40)))
+        self.assertEqual(list(range(40)), [result.fragment_count for result in results])
+        self.assertLessEqual(pool.created, 2)
+        self.assertLessEqual(peak, 2)
+
+    def test_returned_engine_is_reused(self) -> None:
+        pool = EnginePool(create_markdown_engine, max_engines=4)
+        with pool.checkout() as first:
+            pass
+        with pool.checkout() as second:
+            self.assertIs(first, second)
+        self.assertEqual(1, pool.created)
+
+    def test_failed_factory_frees_its_slot(self) -> None:
+        calls = 0
+
+        def factory():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise RuntimeError("boom")
+            return create_markdown_engine()
+
+        pool = EnginePool(factory, max_engines=1)
+        with self.assertRaises(RuntimeError):
+            with pool.checkout():
+                pass
+        with pool.checkout() as engine:
+            self.assertEqual(1, convert_markdown(engine, "* one").fragment_count)
+
+    def test_rejects_empty_pool(self) -> None:
+        with self.assertRaises(ValueError):
+            EnginePool(create_markdown_engine, max_engines=0)
+
+
+class ConcurrentCompileTests(unittest.TestCase):
+    def test_threads_get_their_own_fragment_counts(self) -> None:
+        sources = [f"# Deck {index}\n\n" + "* step\n" * index + "\n---\n\n```python\nx = 1\n```" for index in range(16)]
+
+        def compile_source(source: str) -> str:
+            stream = io.StringIO()
+            compile_markdown_source_to_stream(source, "deck.md", Path("."), stream)
+            return stream.getvalue()
+
+        expected = [compile_source(source) for source in sources]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(3):
+                self.assertEqual(expected, list(executor.map(compile_source, sources)))
+        self.assertTrue(all(pool.created <= compiler._MAX_POOLED_ENGINES for pool in compiler._ENGINE_POOLS.values()))
+
+    def test_pooled_engines_share_highlighted_blocks(self) -> None:
+        pool = compiler._engine_pool(None, "classes")
+        source = f"```python\nshared = {id(self)}\n```"
+        with pool.checkout() as first, pool.checkout() as second:
+            self.assertIsNot(first, second)
+            cache = first.preprocessors["dazzle_highlight_cache"]._cache
+            self.assertIs(cache, second.preprocessors["dazzle_highlight_cache"]._cache)
+            html = convert_markdown(first, source).html
+            hits = cache.hits
+            self.assertEqual(html, convert_markdown(second, source).html)
+            self.assertEqual(hits + 1, cache.hits)
+
+
+if __name__ == "__main__":
+    unittest.main()
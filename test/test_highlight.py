@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+import re
+import tempfile
+import unittest
+
+from markdown import Markdown
+
+from dazzle.compiler import (
+    _MARKDOWN_EXTENSION_CONFIGS,
+    _MARKDOWN_EXTENSIONS,
+    BuildOptions,
+    build_deck,
+    create_markdown_engine,
+    render_markdown,
+)
+from dazzle.render_html import render_document
+from dazzle.extensions.fragment_extension import FragmentExtension
+from dazzle.extensions.highlight_cache_extension import HighlightCache
+from dazzle.highlight import highlight_stylesheet
+
+
+SOURCE = """# Code
+
+```python
+def add(a, b):
+    return a + b
+```
+
+::: fragment
+```python
+def add(a, b):
+    return a + b
+```
+:::
+
+~~~ {.js hl_lines="1"}
+const x = 1;
+~~~
+
+```{bad attrs
+not a fence
+```
+"""
+
+
+def _uncached_engine() -> Markdown:
+    return Markdown(
+        extensions=[*_MARKDOWN_EXTENSIONS, FragmentExtension()],
+        extension_configs=_MARKDOWN_EXTENSION_CONFIGS,
+        output_format="html5",
+    )
+
+
+class HighlightCacheTests(unittest.TestCase):
+    def test_cached_output_matches_uncached_output(self) -> None:
+        expected = render_markdown(_uncached_engine(), SOURCE)
+        cache = HighlightCache()
+        md = create_markdown_engine(cache)
+
+        self.assertEqual(expected, render_markdown(md, SOURCE))
+        self.assertEqual(expected, render_markdown(md, SOURCE))
+        self.assertEqual(1, md.dazzle_fragment_count)
+        self.assertGreater(cache.hits, 0)
+
+    def test_repeated_blocks_are_highlighted_once(self) -> None:
+        cache = HighlightCache()
+        md = create_markdown_engine(cache)
+        render_markdown(md, "```python\nx = 1\n```\n\n---\n\n```python\nx = 1\n```")
+        self.assertEqual((1, 1), (cache.misses, cache.hits))
+
+        render_markdown(md, "```python\nx = 2\n```")
+        self.assertEqual((2, 1), (cache.misses, cache.hits))
+
+    def test_language_is_part_of_the_key(self) -> None:
+        md = create_markdown_engine(HighlightCache())
+        python_html = render_markdown(md, "```python\nx = 1\n```")
+        text_html = render_markdown(md, "```text\nx = 1\n```")
+        self.assertNotEqual(python_html, text_html)
+        self.assertEqual(render_markdown(_uncached_engine(), "```text\nx = 1\n```"), text_html)
+
+    def test_persisted_entries_are_reused_by_a_new_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_dir = Path(tmp)
+            first = HighlightCache(cache_dir)
+            html = render_markdown(create_markdown_engine(first), "```python\nx = 1\n```")
+            self.assertTrue(list((cache_dir / "highlight").rglob("*.html")))
+
+            second = HighlightCache(cache_dir)
+            self.assertEqual(html, render_markdown(create_markdown_engine(second), "```python\nx = 1\n```"))
+            self.assertEqual((0, 1), (second.misses, second.hits))
+
+    def test_lru_drops_least_recently_used_entries(self) -> None:
+        cache = HighlightCache(max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+        self.assertEqual("A", cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+
+    def test_threads_can_share_a_cache(self) -> None:
+        cache = HighlightCache(max_entries=4)
+
+        def use(thread: int) -> None:
+            for index in range(2000):
+                key = str((thread * index) % 7)
+                if cache.get(key) is None:
+                    cache.put(key, key.upper())
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(use, range(8)))
+        self.assertEqual(8 * 2000, cache.hits + cache.misses)
+
+
+class _StyledTextCollector(HTMLParser):
+    """Flattens highlighted HTML into (text, effective style) runs, resolving classes through ``rules``."""
+
+    def __init__(self, rules: dict[str, str]) -> None:
+        super().__init__(convert_charrefs=True)
+        self._rules = rules
+        self._stack: list[str] = []
+        self.runs: list[tuple[str, str]] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attributes = dict(attrs)
+        style = attributes.get("style") or ""
+        for name in (attributes.get("class") or "").split():
+            style = self._rules.get(name, style)
+        if tag in ("div", "pre"):
+            style = ""  # Container styles are compared separately.
+        self._stack.append(style or (self._stack[-1] if self._stack else ""))
+
+    def handle_endtag(self, tag: str) -> None:
+        self._stack.pop()
+
+    def handle_data(self, data: str) -> None:
+        style = self._stack[-1] if self._stack else ""
+        if self.runs and self.runs[-1][1] == style:
+            self.runs[-1] = (self.runs[-1][0] + data, style)
+        else:
+            self.runs.append((data, style))
+
+
+class ClassHighlightModeTests(unittest.TestCase):
+    SOURCE = (
+        '```python\n@decorator\ndef add(a, b):  # sum\n    return f"{a}" + 0x1F\n```\n\n'
+        '```{.js hl_lines="1"}\nlet x = /re/g;\n```'
+    )
+
+    def test_classes_resolve_to_the_inline_styles(self) -> None:
+        inline_html = render_markdown(create_markdown_engine(), self.SOURCE)
+        classes_html = render_markdown(create_markdown_engine(highlight_mode="classes"), self.SOURCE)
+        self.assertNotIn('style="color', classes_html)
+
+        stylesheet = highlight_stylesheet("classes", "monokai")
+        rules = dict(re.findall(r"^\.codehilite \.(\S+) \{ (.*?) \}$", stylesheet, re.MULTILINE))
+        inline = _StyledTextCollector({})
+        inline.feed(inline_html)
+        classes = _StyledTextCollector(rules)
+        classes.feed(classes_html)
+        self.assertEqual(inline.runs, classes.runs)
+
+        self.assertIn('<pre style="line-height: 125%;">', inline_html)
+        self.assertIn(".codehilite pre { line-height: 125%; }", stylesheet)
+        self.assertIn('style="background: #272822"', inline_html)
+        self.assertIn(".codehilite { background: #272822 }", stylesheet)
+        self.assertNotRegex(stylesheet, r"(?m)^pre ")
+
+    def test_stylesheet_is_emitted_once_in_the_head(self) -> None:
+        deck = build_deck(self.SOURCE + "\n\n---\n\n" + self.SOURCE, Path("."), BuildOptions(highlight_mode="classes"))
+        document = render_document(deck, "Code")
+        head, _, body = document.partition("</head>")
+        self.assertEqual(1, document.count(".codehilite .k {"))
+        self.assertIn(".codehilite .k {", head)
+        self.assertNotIn(".codehilite .k {", body)
+
+    def test_inline_mode_document_has_no_extra_stylesheet(self) -> None:
+        deck = build_deck(self.SOURCE, Path("."))
+        self.assertEqual("", deck.stylesheet)
+        self.assertNotIn(".codehilite .k {", render_document(deck, "Code"))
+
+    def test_unknown_highlight_mode_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            BuildOptions(highlight_mode="bogus")
+
+
+if __name__ == "__main__":
+    unittest.main()
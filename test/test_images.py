@@ -1,21 +1,32 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import base64
+import io
 import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 
+from dazzle import images
+from dazzle.compiler import MARKDOWN_ENGINE, render_markdown
 from dazzle.html_parser import PassthroughHTMLParser
-from dazzle.images import embed_images_in_html
-
-
-PNG_1X1 = (
-    b"\x89PNG\r\n\x1a\n"
-    b"\x00\x00\x00\rIHDR"
-    b"\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00"
-    b"\x1f\x15\xc4\x89\x00\x00\x00\x0dIDATx\x9cc````\x00\x00\x00\x05\x00\x01"
-    b"\x0d\n-\xb4\x00\x00\x00\x00IEND\xaeB`\x82"
+from dazzle.images import (
+    ImageCache,
+    ImageEmbeddingHTMLParser,
+    ImageOptimization,
+    ImageOptimizer,
+    ImagePrefetcher,
+    MemoryAssetResolver,
+    collect_image_sources,
+    embed_images_in_html,
+    image_optimization_available,
 )
 
+from fixtures import PNG_1X1
+
 
 class ImageEmbeddingTests(unittest.TestCase):
     def test_embeds_relative_img_src(self) -> None:
@@ -62,6 +73,131 @@ class ImageEmbeddingTests(unittest.TestCase):
         self.assertEqual(html, out)
 
 
+class FastImageRewriteTests(unittest.TestCase):
+    def _parse_fully(self, html: str, markdown_dir: Path) -> str:
+        parser = ImageEmbeddingHTMLParser(markdown_dir)
+        parser.feed(html)
+        parser.close()
+        return parser.get_html()
+
+    def test_matches_full_parser_on_rendered_markdown(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            markdown_dir = Path(tmpdir)
+            (markdown_dir / "pic.png").write_bytes(PNG_1X1)
+            html = render_markdown(
+                MARKDOWN_ENGINE,
+                "# Title\n\n![a](pic.png)\n\n| x | y |\n|---|---|\n| 1 | 2 |\n\n"
+                "```html\n<img src=\"missing.png\">\n```\n\n* ![b](pic.png \"t\")",
+            )
+            self.assertEqual(self._parse_fully(html, markdown_dir), embed_images_in_html(html, markdown_dir))
+
+    def test_leaves_other_markup_untouched(self) -> None:
+        html = "<p class=x>a &amp b<br></p><img-card src=missing.png>"
+        self.assertEqual(html, embed_images_in_html(html, Path.cwd()))
+
+    def test_skips_img_tags_in_comments_and_scripts(self) -> None:
+        html = '<!-- <img src="missing.png"> --><script>"<img src=missing.png>"</script><SCRIPT></SCRIPT>'
+        self.assertEqual(html, embed_images_in_html(html, Path.cwd()))
+
+    def test_skips_img_text_in_attributes_of_other_tags(self) -> None:
+        html = '<a title="<img src=missing.png>" href="#">link</a><span data-x=\'<img src="missing.png">\'></span>'
+        self.assertEqual(html, embed_images_in_html(html, Path.cwd()))
+        self.assertEqual([], collect_image_sources(html))
+
+    def test_attribute_values_may_contain_angle_brackets(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            markdown_dir = Path(tmpdir)
+            (markdown_dir / "pic.png").write_bytes(PNG_1X1)
+            out = embed_images_in_html('<img alt="a > b" src="pic.png">', markdown_dir)
+            self.assertTrue(out.startswith('<img alt="a &gt; b" src="data:image/png;base64,'))
+
+
+class _CountingResolver(MemoryAssetResolver):
+    def __init__(self, assets: dict[str, bytes]) -> None:
+        super().__init__(assets)
+        self.loads: list[str] = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def load(self, name: str):
+        with self._lock:
+            self.loads.append(name)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        try:
+            return super().load(name)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class ImagePrefetcherTests(unittest.TestCase):
+    def test_collects_the_sources_the_rewrite_embeds(self) -> None:
+        html = (
+            '<img src="a.png"><!-- <img src="comment.png"> --><script>"<img src=script.png>"</script>'
+            "<IMG SRC='b.png' alt=\"<img>\"/><img alt=x><img src=\"a.png\">"
+        )
+        self.assertEqual(["a.png", "b.png", "a.png"], collect_image_sources(html))
+
+    def test_loads_each_image_once_within_the_concurrency_limit(self) -> None:
+        assets = {f"{index}.png": PNG_1X1 + bytes(index) for index in range(8)}
+        resolver = _CountingResolver(assets)
+        html = "".join(f'<img src="{index % 8}.png">' for index in range(24))
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            prefetched = ImagePrefetcher(resolver, executor).prefetch(html)
+            out = embed_images_in_html(html, Path("."), resolver=prefetched)
+        self.assertEqual(8, len(resolver.loads))
+        self.assertLessEqual(resolver.peak, 3)
+        self.assertEqual(embed_images_in_html(html, Path("."), resolver=MemoryAssetResolver(assets)), out)
+
+    def test_errors_surface_at_the_failing_image(self) -> None:
+        resolver = MemoryAssetResolver({"a.png": PNG_1X1})
+        html = '<img src="a.png"><img src="missing.png"><img src="https://example.com/x.png">'
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            prefetched = ImagePrefetcher(resolver, executor).prefetch(html)
+            with self.assertRaisesRegex(FileNotFoundError, "missing.png"):
+                embed_images_in_html(html, Path("."), resolver=prefetched)
+
+
+class ImageCacheTests(unittest.TestCase):
+    def test_repeated_image_is_encoded_once(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            markdown_dir = Path(tmpdir)
+            (markdown_dir / "pic.png").write_bytes(PNG_1X1)
+            cache = ImageCache()
+            html = '<img src="pic.png"><img src="./pic.png">'
+            with mock.patch.object(images, "_encode_image", wraps=images._encode_image) as encode:
+                out = embed_images_in_html(html, markdown_dir, image_cache=cache)
+                embed_images_in_html(html, markdown_dir, image_cache=cache)
+            self.assertEqual(1, encode.call_count)
+            self.assertEqual(2, out.count('src="data:image/png;base64,'))
+
+    def test_persistent_cache_is_reused_by_new_instances(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "pic.png").write_bytes(PNG_1X1)
+            first = ImageCache(root / "cache").load(root / "pic.png")
+            with mock.patch.object(images, "_encode_image", wraps=images._encode_image) as encode:
+                second = ImageCache(root / "cache").load(root / "pic.png")
+            self.assertEqual(0, encode.call_count)
+            self.assertEqual(first, second)
+
+    def test_cache_keeps_missing_file_error(self) -> None:
+        with self.assertRaisesRegex(FileNotFoundError, "Image file not found"):
+            ImageCache().load(Path.cwd() / "missing.png")
+
+    def test_shared_mode_references_asset_ids(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            markdown_dir = Path(tmpdir)
+            (markdown_dir / "a.png").write_bytes(PNG_1X1)
+            (markdown_dir / "b.png").write_bytes(PNG_1X1)
+            out = embed_images_in_html('<img src="a.png"><img src="b.png">', markdown_dir, image_mode="shared")
+            asset_id = ImageCache().load(markdown_dir / "a.png").asset_id
+            self.assertEqual(f'<img data-dazzle-asset="{asset_id}"><img data-dazzle-asset="{asset_id}">', out)
+
+
 class PassthroughParserTests(unittest.TestCase):
     def test_preserves_comment_entity_and_doctype(self) -> None:
         src = "<!DOCTYPE html><!--x--><p>&nbsp;&#160;</p>"
@@ -71,5 +207,83 @@ class PassthroughParserTests(unittest.TestCase):
         self.assertEqual(src, parser.get_html())
 
 
+def _encoded_image(image, format: str, **save_options) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format=format, **save_options)
+    return output.getvalue()
+
+
+class ImageOptimizationSettingsTests(unittest.TestCase):
+    def test_rejects_invalid_settings(self) -> None:
+        for kwargs in ({"max_dimension": 0}, {"format": "avif"}, {"quality": 101}):
+            with self.subTest(kwargs=kwargs), self.assertRaises(ValueError):
+                ImageOptimization(**kwargs)
+
+
+@unittest.skipUnless(image_optimization_available(), "image optimization needs Pillow")
+class ImageOptimizerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        from PIL import Image
+
+        self.Image = Image
+        # A gradient compresses like a real picture without making the tests slow.
+        self.photo = Image.linear_gradient("L").resize((2400, 1600)).convert("RGB")
+
+    def _decode(self, data: bytes):
+        return self.Image.open(io.BytesIO(data))
+
+    def test_downscales_to_max_dimension(self) -> None:
+        raw = _encoded_image(self.photo, "PNG")
+        mime, data = ImageOptimizer(ImageOptimization(max_dimension=600)).optimize("image/png", raw)
+        self.assertEqual("image/png", mime)
+        self.assertEqual((600, 400), self._decode(data).size)
+        self.assertLess(len(data), len(raw))
+
+    def test_applies_orientation_and_strips_metadata(self) -> None:
+        exif = self.Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees clockwise.
+        exif[0x010E] = "private description"
+        raw = _encoded_image(self.photo, "JPEG", exif=exif.tobytes(), quality=95)
+        mime, data = ImageOptimizer(ImageOptimization(max_dimension=1200)).optimize("image/jpeg", raw)
+        optimized = self._decode(data)
+        self.assertEqual("image/jpeg", mime)
+        self.assertEqual((800, 1200), optimized.size)
+        self.assertEqual(0, len(optimized.getexif()))
+        self.assertNotIn(b"private description", data)
+
+    def test_converts_to_webp(self) -> None:
+        raw = _encoded_image(self.photo, "PNG")
+        mime, data = ImageOptimizer(ImageOptimization(format="webp")).optimize("image/png", raw)
+        self.assertEqual("image/webp", mime)
+        self.assertEqual("WEBP", self._decode(data).format)
+
+    def test_keeps_images_that_do_not_shrink_and_skips_gifs(self) -> None:
+        optimizer = ImageOptimizer(ImageOptimization())
+        self.assertEqual(("image/png", PNG_1X1), optimizer.optimize("image/png", PNG_1X1))
+        gif = _encoded_image(self.photo.resize((40, 30)), "GIF")
+        self.assertEqual(("image/gif", gif), optimizer.optimize("image/gif", gif))
+
+    def test_results_are_cached_by_content_hash(self) -> None:
+        raw = _encoded_image(self.photo, "PNG")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings = ImageOptimization(max_dimension=300)
+            with mock.patch.object(images, "_optimize_image_bytes", wraps=images._optimize_image_bytes) as optimize:
+                resolver = MemoryAssetResolver({"a.png": raw, "copy/b.png": raw}, settings)
+                first = ImageOptimizer(settings, Path(tmpdir)).optimize("image/png", raw)
+                self.assertEqual(first, ImageOptimizer(settings, Path(tmpdir)).optimize("image/png", raw))
+                self.assertEqual(resolver.load("a.png").asset_id, resolver.load("copy/b.png").asset_id)
+            self.assertEqual(2, optimize.call_count)
+
+    def test_file_images_are_optimized_when_embedded(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            markdown_dir = Path(tmpdir)
+            (markdown_dir / "photo.png").write_bytes(_encoded_image(self.photo, "PNG"))
+            cache = ImageCache(optimization=ImageOptimization(max_dimension=200, format="jpeg"))
+            out = embed_images_in_html('<img src="photo.png">', markdown_dir, image_cache=cache)
+            prefix = '<img src="data:image/jpeg;base64,'
+            self.assertTrue(out.startswith(prefix))
+            self.assertEqual((200, 133), self._decode(base64.b64decode(out[len(prefix) : -2])).size)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from pathlib import Path
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+
+from dazzle import cli
+from dazzle.compiler import MARKDOWN_ENGINE, BuildOptions, compile_markdown_source_to_stream
+from dazzle.profiling import BuildProfiler
+
+
+SOURCE = "# Deck\n\n---\n\n```python\nprint(1)\n```\n\n---\n\n* one\n* two"
+
+
+class BuildProfilerTests(unittest.TestCase):
+    def _profiled_build(self, options: BuildOptions | None = None) -> tuple[str, BuildProfiler]:
+        profiler = BuildProfiler()
+        profiler.start()
+        try:
+            stream = io.StringIO()
+            compile_markdown_source_to_stream(SOURCE, "deck.md", Path("."), stream, options, profiler=profiler)
+        finally:
+            profiler.stop()
+        return stream.getvalue(), profiler
+
+    def test_records_stages_per_slide(self) -> None:
+        _, profiler = self._profiled_build()
+        names = {record.name for record in profiler.records}
+        for stage in ("split", "slide", "markdown", "images", "write", "markdown block parser"):
+            self.assertIn(stage, names)
+        self.assertIn("markdown preprocessor FencedBlockPreprocessor", names)
+        self.assertEqual([0, 1, 2], sorted(record.slide for record in profiler.records if record.name == "slide"))
+
+    def test_nested_stages_fit_inside_their_parent(self) -> None:
+        profiler = BuildProfiler()
+        profiler.start()
+        try:
+            with profiler.stage("outer"):
+                with profiler.stage("inner"):
+                    payload = [bytes(1024) for _ in range(256)]
+                del payload
+        finally:
+            profiler.stop()
+        inner, outer = profiler.records
+        self.assertEqual(("inner", 1, "outer", 0), (inner.name, inner.depth, outer.name, outer.depth))
+        self.assertLessEqual(inner.seconds, outer.seconds)
+        self.assertGreaterEqual(inner.peak_bytes, 256 * 1024)
+        self.assertGreaterEqual(outer.peak_bytes, inner.peak_bytes)
+
+    def test_profiling_does_not_change_output_or_shared_engine(self) -> None:
+        stream = io.StringIO()
+        compile_markdown_source_to_stream(SOURCE, "deck.md", Path("."), stream)
+        html, _ = self._profiled_build(BuildOptions(jobs=2))
+        self.assertEqual(stream.getvalue(), html)
+        self.assertTrue(all("run" not in vars(processor) for processor in MARKDOWN_ENGINE.preprocessors))
+
+    def test_report_and_trace_formats(self) -> None:
+        _, profiler = self._profiled_build()
+        report = profiler.format_report(top=3)
+        self.assertIn("slowest slides:", report)
+        self.assertIn("slide 0", report)
+
+        trace = profiler.to_chrome_trace()
+        self.assertTrue(all(event["ph"] == "X" for event in trace["traceEvents"]))
+        self.assertEqual(len(profiler.records), len(trace["traceEvents"]))
+        stages = {stage["name"]: stage for stage in profiler.to_json()["stages"]}
+        self.assertEqual(3, stages["slide"]["calls"])
+
+    def test_cli_writes_profile_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = Path(tmpdir) / "deck.md"
+            input_path.write_text(SOURCE, encoding="utf-8")
+            profile_path = Path(tmpdir) / "profile.json"
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                exit_code = cli.main(
+                    [
+                        "build",
+                        str(input_path),
+                        "-o",
+                        str(Path(tmpdir) / "deck.html"),
+                        "--profile",
+                        "--profile-output",
+                        str(profile_path),
+                        "--profile-format",
+                        "chrome",
+                    ]
+                )
+            self.assertEqual(0, exit_code)
+            self.assertIn("slowest slides:", stderr.getvalue())
+            trace = json.loads(profile_path.read_text(encoding="utf-8"))
+            self.assertIn("read input", {event["name"] for event in trace["traceEvents"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
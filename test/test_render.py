@@ -2,7 +2,13 @@ from __future__ import annotations
 
 import unittest
 
-from dazzle.compiler import MARKDOWN_ENGINE, render_markdown
+from markdown import Markdown
+
+from dazzle.compiler import MARKDOWN_ENGINE, convert_markdown, render_markdown
+from dazzle.extensions.bracket_extension import BracketExtension
+from dazzle.extensions.fragment_extension import resolve_fragment_ids
+from dazzle.budgets import DEFAULT_NESTING_DEPTH, BudgetExceededError
+from dazzle.slides import lex_fragment_lines, split_markdown_into_slides
 
 
 class FragmentAnnotationInExtensionTests(unittest.TestCase):
@@ -17,8 +23,8 @@ class FragmentAnnotationInExtensionTests(unittest.TestCase):
     def test_star_list_fragments_get_ordered_in_list_html_order(self) -> None:
         md = MARKDOWN_ENGINE
         html = render_markdown(md, "* One\n    * Two\n- Static")
-        self.assertIn('<li class="fragment is-hidden" data-fragment-order="1">One', html)
-        self.assertIn('<li class="fragment is-hidden" data-fragment-order="2">Two', html)
+        self.assertIn('<li class="fragment is-hidden" data-fragment-id="s0-f1" data-fragment-order="1">One', html)
+        self.assertIn('<li class="fragment is-hidden" data-fragment-id="s0-f2" data-fragment-order="2">Two', html)
         self.assertNotIn('data-fragment-order="3"', html)
         self.assertEqual(2, md.dazzle_fragment_count)
 
@@ -28,6 +34,7 @@ class FragmentAnnotationInExtensionTests(unittest.TestCase):
         self.assertIn('data-fragment-order="9"', html)
         self.assertNotIn('data-fragment-order="1"', html)
         self.assertEqual(1, md.dazzle_fragment_count)
+        self.assertEqual([9], md.dazzle_fragment_orders)
 
     def test_non_fragment_class_is_ignored(self) -> None:
         md = MARKDOWN_ENGINE
@@ -35,6 +42,109 @@ class FragmentAnnotationInExtensionTests(unittest.TestCase):
         self.assertEqual('<div class="fragmented">x</div>', html)
         self.assertEqual(0, md.dazzle_fragment_count)
 
+    def test_fragment_ids_are_placeholders_until_the_slide_index_is_known(self) -> None:
+        md = MARKDOWN_ENGINE
+        html = convert_markdown(md, "::: fragment\nx\n:::").html
+        self.assertNotIn("s3-f1", html)
+        self.assertIn('data-fragment-id="s3-f1"', resolve_fragment_ids(html, 3))
+
+    def test_fragment_id_placeholder_cannot_come_from_slide_content(self) -> None:
+        md = MARKDOWN_ENGINE
+        html = convert_markdown(md, '`data-fragment-id="\x02dazzle-fragment:1\x03"`').html
+        self.assertEqual(html, resolve_fragment_ids(html, 3))
+
+    def test_render_markdown_fills_in_fragment_ids(self) -> None:
+        html = render_markdown(MARKDOWN_ENGINE, "::: fragment\nx\n:::", slide_index=2)
+        self.assertIn('data-fragment-id="s2-f1"', html)
+        self.assertNotIn("\x02", html)
+
+    def test_blank_slide_does_not_inherit_previous_fragment_count(self) -> None:
+        md = MARKDOWN_ENGINE
+        render_markdown(md, "* one\n* two")
+        self.assertEqual("", render_markdown(md, ""))
+        self.assertEqual(0, md.dazzle_fragment_count)
+
+
+class SlideLexerTests(unittest.TestCase):
+    SOURCE = (
+        "# Title\n\n* one\n    * nested\n- static\n\n---\n\n::: fragment\n* plain inside\n:::\n\n"
+        "```md\n---\n:::\n* not a bullet\n```\n\n---\n\n~~~~\n```\n---\n~~~~\n* last"
+    )
+
+    def test_splits_outside_fences_and_records_start_lines(self) -> None:
+        slides = split_markdown_into_slides(self.SOURCE)
+        self.assertEqual([1, 8, 20], [slide.start_line for slide in slides])
+        self.assertIn("```md\n---\n:::", slides[1].markdown)
+
+    def test_lexed_lines_match_lexing_each_slide_on_its_own(self) -> None:
+        for slide in split_markdown_into_slides(self.SOURCE):
+            self.assertEqual(lex_fragment_lines(slide.markdown.split("\n")), list(slide.lines))
+            self.assertEqual(
+                convert_markdown(MARKDOWN_ENGINE, slide.markdown).html,
+                convert_markdown(MARKDOWN_ENGINE, slide.markdown, slide.lines).html,
+            )
+
+    def test_errors_report_line_numbers_in_the_document(self) -> None:
+        cases = {
+            "a\n\n---\n\nb\n::: fragment\nx": "Unclosed fragment directive starting at line 6.",
+            "a\n---\nb\n:::": "Unexpected directive close at line 4.",
+            "x\n---\n::: fragment\n::: fragment": r"Nested fragment directives are not supported \(line 4\).",
+            "x\n---\n```\n:::note\n```\n:::note": "Unsupported directive ':::note' at line 6.",
+            "::: fragment\n---\n:::": "Unclosed fragment directive starting at line 1.",
+        }
+        for source, message in cases.items():
+            with self.subTest(source=source):
+                with self.assertRaisesRegex(ValueError, message):
+                    split_markdown_into_slides(source)
+
+    def test_rejects_lines_nested_too_deeply(self) -> None:
+        deep_list = "".join("    " * depth + "- item\n" for depth in range(DEFAULT_NESTING_DEPTH + 2))
+        message = f"Line {DEFAULT_NESTING_DEPTH + 2} is nested {DEFAULT_NESTING_DEPTH + 1} levels"
+        with self.assertRaisesRegex(ValueError, message):
+            split_markdown_into_slides(deep_list)
+        with self.assertRaisesRegex(ValueError, "Line 3 is nested"):
+            split_markdown_into_slides("a\n\n" + "> " * (DEFAULT_NESTING_DEPTH + 1) + "quote")
+        with self.assertRaisesRegex(BudgetExceededError, "Line 3 is nested 2 levels deep; the budget allows 1"):
+            split_markdown_into_slides("- a\n    - b\n        - c", max_nesting_depth=1)
+        self.assertEqual(1, len(split_markdown_into_slides(deep_list, max_nesting_depth=None)))
+
+    def test_only_lists_and_blockquotes_count_as_nesting(self) -> None:
+        deep = "\t" * (DEFAULT_NESTING_DEPTH + 1)
+        sources = {
+            "fenced code": f"```\n{deep}- code\n```",
+            "indented code": f"{deep}code",
+            "continuation line": f"- item\n\n{deep}more",
+            "raw html": f"<pre>\n\n{deep}- text\n\n{deep}> text\n</pre>\n\n- after",
+            "unclosed raw html": f"<div>\n\n{deep}- text",
+        }
+        for name, source in sources.items():
+            with self.subTest(source=name):
+                self.assertEqual(1, len(split_markdown_into_slides(source)))
+        markdown_html = f'<div markdown="1">\n\n{deep}- text\n\n</div>'
+        with self.assertRaisesRegex(BudgetExceededError, "Line 3 is nested"):
+            split_markdown_into_slides(markdown_html)
+        with self.assertRaisesRegex(BudgetExceededError, "Line 5 is nested"):
+            split_markdown_into_slides(f"<div>x</div>\n\n<hr>\n\n{deep}- text")
+
+
+class BracketExtensionTests(unittest.TestCase):
+    SOURCES = (
+        "[a](b) [nested [brackets]](u) ![img](p.png \"t\") [ref][r] [r] ![ref][r]",
+        "[open [a](b) [x](y 'title') ![i](<u> \"t\") [a](b (c)) [a](b\n\n[r]: /url",
+        "[[a](u)](v) [a](u \"t(\") ![[a](<u> 't')\\[ \"t\")\n<b>](\"[a](u \"t\")'\n<b>]([a](u \"t\")&amp;\"",
+        "[a](b " * 50 + "'" + "[c" * 50 + "]",
+    )
+
+    def test_renders_like_python_markdown(self) -> None:
+        extensions = ["tables", "md_in_html", "attr_list"]
+        stock = Markdown(extensions=extensions, output_format="html5")
+        linear = Markdown(extensions=[*extensions, BracketExtension()], output_format="html5")
+        for source in self.SOURCES:
+            with self.subTest(source=source):
+                stock.reset()
+                linear.reset()
+                self.assertEqual(stock.convert(source), linear.convert(source))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import http.client
+import json
+import socket
+import tempfile
+import threading
+import unittest
+
+from dazzle.api import render_deck
+from dazzle.budgets import BuildBudget
+from dazzle.compiler import BuildOptions
+from dazzle.server import CompileService, create_server
+
+from fixtures import PNG_1X1
+
+
+SOURCE = "# Deck\n\n![logo](img/logo.png)\n\n---\n\n::: fragment\none\n:::\n\n---\n\n```python\nprint(1)\n```"
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str) -> None:
+        super().__init__("localhost")
+        self._path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._path)
+
+
+class CompileServerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.root = Path(tmpdir.name)
+        (self.root / "img").mkdir()
+        (self.root / "img" / "logo.png").write_bytes(PNG_1X1)
+        self.options = BuildOptions(image_mode="shared")
+        self.server = self._start(create_server(CompileService(self.options), port=0))
+
+    def _start(self, server):
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def _connect(self) -> http.client.HTTPConnection:
+        connection = http.client.HTTPConnection(*self.server.server_address[:2], timeout=30)
+        self.addCleanup(connection.close)
+        return connection
+
+    def _request(
+        self, path: str, payload: object = None, connection: http.client.HTTPConnection | None = None, **headers: str
+    ) -> tuple[int, bytes]:
+        connection = connection or self._connect()
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        request_headers = {"Content-Type": "application/json", **headers}
+        connection.request("GET" if body is None else "POST", path, body, request_headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def _deck(self, source: str = SOURCE) -> dict[str, str]:
+        return {"markdown": source, "base_dir": str(self.root), "source_name": "talk.md"}
+
+    def test_document_matches_a_library_build(self) -> None:
+        status, body = self._request("/document", self._deck())
+        self.assertEqual(200, status)
+        self.assertEqual(render_deck(SOURCE, {"img/logo.png": PNG_1X1}, self.options, source_name="talk.md"), body)
+
+    def test_returns_selected_slides(self) -> None:
+        status, body = self._request("/slides", {**self._deck(), "slides": [1, 2]})
+        self.assertEqual(200, status)
+        deck = json.loads(body)
+        self.assertEqual(("Deck", 3), (deck["title"], deck["slide_count"]))
+        self.assertEqual([1, 2], [slide["index"] for slide in deck["slides"]])
+        self.assertEqual([{"id": "s1-f1", "order": 1}], deck["slides"][0]["fragments"])
+        self.assertIn("codehilite", deck["slides"][1]["html"])
+        self.assertIn("dazzle-assets", deck["assets_html"])
+
+    def test_reports_errors_as_json(self) -> None:
+        connection = self._connect()
+        cases = [
+            ("/document", self._deck("![missing](nope.png)"), 422, "nope.png"),
+            ("/slides", {**self._deck(), "slides": [3]}, 422, "Slide index 3 is out of range"),
+            ("/slides", {**self._deck(), "slides": "all"}, 400, "'slides' must be a list"),
+            ("/document", {"base_dir": str(self.root)}, 400, "'markdown' must be a string"),
+            ("/document", {"markdown": "x", "base_dir": str(self.root / "nope")}, 422, "Base directory not found"),
+            ("/deck", self._deck(), 404, "Unknown path"),
+        ]
+        for path, payload, expected_status, message in cases:
+            with self.subTest(path=path, status=expected_status):
+                status, body = self._request(path, payload, connection)
+                self.assertEqual(expected_status, status)
+                self.assertIn(message, json.loads(body)["error"])
+
+    def test_rejects_requests_a_browser_could_forge(self) -> None:
+        self.assertEqual(403, self._request("/document", self._deck(), Host="attacker.example:8765")[0])
+        self.assertEqual(415, self._request("/document", self._deck(), **{"Content-Type": "text/plain"})[0])
+        connection = self._connect()
+        connection.request("POST", "/document", b"{", {"Content-Type": "application/json"})
+        self.assertEqual(400, connection.getresponse().status)
+
+    def test_budget_errors_name_the_limit(self) -> None:
+        service = CompileService(BuildOptions(budget=BuildBudget(max_source_bytes=10)))
+        self.server = self._start(create_server(service, port=0))
+        status, body = self._request("/document", self._deck())
+        self.assertEqual(422, status)
+        self.assertEqual("max_source_bytes", json.loads(body)["limit"])
+
+    def test_concurrent_requests_match_serial_ones(self) -> None:
+        decks = [self._deck(SOURCE.replace("Deck", f"Deck {index % 4}")) for index in range(16)]
+        expected = [self._request("/document", deck)[1] for deck in decks[:4]]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(lambda deck: self._request("/document", deck), decks))
+        for index, (status, body) in enumerate(responses):
+            self.assertEqual((200, expected[index % 4]), (status, body))
+
+    def test_keeps_rendered_slides_across_requests(self) -> None:
+        service = CompileService(self.options)
+        first, _ = service.document(SOURCE, self.root)
+        edited, _ = service.document(SOURCE.replace("\none\n", "\ntwo\n"), self.root)
+        self.assertEqual(first.replace("<p>one</p>", "<p>two</p>"), edited)
+        self.assertEqual(first, service.document(SOURCE, self.root)[0])
+
+    def test_serves_a_unix_socket(self) -> None:
+        socket_path = self.root / "dazzle.sock"
+        self._start(create_server(CompileService(self.options), socket_path=socket_path))
+        connection = _UnixConnection(str(socket_path))
+        self.addCleanup(connection.close)
+        status, body = self._request("/document", self._deck(), connection)
+        self.assertEqual(200, status)
+        self.assertIn(b"s1-f1", body)
+        self.assertEqual(200, self._request("/health", connection=connection)[0])
+
+    def test_rejects_modes_that_write_files(self) -> None:
+        with self.assertRaisesRegex(ValueError, "external"):
+            CompileService(BuildOptions(image_mode="external"))
+        with self.assertRaisesRegex(ValueError, "chunked"):
+            CompileService(BuildOptions(layout="chunked"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from pathlib import Path
+import json
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from dazzle.compiler import create_markdown_engine, render_markdown
+
+
+# Modules that used to be imported by `import dazzle.cli` and made every invocation slow.
+HEAVY_MODULES = (
+    "concurrent.futures.process",
+    "dazzle.compiler",
+    "markdown",
+    "markdown.extensions.codehilite",
+    "pygments.formatters",
+    "pygments.lexers",
+)
+HIGHLIGHT_MODULES = ("markdown.extensions.codehilite", "pygments.formatters", "pygments.lexers")
+
+
+def _loaded_after(code: str) -> set[str]:
+    """Runs ``code`` in a fresh interpreter and returns which of HEAVY_MODULES it imported."""
+    report = f"import json, sys\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    script = textwrap.dedent(code) + "\n" + report
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+class StartupImportTests(unittest.TestCase):
+    def test_importing_the_cli_loads_no_heavy_modules(self) -> None:
+        self.assertEqual(set(), _loaded_after("import dazzle.cli"))
+
+    def test_help_loads_no_heavy_modules(self) -> None:
+        code = """
+        import contextlib, io
+        from dazzle import cli
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                cli.main(["build", "--help"])
+            except SystemExit:
+                pass
+        """
+        self.assertEqual(set(), _loaded_after(code))
+
+    def _build_in_subprocess(self, source: str) -> set[str]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = Path(tmpdir) / "deck.md"
+            input_path.write_text(source, encoding="utf-8")
+            code = f"""
+            from dazzle import cli
+            cli.main(["build", {str(input_path)!r}, "-o", {str(Path(tmpdir) / "deck.html")!r}])
+            """
+            return _loaded_after(code)
+
+    def test_plain_deck_build_does_not_load_pygments(self) -> None:
+        loaded = self._build_in_subprocess("# Deck\n\n* one\n* two\n\n---\n\n| a | b |\n|---|---|\n| 1 | 2 |")
+        self.assertIn("markdown", loaded)
+        self.assertEqual(set(), loaded & set(HIGHLIGHT_MODULES))
+
+    def test_deck_with_code_loads_pygments(self) -> None:
+        loaded = self._build_in_subprocess("# Deck\n\n---\n\n```python\nprint(1)\n```")
+        self.assertLessEqual({"markdown.extensions.codehilite", "pygments.lexers"}, loaded)
+
+
+class PlainEngineTests(unittest.TestCase):
+    SOURCES = (
+        "# Title\n\nSome *emphasis*, `inline code` and a [link](https://example.com).",
+        "* One\n* Two\n- Static",
+        "| a | b |\n|---|---|\n| 1 | 2 |",
+        "x\n{: .fragment data-fragment-order=\"3\"}",
+        '<div markdown="1">\n*inside*\n</div>',
+        "::: fragment\n- one\n:::",
+    )
+
+    def test_plain_engine_matches_full_engine_without_code(self) -> None:
+        full, plain = create_markdown_engine(), create_markdown_engine(highlighting=False)
+        for source in self.SOURCES:
+            with self.subTest(source=source):
+                self.assertEqual(render_markdown(full, source), render_markdown(plain, source))
+                self.assertEqual(full.dazzle_fragment_orders, plain.dazzle_fragment_orders)
+
+
+if __name__ == "__main__":
+    unittest.main()
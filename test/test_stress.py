@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from pathlib import Path
+import io
+import sys
+import unittest
+
+from dazzle.budgets import DEFAULT_NESTING_DEPTH
+from dazzle.compiler import BuildOptions, compile_markdown_source_to_stream
+
+
+# Adversarial decks by size; each one is compiled at two sizes, four times apart.
+DECKS = {
+    "nested lists": lambda size: "".join(
+        "    " * (line % DEFAULT_NESTING_DEPTH) + "* item\n" for line in range(size // 32)
+    ),
+    "nested quotes": lambda size: "".join(
+        ">" * (line % DEFAULT_NESTING_DEPTH) + " quote\n" for line in range(size // 8)
+    ),
+    "huge table": lambda size: "| a | b | c |\n|---|---|---|\n" + "| 1 | *x* | `y` |\n" * (size // 16),
+    "directives": lambda size: "::: fragment\nx\n:::\n\n" * (size // 16),
+    "long line": lambda size: "word " * (size * 2),
+    "unclosed emphasis": lambda size: "*a " * size,
+    "unclosed brackets": lambda size: "[a " * size,
+    "unclosed link targets": lambda size: "[a](b " * size,
+    "nested brackets": lambda size: "[" * size + "]" * size,
+    "many links": lambda size: "[a](b) " * (size // 4),
+    "many slides": lambda size: "x\n\n---\n\n" * (size // 16),
+}
+BASE_SIZE = 2000
+# Linear growth gives 4; quadratic growth, such as Python-Markdown's bracket scans, gives 16.
+MAX_GROWTH = 8
+
+
+def _compile_steps(source: str) -> int:
+    """Counts the Python lines executed to compile ``source``, a measure of work that timer noise cannot skew.
+
+    Work done inside C, such as a regular expression scan, is not counted.
+    """
+    steps = 0
+
+    def trace(frame, event, arg):
+        nonlocal steps
+        if event == "line":
+            steps += 1
+        return trace
+
+    options = BuildOptions(image_concurrency=1)
+    previous = sys.gettrace()
+    sys.settrace(trace)
+    try:
+        compile_markdown_source_to_stream(source, "deck.md", Path("."), io.StringIO(), options)
+    finally:
+        sys.settrace(previous)
+    return steps
+
+
+class LinearWorkTests(unittest.TestCase):
+    def test_compile_work_grows_linearly_with_adversarial_input(self) -> None:
+        _compile_steps("# warm up\n\n```python\nx = 1\n```")
+        for name, deck in DECKS.items():
+            with self.subTest(deck=name):
+                small = _compile_steps(deck(BASE_SIZE))
+                large = _compile_steps(deck(BASE_SIZE * 4))
+                self.assertLess(large / small, MAX_GROWTH, f"{small} -> {large} steps")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from pathlib import Path
+import os
+import tempfile
+import unittest
+
+from dazzle.watch import IncrementalBuilder
+
+from fixtures import PNG_1X1
+
+
+class IncrementalBuilderTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmpdir.name)
+        self.input_path = self.root / "slides.md"
+        self.output_path = self.root / "out" / "deck.html"
+        (self.root / "pic.png").write_bytes(PNG_1X1)
+        self.builder = IncrementalBuilder(self.input_path, self.output_path)
+
+    def tearDown(self) -> None:
+        self._tmpdir.cleanup()
+
+    def test_rebuild_renders_only_edited_slides(self) -> None:
+        self.input_path.write_text("one\n\n---\n\ntwo\n\n---\n\nthree", encoding="utf-8")
+        first = self.builder.build()
+        self.assertEqual((3, 3), (first.slide_count, first.rendered_count))
+
+        self.input_path.write_text("one\n\n---\n\nTWO\n\n---\n\nthree", encoding="utf-8")
+        second = self.builder.build()
+        self.assertEqual((3, 1), (second.slide_count, second.rendered_count))
+        self.assertIn("<p>TWO</p>", self.output_path.read_text(encoding="utf-8"))
+
+    def test_referenced_images_are_watched_and_invalidate_their_slide(self) -> None:
+        self.input_path.write_text("text\n\n---\n\n![pic](pic.png)", encoding="utf-8")
+        self.builder.build()
+        image_path = (self.root / "pic.png").resolve()
+        self.assertEqual({self.input_path, image_path}, self.builder.watched_paths())
+
+        image_path.write_bytes(PNG_1X1 + b"\x00")
+        stat = image_path.stat()
+        os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(1, self.builder.build().rendered_count)
+
+    def _deck(self, edited: int | None = None) -> str:
+        return "\n\n---\n\n".join(
+            f"# Slide {index}\n\n* {'edited' if index == edited else 'point'} {index}" for index in range(20)
+        )
+
+    def _fresh_build(self) -> str:
+        output_path = self.root / "fresh.html"
+        IncrementalBuilder(self.input_path, output_path).build()
+        return output_path.read_text(encoding="utf-8")
+
+    def test_rebuild_rewrites_the_output_from_the_edited_slide_on(self) -> None:
+        self.input_path.write_text(self._deck(), encoding="utf-8")
+        first = self.builder.build()
+        self.assertEqual(self.output_path.stat().st_size, first.written_bytes)
+
+        self.input_path.write_text(self._deck(edited=15), encoding="utf-8")
+        second = self.builder.build()
+        data = self.output_path.read_bytes()
+        edited_section = data.rindex(b"<section", 0, data.index(b"Slide 15"))
+        self.assertEqual(len(data) - edited_section, second.written_bytes)
+        self.assertEqual(self._fresh_build(), data.decode("utf-8"))
+        self.assertEqual(0, self.builder.build().written_bytes)
+
+    def test_output_changed_by_something_else_is_replaced_as_a_whole(self) -> None:
+        self.input_path.write_text(self._deck(), encoding="utf-8")
+        self.builder.build()
+        self.output_path.write_text("something else", encoding="utf-8")
+
+        self.input_path.write_text(self._deck(edited=15), encoding="utf-8")
+        report = self.builder.build()
+        self.assertEqual(self.output_path.stat().st_size, report.written_bytes)
+        self.assertEqual(self._fresh_build(), self.output_path.read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    unittest.main()